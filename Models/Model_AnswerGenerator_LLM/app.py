@@ -2,13 +2,28 @@ from beam import endpoint, Image
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
 import os
-import re # Import re for clean extraction of the final answer
+import sys
+from pathlib import Path
+
+# Shared helpers live in Models/model_runtime (deploy from the Models/ directory so it is uploaded)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from model_runtime.cpu_inference import configure_cpu_threads, prepare_cpu_model
+from model_runtime.prefix_cache import PrefixCache
+from model_runtime.prompts import answer_input_ids, extract_final_answer, static_answer_prefix
+from model_runtime.scheduler import ContinuousBatchScheduler
+from model_runtime.speculative import PromptLookupDecoder
+from model_runtime.stopping import eos_token_ids
+from model_runtime.tracing import EndpointTrace
 
 # ============================================================
 # Configuration
 # ============================================================
 MODEL_ID = "Qwen/Qwen2.5-1.5B-Instruct"
 MAX_NEW_TOKENS = 400
+# Sequences decoded together by the continuous batching scheduler (also the endpoint concurrency)
+MAX_BATCH_SIZE = int(os.getenv("ANSWER_MAX_BATCH_SIZE", "8"))
+# Default for the `speculative` request flag (prompt-lookup decoding that copies spans from <CONTEXT>)
+SPECULATIVE_DEFAULT = os.getenv("ANSWER_SPECULATIVE", "false").lower() == "true"
 
 # ============================================================
 # Model Loading for Beam
@@ -37,10 +52,12 @@ def load_model():
         dtype = torch.float32
         device_map_setting = "cpu"
         final_device = "cpu"
-        print(f"✅ Target: CPU. Using torch.float32.")
+        print(f"✅ Target: CPU. Using torch.float32 with {configure_cpu_threads()} threads.")
 
     # Load tokenizer and model
     tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, token=hf_token)
+    # Decoder-only models must be left-padded when a batch of prompts is generated together
+    tokenizer.padding_side = "left"
     
     model = AutoModelForCausalLM.from_pretrained(
         MODEL_ID,
@@ -48,8 +65,37 @@ def load_model():
         torch_dtype=dtype,
         device_map=device_map_setting,
     )
+    if final_device == "cpu":
+        # int8 dynamic quantization by default (CPU_QUANTIZATION=int8|bf16|fp32)
+        model = prepare_cpu_model(model)
+
+    # Prefill the constant instructions once; requests only prefill their context + query
+    prefix_cache = PrefixCache.from_text(model, tokenizer, static_answer_prefix(tokenizer))
+    print(f"✅ Cached {prefix_cache.prefix_length} static prompt tokens.")
+
+    # Concurrent requests join one running decode batch instead of waiting for each other
+    # Stop on every EOS the model was trained with (<|im_end|> and <|endoftext|>), like generate() does
+    stop_ids = eos_token_ids(model, tokenizer)
+    scheduler = ContinuousBatchScheduler(
+        model,
+        eos_token_id=stop_ids,
+        max_batch_size=MAX_BATCH_SIZE,
+        prefix_caches=[prefix_cache],
+    )
+    print(f"✅ Continuous batching enabled (max batch size {MAX_BATCH_SIZE}).")
+
+    # Opt-in single-stream decoder that drafts tokens from the context and verifies them in one pass
+    speculative_decoder = PromptLookupDecoder(model, prefix_caches=[prefix_cache])
 
-    return {"tokenizer": tokenizer, "model": model, "device": final_device}
+    return {
+        "tokenizer": tokenizer,
+        "model": model,
+        "eos_token_ids": stop_ids,
+        "device": final_device,
+        "prefix_cache": prefix_cache,
+        "scheduler": scheduler,
+        "speculative_decoder": speculative_decoder,
+    }
 
 
 # ============================================================
@@ -60,6 +106,7 @@ def load_model():
     on_start=load_model,
     secrets=["HUGGINGFACE_HUB_TOKEN"],
     gpu="RTX4090", # Recommended GPU for inference
+    concurrent_requests=MAX_BATCH_SIZE, # Requests in flight share the scheduler's decode batch
     image=Image().add_python_packages([
         "torch",
         "transformers",
@@ -67,7 +114,16 @@ def load_model():
         "pydantic"
     ])
 )
-def generate_answer_endpoint(context, rag_context: str, user_query: str, max_new_tokens: int = MAX_NEW_TOKENS):
+def generate_answer_endpoint(
+    context,
+    rag_context: str = "",
+    user_query: str = "",
+    max_new_tokens: int = MAX_NEW_TOKENS,
+    batch: list[dict] | None = None,
+    clarify_query: bool = False,
+    speculative: bool = SPECULATIVE_DEFAULT,
+    traceparent: str | None = None,
+):
     """
     RAG Answer Generator Endpoint function using an improved, ChatML-compatible prompt.
 
@@ -75,102 +131,79 @@ def generate_answer_endpoint(context, rag_context: str, user_query: str, max_new
         rag_context (str): Retrieved document chunks.
         user_query (str): The user's question.
         max_new_tokens (int): Max answer length.
+        batch (list[dict], optional): Several `{"rag_context", "user_query"}` items, all
+            submitted to the continuous batching scheduler at once. When given, `rag_context`
+            and `user_query` are ignored and the response carries `answers` in input order.
+            Items may set their own `clarify_query`.
+        clarify_query (bool): The query was not refined before retrieval; the model is asked
+            to work out what the user means from the context before answering.
+        speculative (bool): Decode this (single) request with prompt-lookup speculative
+            decoding instead of the shared batch. Same greedy output, usually fewer forward
+            passes because answers copy spans of the context; the response then includes
+            `speculative` acceptance metrics.
+        traceparent (str, optional): The caller's W3C trace context; the response's `timings`
+            split the handler time into scheduler queue wait and compute.
 
     Returns:
         dict: Final answer grounded only in the context.
     """
+    trace = EndpointTrace("answer", traceparent)
 
-    tokenizer = context.on_start_value["tokenizer"]
-    model = context.on_start_value["model"]
-
-    # System Prompt: Highly specific RAG instructions
-    system_prompt = f"""
-You are an intelligent, expert-level Answer Generation Assistant for a Retrieval-Augmented Generation (RAG) system. Your sole purpose is to synthesize a response based strictly on the provided context.
-
-### Instructions
-1.  **STRICT GROUNDING & REASONING:**
-    * Your answer MUST be derived **ONLY** from the text provided in the <CONTEXT> tags. **NEVER** use external knowledge, speculate, or invent facts.
-    * **Internal Verification:** Before writing, verify that the synthesized answer is fully supported by the <CONTEXT>. Do not show this verification step.
-    * **Source Text Adherence:** Where possible, directly use or closely paraphrase the **exact phrasing** from the source text to construct your answer to maintain high fidelity.
-
-2.  **UNANSWERABLE CONDITION:**
-    * If the <CONTEXT> does not contain sufficient information to fully answer the user's <QUERY>, you **MUST** respond with the **EXACT** phrase: `No answer found in the provided context.` Do not add any other text or formatting.
+    state = context.on_start_value
+    tokenizer = state["tokenizer"]
+    prefix_cache = state["prefix_cache"]
+    scheduler = state["scheduler"]
 
-3.  **FORMAT:**
-    * Produce a clear, highly structured, and easy-to-read answer. Use appropriate markdown (headings, bolding, bullet points) for readability.
-
-### Context for Grounding
-<CONTEXT>
-{rag_context}
-</CONTEXT>
-"""
-
-    # User's turn: present the query and request the final output
-    user_prompt = f"""
-Based ONLY on the context provided, answer the following user query:
-<QUERY>
-{user_query}
-</QUERY>
-
-Produce the final, structured answer here:
-<FINAL_ANSWER>
-"""
+    # ============================================================
+    # Batch mode: submit every prompt, then wait for all of them
+    # ============================================================
+    if batch is not None:
+        print(f"⏳ Generating tokens for a batch of {len(batch)}...")
+        futures = [
+            scheduler.submit(answer_input_ids(tokenizer, prefix_cache, item["rag_context"], item["user_query"], item.get("clarify_query", False)), max_new_tokens)
+            for item in batch
+        ]
+        answers = [
+            extract_final_answer(tokenizer.decode(future.result(), skip_special_tokens=True))
+            for future in futures
+        ]
+        trace.waited_for(futures)
+        return {
+            "user_queries": [item["user_query"] for item in batch],
+            "answers": answers,
+            "timings": trace.finish(batch_size=len(batch))
+        }
 
     # ============================================================
     # Apply Qwen Chat Template (Required for Correct Inference)
     # ============================================================
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt}
-    ]
-
-    # The inputs need to be moved to the correct device
-    inputs = tokenizer.apply_chat_template(
-        messages,
-        return_tensors="pt",
-        tokenize=True,
-        add_generation_prompt=True # Essential for Instruct models
-    ).to(model.device) 
+    # The static prefix comes from the prefix cache, so only the context + query part is prefilled
+    inputs = answer_input_ids(tokenizer, prefix_cache, rag_context, user_query, clarify_query)
 
     # ============================================================
     # Generate Answer
     # ============================================================
     print("⏳ Generating tokens...")
-    outputs = model.generate(
-        input_ids=inputs,
-        max_new_tokens=max_new_tokens,
-        do_sample=False,
-        pad_token_id=tokenizer.eos_token_id # Use EOS as pad token for generation
-    )
-    
-    # Decode the generated tokens, starting *after* the input prompt
-    decoded = tokenizer.decode(outputs[0][inputs.shape[1]:], skip_special_tokens=True)
-
-    # ============================================================
-    # Extract ONLY the answer (after <FINAL_ANSWER>)
-    # ============================================================
-    
-    # 1. Clean up potential closing tags and initial whitespace
-    answer_only = decoded.strip()
-    
-    # Simple cleanup of closing tags if the model appended them
-    if answer_only.endswith("</FINAL_ANSWER>"):
-        answer_only = answer_only.replace("</FINAL_ANSWER>", "").strip()
-    
-    # A final clean-up to remove any residual structure if the model fails to follow the format perfectly
-    # The original script's complex extraction is simplified for the endpoint
-    # to primarily rely on the model's strict adherence to the prompt template.
-    
-    # 2. Check for the no-answer fallback phrase
-    if answer_only == "No answer found in the provided context.":
-        final_answer = answer_only
+    metrics = None
+    if speculative:
+        # Drafts copied from the prompt are verified in one forward pass per step
+        generated, stats = state["speculative_decoder"].generate(inputs, max_new_tokens, state["eos_token_ids"])
+        metrics = stats.as_dict()
+        print(f"⚡ Speculative decoding: {metrics}")
     else:
-        # Final safety cleanup: remove any text that might accidentally precede the answer, 
-        # which can happen if the model re-starts the prompt structure.
-        final_answer = answer_only.split("<QUERY>")[0].split("</CONTEXT>")[-1].strip()
+        # Joins the running decode batch at the next token boundary
+        future = scheduler.submit(inputs, max_new_tokens)
+        generated = future.result()
+        trace.waited_for([future])
 
+    # Both decoders return only the new tokens
+    decoded = tokenizer.decode(generated, skip_special_tokens=True)
 
-    return {
+    response = {
         "user_query": user_query,
-        "answer": final_answer
-    }
\ No newline at end of file
+        "answer": extract_final_answer(decoded),
+        "timings": trace.finish(batch_size=1, speculative=speculative)
+    }
+    if metrics is not None:
+        response["speculative"] = metrics
+    return response
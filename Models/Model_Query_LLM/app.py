@@ -1,19 +1,37 @@
 from beam import endpoint, Image
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteriaList
 import torch
 import os
+import sys
+from pathlib import Path
+
+# Shared helpers live in Models/model_runtime (deploy from the Models/ directory so it is uploaded)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from model_runtime.cpu_inference import configure_cpu_threads, prepare_cpu_model
+from model_runtime.prefix_cache import PrefixCache
+from model_runtime.prompts import (
+    REFINEMENT_PREFIX,
+    build_refinement_prompt,
+    build_refinement_suffix,
+    clean_refined_output,
+)
+from model_runtime.stopping import SentenceBoundary, SentenceBoundaryCriteria, eos_token_ids
+from model_runtime.tracing import EndpointTrace
 
 # -----------------------------
 # Configuration
 # -----------------------------
 MODEL_ID = "Qwen/Qwen2.5-1.5B-Instruct"
+# The refined query is one sentence under 30 words (~1.3 tokens per word) and generation
+# stops at the first period/newline, so this is only a safety cap
+MAX_NEW_TOKENS = 48
 
 # -----------------------------
 # Model setup
 # -----------------------------
 def load_model():
     """
-    Loads the tokenizer and model, then initializes the text generation pipeline.
+    Loads the tokenizer and model, then prefills the constant system prompt into a reusable KV cache.
     This function runs once when the Beam endpoint starts up (on_start).
     """
     print(f"🚀 Loading model: {MODEL_ID}")
@@ -28,6 +46,8 @@ def load_model():
 
     # Load model and tokenizer with authentication
     tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, token=hf_token)
+    # Decoder-only models must be left-padded when a batch of prompts is generated together
+    tokenizer.padding_side = "left"
     model = AutoModelForCausalLM.from_pretrained(
         MODEL_ID,
         token=hf_token,
@@ -36,17 +56,27 @@ def load_model():
         # 'auto' or "cuda" can be used to leverage the specified GPU
         device_map="auto"
     )
+    if not torch.cuda.is_available():
+        # int8 dynamic quantization by default (CPU_QUANTIZATION=int8|bf16|fp32), CPU_NUM_THREADS threads
+        print(f"✅ Target: CPU with {configure_cpu_threads()} threads.")
+        model = prepare_cpu_model(model)
 
-    generator = pipeline(
-        "text-generation",
-        model=model,
-        tokenizer=tokenizer,
-        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-        device_map="auto"
-    )
+    # The system prompt never changes, so its KV cache is computed once here
+    prefix_cache = PrefixCache.from_text(model, tokenizer, REFINEMENT_PREFIX)
+    print(f"✅ Cached {prefix_cache.prefix_length} static prompt tokens.")
+
+    # Token ids that end the first sentence/line (cleanup discards everything after them)
+    boundary = SentenceBoundary(tokenizer)
+    print(f"✅ Early stopping on {len(boundary.period_ids)} period and {len(boundary.newline_ids)} newline tokens.")
 
     print("✅ Model loaded successfully!")
-    return generator
+    return {
+        "tokenizer": tokenizer,
+        "model": model,
+        "prefix_cache": prefix_cache,
+        "boundary": boundary,
+        "eos_token_ids": eos_token_ids(model, tokenizer),
+    }
 
 
 # -----------------------------
@@ -65,60 +95,78 @@ def load_model():
         "pydantic"
     ])
 )
-def refine_query(context, user_query: str, max_new_tokens: int = 100):
+def refine_query(context, user_query: str = "", max_new_tokens: int = MAX_NEW_TOKENS, user_queries: list[str] | None = None, traceparent: str | None = None):
     """
     Query Refiner Endpoint for RAG using Qwen 1.5B with deterministic, 
     search-optimized prompting.
+
+    Accepts either a single `user_query` or a batch of `user_queries`. A batch is
+    run through the pipeline in one padded generation call and returned as
+    `refined_queries` (same order as the input).
+
+    Generation stops at the first sentence boundary (period or newline), which is where
+    `clean_refined_output` cuts anyway. `tokens_generated` reports the decoded tokens.
+    `timings` reports the handler's compute time under the caller's `traceparent`.
     """
+    trace = EndpointTrace("refine", traceparent)
 
-    # 1. Define the System Prompt/Instruction (STRICT OUTPUT)
-    system_prompt = (
-        "You are a Query Refiner Assistant for a Retrieval-Augmented Generation (RAG) system. "
-        "Your task: Rewrite the user's query into a clearer, more explicit version optimized for embedding-based similarity search. "
-        "It MUST be short, precise, and focused on the user's intent. "
-        "The refined query must be ONE sentence under 30 words. "
-        "Do NOT include explanations, politeness, or extra text. Output ONLY the refined query."
-    )
-    
-    # 2. Construct the full ChatML-style prompt
-    refinement_prompt = (
-        f"<|im_start|>system\n{system_prompt}<|im_end|>\n"
-        f"<|im_start|>user\nUser query: {user_query}<|im_end|>\n"
-        f"<|im_start|>assistant\n"
-    )
+    # The model, tokenizer and cached prefix are retrieved from the context (return value of on_start)
+    tokenizer = context.on_start_value["tokenizer"]
+    model = context.on_start_value["model"]
+    prefix_cache = context.on_start_value["prefix_cache"]
+    boundary = context.on_start_value["boundary"]
+    stop_ids = context.on_start_value["eos_token_ids"]
+
+    # Batch mode: one left-padded generation call for the whole list
+    if user_queries is not None:
+        if not user_queries:
+            return {"original_queries": [], "refined_queries": [], "timings": trace.finish(batch_size=0)}
+        refinement_prompts = [build_refinement_prompt(query) for query in user_queries]
+        encoded = tokenizer(refinement_prompts, return_tensors="pt", padding=True, add_special_tokens=False).to(model.device)
+        prompt_length = encoded["input_ids"].shape[1]
+        outputs = model.generate(
+            **encoded,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.eos_token_id,
+            # Each row stops at its own boundary; finished rows are padded until all are done
+            stopping_criteria=StoppingCriteriaList([SentenceBoundaryCriteria(boundary, prompt_length)])
+        )
+        tokens_generated = [
+            boundary.count_generated(output[prompt_length:].tolist(), stop_ids) for output in outputs
+        ]
+        print(f"🔢 Tokens generated per query: {tokens_generated}")
+        return {
+            "original_queries": user_queries,
+            "refined_queries": [
+                clean_refined_output(tokenizer.decode(output[prompt_length:], skip_special_tokens=True))
+                for output in outputs
+            ],
+            "tokens_generated": tokens_generated,
+            "timings": trace.finish(batch_size=len(user_queries))
+        }
 
-    # The generator is retrieved from the context, which holds the return value of on_start
-    generator = context.on_start_value 
+    # Only the query part is prefilled; the system prompt comes from the cached prefix
+    input_ids = prefix_cache.build_input_ids(tokenizer, build_refinement_suffix(user_query))
 
     # Deterministic generation (Greedy decoding)
-    outputs = generator(
-        refinement_prompt,
+    outputs = prefix_cache.generate(
+        input_ids,
         max_new_tokens=max_new_tokens,
         do_sample=False,        # <-- Ensures deterministic output
-        pad_token_id=generator.tokenizer.eos_token_id,
-        return_full_text=False # Crucial for getting only the new generated text
+        pad_token_id=tokenizer.eos_token_id,
+        # Stop at the first period/newline instead of decoding text the cleanup throws away
+        stopping_criteria=StoppingCriteriaList([SentenceBoundaryCriteria(boundary, input_ids.shape[1])])
     )
 
-    full_output = outputs[0]["generated_text"]
-    
-    # ----------------------------------------
-    # Aggressive Cleanup Logic
-    # ----------------------------------------
-    refined = full_output.strip()
-
-    # Step 1: Trim the output to the first line
-    refined = refined.split('\n')[0].strip()
-    
-    # Step 2: Aggressively remove everything after the first period ('.') 
-    if '.' in refined:
-        refined = refined.split('.')[0] + '.'
-    
-    # Step 3: Final trim
-    refined = refined.strip()
-    
-    # ----------------------------------------
+    # Decode only the new generated text
+    new_tokens = outputs[0][input_ids.shape[1]:]
+    full_output = tokenizer.decode(new_tokens, skip_special_tokens=True)
+    print(f"🔢 Tokens generated: {len(new_tokens)}")
 
     return {
         "original_query": user_query,
-        "refined_query": refined
-    }
\ No newline at end of file
+        "refined_query": clean_refined_output(full_output),
+        "tokens_generated": len(new_tokens),
+        "timings": trace.finish(batch_size=1)
+    }
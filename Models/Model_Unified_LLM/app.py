@@ -0,0 +1,259 @@
+from beam import asgi, Image
+from fastapi import FastAPI
+from pydantic import BaseModel
+from transformers import AutoTokenizer, AutoModelForCausalLM
+import torch
+import os
+import sys
+from pathlib import Path
+
+# Shared helpers live in Models/model_runtime (deploy from the Models/ directory so it is uploaded)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from model_runtime.cpu_inference import configure_cpu_threads, prepare_cpu_model
+from model_runtime.prefix_cache import PrefixCache
+from model_runtime.prompts import (
+    REFINEMENT_PREFIX,
+    answer_input_ids,
+    build_refinement_suffix,
+    clean_refined_output,
+    extract_final_answer,
+    static_answer_prefix,
+)
+from model_runtime.scheduler import ContinuousBatchScheduler
+from model_runtime.speculative import PromptLookupDecoder
+from model_runtime.stopping import SentenceBoundary, eos_token_ids
+from model_runtime.tracing import EndpointTrace
+
+# ============================================================
+# Configuration
+# ============================================================
+MODEL_ID = "Qwen/Qwen2.5-1.5B-Instruct"
+# Sequences decoded together across all roles (also the container concurrency)
+MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", "16"))
+
+
+# ============================================================
+# Model Loading for Beam
+# ============================================================
+def load_model():
+    """
+    Loads Qwen once for every role: the tokenizer, the model, one prefix cache per role
+    prompt and the continuous batching scheduler shared by all routes.
+    """
+    print(f"🚀 Loading model: {MODEL_ID}")
+
+    hf_token = os.getenv("HUGGINGFACE_HUB_TOKEN")
+    if not hf_token:
+        raise ValueError("❌ Missing Hugging Face token! Set HUGGINGFACE_HUB_TOKEN in Beam secrets.")
+    else:
+        print("✅ Hugging Face token found. Authenticating...")
+
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, token=hf_token)
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_ID,
+        token=hf_token,
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        device_map="auto"
+    )
+    if not torch.cuda.is_available():
+        # int8 dynamic quantization by default (CPU_QUANTIZATION=int8|bf16|fp32), CPU_NUM_THREADS threads
+        print(f"✅ Target: CPU with {configure_cpu_threads()} threads.")
+        model = prepare_cpu_model(model)
+
+    # The static part of each role prompt is prefilled once
+    refine_cache = PrefixCache.from_text(model, tokenizer, REFINEMENT_PREFIX)
+    answer_cache = PrefixCache.from_text(model, tokenizer, static_answer_prefix(tokenizer))
+    print(f"✅ Cached {refine_cache.prefix_length} refine and {answer_cache.prefix_length} answer prompt tokens.")
+
+    # Stop on every EOS the model was trained with (<|im_end|> and <|endoftext|>), like generate() does
+    stop_ids = eos_token_ids(model, tokenizer)
+    scheduler = ContinuousBatchScheduler(
+        model,
+        eos_token_id=stop_ids,
+        max_batch_size=MAX_BATCH_SIZE,
+        prefix_caches=[refine_cache, answer_cache],
+    )
+    print(f"✅ Model loaded successfully! Continuous batching across roles (max batch size {MAX_BATCH_SIZE}).")
+
+    # Refinements stop at the first period/newline (cleanup discards the rest)
+    boundary = SentenceBoundary(tokenizer)
+
+    # Opt-in prompt-lookup speculative decoding for single answers
+    speculative_decoder = PromptLookupDecoder(model, prefix_caches=[answer_cache])
+
+    return {
+        "tokenizer": tokenizer,
+        "model": model,
+        "eos_token_ids": stop_ids,
+        "refine_cache": refine_cache,
+        "answer_cache": answer_cache,
+        "scheduler": scheduler,
+        "speculative_decoder": speculative_decoder,
+        "boundary": boundary,
+    }
+
+
+# ============================================================
+# Request Models (role-specific decoding defaults)
+# ============================================================
+class RefineRequest(BaseModel):
+    user_query: str = ""
+    user_queries: list[str] | None = None
+    max_new_tokens: int = 48  # one sentence under 30 words; generation stops at the first boundary
+    traceparent: str | None = None
+
+
+class AnswerRequest(BaseModel):
+    rag_context: str = ""
+    user_query: str = ""
+    batch: list[dict] | None = None
+    clarify_query: bool = False
+    speculative: bool = False
+    max_new_tokens: int = 400
+    traceparent: str | None = None
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    max_new_tokens: int = 256
+    temperature: float = 0.7
+    top_p: float = 0.9
+    traceparent: str | None = None
+
+
+# ============================================================
+# Beam ASGI App
+# ============================================================
+@asgi(
+    name="qwen-1_5b-unified",
+    on_start=load_model,
+    secrets=["HUGGINGFACE_HUB_TOKEN"],
+    gpu="RTX4090",
+    concurrent_requests=MAX_BATCH_SIZE, # Requests of every role share the scheduler's decode batch
+    image=Image().add_python_packages([
+        "torch",
+        "transformers",
+        "accelerate",
+        "pydantic",
+        "fastapi"
+    ])
+)
+def web_server(context):
+    """
+    One model server for the three LLM roles. The request and response bodies match the
+    standalone endpoints, so the backend only needs its URLs pointed at these routes:
+
+        POST /refine    – query refinement (greedy, short), same contract as Model_Query_LLM
+        POST /answer    – grounded answer generation (greedy), same contract as Model_AnswerGenerator_LLM
+        POST /generate  – free generation with sampling, same contract as Models_LLM
+        GET  /health    – scheduler statistics
+    """
+    state = context.on_start_value
+    tokenizer = state["tokenizer"]
+    scheduler = state["scheduler"]
+    refine_cache = state["refine_cache"]
+    answer_cache = state["answer_cache"]
+    speculative_decoder = state["speculative_decoder"]
+    boundary = state["boundary"]
+    stop_ids = state["eos_token_ids"]
+
+    app = FastAPI(title="Unified Qwen LLM service")
+
+    # Handlers are plain `def`s: FastAPI runs them in its thread pool, where they block on
+    # the scheduler while it decodes every in-flight request in one batch. Every response
+    # carries `timings` (scheduler queue wait vs. compute) for the caller's trace.
+
+    @app.post("/refine")
+    def refine(request: RefineRequest):
+        trace = EndpointTrace("refine", request.traceparent)
+
+        def submit(query):
+            input_ids = refine_cache.build_input_ids(tokenizer, build_refinement_suffix(query))
+            return scheduler.submit(input_ids, request.max_new_tokens, stop_condition=boundary.reached)
+
+        def clean(generated):
+            return clean_refined_output(tokenizer.decode(generated, skip_special_tokens=True))
+
+        if request.user_queries is not None:
+            futures = [submit(query) for query in request.user_queries]
+            generated = [future.result() for future in futures]
+            trace.waited_for(futures)
+            return {
+                "original_queries": request.user_queries,
+                "refined_queries": [clean(tokens) for tokens in generated],
+                "tokens_generated": [len(tokens) for tokens in generated],
+                "timings": trace.finish(batch_size=len(futures))
+            }
+
+        future = submit(request.user_query)
+        generated = future.result()
+        trace.waited_for([future])
+        return {
+            "original_query": request.user_query,
+            "refined_query": clean(generated),
+            "tokens_generated": len(generated),
+            "timings": trace.finish(batch_size=1)
+        }
+
+    @app.post("/answer")
+    def answer(request: AnswerRequest):
+        trace = EndpointTrace("answer", request.traceparent)
+
+        def answer_one(future):
+            return extract_final_answer(tokenizer.decode(future.result(), skip_special_tokens=True))
+
+        if request.batch is not None:
+            futures = [
+                scheduler.submit(answer_input_ids(tokenizer, answer_cache, item["rag_context"], item["user_query"], item.get("clarify_query", False)), request.max_new_tokens)
+                for item in request.batch
+            ]
+            answers = [answer_one(future) for future in futures]
+            trace.waited_for(futures)
+            return {
+                "user_queries": [item["user_query"] for item in request.batch],
+                "answers": answers,
+                "timings": trace.finish(batch_size=len(futures))
+            }
+
+        input_ids = answer_input_ids(tokenizer, answer_cache, request.rag_context, request.user_query, request.clarify_query)
+        if request.speculative:
+            generated, stats = speculative_decoder.generate(input_ids, request.max_new_tokens, stop_ids)
+            return {
+                "user_query": request.user_query,
+                "answer": extract_final_answer(tokenizer.decode(generated, skip_special_tokens=True)),
+                "speculative": stats.as_dict(),
+                "timings": trace.finish(batch_size=1, speculative=True)
+            }
+        future = scheduler.submit(input_ids, request.max_new_tokens)
+        answer_text = answer_one(future)
+        trace.waited_for([future])
+        return {
+            "user_query": request.user_query,
+            "answer": answer_text,
+            "timings": trace.finish(batch_size=1)
+        }
+
+    @app.post("/generate")
+    def generate(request: GenerateRequest):
+        trace = EndpointTrace("generate", request.traceparent)
+        input_ids = tokenizer(request.prompt, return_tensors="pt").input_ids
+        future = scheduler.submit(
+            input_ids,
+            request.max_new_tokens,
+            temperature=request.temperature,
+            top_p=request.top_p,
+        )
+        generated = future.result()
+        trace.waited_for([future])
+        # Like the text-generation pipeline, the response includes the prompt
+        return {
+            "prompt": request.prompt,
+            "response": request.prompt + tokenizer.decode(generated, skip_special_tokens=True),
+            "timings": trace.finish(batch_size=1)
+        }
+
+    @app.get("/health")
+    def health():
+        return {"model": MODEL_ID, "scheduler": scheduler.stats()}
+
+    return app
@@ -2,6 +2,13 @@ from beam import endpoint, Image
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 import torch
 import os
+import sys
+from pathlib import Path
+
+# Shared helpers live in Models/model_runtime (deploy from the Models/ directory so it is uploaded)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from model_runtime.cpu_inference import configure_cpu_threads, prepare_cpu_model
+from model_runtime.tracing import EndpointTrace
 
 # -----------------------------
 # Model setup
@@ -26,6 +33,10 @@ def load_model():
         torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
         device_map="auto"
     )
+    if not torch.cuda.is_available():
+        # int8 dynamic quantization by default (CPU_QUANTIZATION=int8|bf16|fp32), CPU_NUM_THREADS threads
+        print(f"✅ Target: CPU with {configure_cpu_threads()} threads.")
+        model = prepare_cpu_model(model)
 
     # Create text generation pipeline
     generator = pipeline(
@@ -55,7 +66,7 @@ def load_model():
         "pydantic"
     ])
 )
-def generate_text(context, prompt: str, max_new_tokens: int = 256, temperature: float = 0.7, top_p: float = 0.9):
+def generate_text(context, prompt: str, max_new_tokens: int = 256, temperature: float = 0.7, top_p: float = 0.9, traceparent: str | None = None):
     """
     Beam endpoint for text generation using Qwen2.5-1.5B-Instruct.
 
@@ -65,10 +76,12 @@ def generate_text(context, prompt: str, max_new_tokens: int = 256, temperature:
         max_new_tokens: Max number of tokens to generate.
         temperature: Sampling temperature for creativity.
         top_p: Nucleus sampling parameter.
+        traceparent: The caller's W3C trace context (echoed in `timings`).
 
     Returns:
         JSON object containing the generated response.
     """
+    trace = EndpointTrace("generate", traceparent)
     generator = context.on_start_value
     outputs = generator(
         prompt,
@@ -79,4 +92,4 @@ def generate_text(context, prompt: str, max_new_tokens: int = 256, temperature:
         pad_token_id=generator.tokenizer.eos_token_id
     )
 
-    return {"prompt": prompt, "response": outputs[0]["generated_text"]}
+    return {"prompt": prompt, "response": outputs[0]["generated_text"], "timings": trace.finish()}
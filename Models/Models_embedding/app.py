@@ -3,19 +3,40 @@ import torch
 from beam import endpoint, Image
 from sentence_transformers import SentenceTransformer
 import os
+import sys
+from pathlib import Path
+
+# Shared helpers live in Models/model_runtime (deploy from the Models/ directory so it is uploaded)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from model_runtime.tracing import EndpointTrace
+
+from batcher import DynamicBatcher
+from matryoshka import FULL_DIMENSION, truncate_and_normalize, validate_dimension
+
+# -----------------------------
+# Configuration
+# -----------------------------
+MODEL_ID = "google/embeddinggemma-300m"
+# Dynamic batching: concurrent requests are merged for up to MAX_WAIT_MS or MAX_BATCH_SIZE texts
+MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "64"))
+MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+# Default output size (Matryoshka truncation of the 768-dim output); must match the backend's EMBEDDING_DIM
+EMBEDDING_DIM = validate_dimension(int(os.getenv("EMBEDDING_DIM", str(FULL_DIMENSION))))
 
 
 # -----------------------------
 # Define request structure
 # -----------------------------
 class EmbedRequest(BaseModel):
-    input: list[str]
+    input: list[str] | str
+    dimensions: int | None = None
+    traceparent: str | None = None
 
 
 # -----------------------------
 # Model loading
 # -----------------------------
-def load_model():
+def load_model(model_id: str = MODEL_ID):
     print("🚀 Loading EmbeddingGemma model...")
 
     hf_token = os.getenv("HUGGINGFACE_HUB_TOKEN")
@@ -26,13 +47,19 @@ def load_model():
 
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model = SentenceTransformer(
-        "google/embeddinggemma-300m",
+        model_id,
         device=device,
         use_auth_token=hf_token,
     )
 
     print("✅ Model loaded successfully!")
-    return model
+
+    # One background batcher per container: concurrent requests share encode() calls
+    return DynamicBatcher(
+        lambda texts: model.encode(texts, batch_size=MAX_BATCH_SIZE, convert_to_numpy=True).tolist(),
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=MAX_WAIT_MS,
+    )
 
 
 # -----------------------------
@@ -43,22 +70,33 @@ def load_model():
     on_start=load_model,
     secrets=["HUGGINGFACE_HUB_TOKEN"],  # ensure token is injected
     workers = 1,
+    # Let requests overlap inside the single worker so the batcher can merge them
+    concurrent_requests = 32,
     gpu = "RTX4090",
     image=Image().add_python_packages([
         "torch",
         "sentence-transformers",
         "pydantic",
+        "numpy",
     ])
 )
-def embed(context, input: str):
-    """Generate embeddings for the input text using EmbeddingGemma model."""
-    # Retrieve preloaded model from context
-    model = context.on_start_value
+def embed(context, input: list[str] | str, dimensions: int | None = None, traceparent: str | None = None):
+    """Generate embeddings for the input text(s) using EmbeddingGemma model."""
+    trace = EndpointTrace("embed", traceparent)
+    # Retrieve the preloaded batcher (wrapping the model) from context
+    batcher = context.on_start_value
 
-    # Encode query and documents
-    query_embedding = model.encode(input, convert_to_tensor=True)
+    # Accept a single string as a batch of one
+    texts = [input] if isinstance(input, str) else input
+    dimension = validate_dimension(dimensions or EMBEDDING_DIM)
 
-    embedding = query_embedding.cpu().tolist()
+    # Encode together with any other requests that arrived in the same window.
+    # Batches always run at full size, so callers asking for different dimensions can share them.
+    future = batcher.submit(texts)
+    embeddings = future.result()
+    trace.waited_for([future])
+    if dimension != FULL_DIMENSION:
+        embeddings = truncate_and_normalize(embeddings, dimension)
 
-    # Return the results as a JSON response
-    return {"embedding": embedding}
\ No newline at end of file
+    # Return the results as a JSON response (timings: batcher wait vs. encoding, for tracing)
+    return {"embeddings": embeddings, "timings": trace.finish(texts=len(texts))}
@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from model_runtime.tracing import TimedFuture
+
+
+# -----------------------------
+# Dynamic request batching
+# -----------------------------
+class _PendingRequest:
+    """One caller's texts plus the future its embeddings are delivered through."""
+    __slots__ = ("texts", "future")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: TimedFuture = TimedFuture()
+
+
+_STOP = object()
+
+
+class DynamicBatcher:
+    """
+    Collects concurrent embedding requests for a few milliseconds and encodes them together.
+
+    Every request handler calls `embed(texts)`. A single background thread takes the first
+    waiting request, keeps collecting more until `max_wait_ms` has passed or `max_batch_size`
+    texts are queued, runs `encode_fn` once on the concatenated texts and hands each caller
+    back its own slice of the result.
+
+    Args:
+        encode_fn: Maps a list of texts to a list of vectors (e.g. `SentenceTransformer.encode`).
+        max_batch_size: Stop collecting once this many texts are waiting.
+        max_wait_ms: How long the first request of a batch waits for company.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+
+        self.batches = 0    # encode calls made
+        self.requests = 0   # requests served
+        self.texts = 0      # texts encoded
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> TimedFuture:
+        """Queue texts for the next batch and return a future for their embeddings."""
+        request = _PendingRequest(list(texts))
+        if not request.texts:
+            request.future.set_result([])
+        else:
+            self._queue.put(request)
+        return request.future
+
+    def embed(self, texts: List[str], timeout: float | None = None) -> List[List[float]]:
+        """Blocking helper used by the endpoint: submit and wait for the result."""
+        return self.submit(texts).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        """Counters to check how well concurrent requests are being merged."""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_texts_per_batch": self.texts / self.batches if self.batches else 0.0,
+        }
+
+    def close(self) -> None:
+        """Stop the background thread after the queued requests are served."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            pending = [first]
+            queued_texts = len(first.texts)
+            deadline = time.monotonic() + self.max_wait_seconds
+            stop = False
+
+            # Keep collecting until the window closes or the batch is full
+            while queued_texts < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stop = True
+                    break
+                pending.append(request)
+                queued_texts += len(request.texts)
+
+            self._encode_batch(pending)
+            if stop:
+                return
+
+    def _encode_batch(self, pending: List[_PendingRequest]) -> None:
+        texts = [text for request in pending for text in request.texts]
+        for request in pending:
+            request.future.mark_started()
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as error:
+            for request in pending:
+                request.future.set_exception(error)
+            return
+
+        self.batches += 1
+        self.requests += len(pending)
+        self.texts += len(texts)
+
+        # Split the batch result back into each caller's share
+        offset = 0
+        for request in pending:
+            count = len(request.texts)
+            request.future.set_result(vectors[offset:offset + count])
+            offset += count
@@ -0,0 +1,33 @@
+import numpy as np
+
+
+# -----------------------------
+# Matryoshka output dimensions
+# -----------------------------
+# EmbeddingGemma is trained so that the leading 512/256/128 values of its 768-dim
+# output are usable embeddings on their own.
+FULL_DIMENSION = 768
+SUPPORTED_DIMENSIONS = (768, 512, 256, 128)
+
+
+def validate_dimension(dimension: int) -> int:
+    """Reject dimensions the model was not trained to truncate to."""
+    if dimension not in SUPPORTED_DIMENSIONS:
+        raise ValueError(f"Unsupported embedding dimension {dimension}; choose one of {SUPPORTED_DIMENSIONS}")
+    return dimension
+
+
+def truncate_and_normalize(vectors, dimension: int) -> list[list[float]]:
+    """
+    Keep the first `dimension` values of each vector and rescale it back to unit length.
+
+    Truncation shortens the vector, so it is renormalized to keep cosine and dot-product
+    scores comparable with the full-size embeddings.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.size == 0:
+        return []
+    truncated = matrix[:, :dimension]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (truncated / norms).tolist()
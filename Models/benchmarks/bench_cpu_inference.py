@@ -0,0 +1,143 @@
+"""
+Benchmark: CPU inference modes (fp32 vs int8 dynamic quantization vs bf16)
+
+Loads the model once per mode, converts it with prepare_cpu_model, and reports greedy decoding
+tokens/sec, prefill latency, weight memory and process RSS growth, plus how many generated
+tokens agree with the fp32 output (quantization changes logits slightly, so greedy paths can
+diverge after a few tokens).
+
+Uses a small instruct model by default so it runs on a laptop CPU. --tiny uses a randomly
+initialised model instead (no download; same shapes as a ~100M model, outputs are noise).
+
+Usage (from Models/):
+    python benchmarks/bench_cpu_inference.py --model Qwen/Qwen2.5-0.5B-Instruct --threads 4
+    python benchmarks/bench_cpu_inference.py --model Qwen/Qwen2.5-1.5B-Instruct --modes fp32 int8
+    python benchmarks/bench_cpu_inference.py --tiny --threads 1
+"""
+import argparse
+import gc
+import json
+import resource
+import sys
+import time
+from pathlib import Path
+
+import torch
+import transformers
+
+MODELS_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(MODELS_DIR))
+
+from model_runtime.cpu_inference import CPU_MODES, configure_cpu_threads, model_memory_bytes, prepare_cpu_model
+from model_runtime.prompts import build_answer_messages
+
+SAMPLE_CONTEXT = (
+    "Uploaded files are split into parent chunks of 2000 characters and child chunks of 400 characters. "
+    "Child chunks are embedded and stored in the rag_child_vectors collection."
+)
+SAMPLE_QUESTION = "Where are child chunks stored?"
+
+
+def load(args):
+    if args.tiny:
+        torch.manual_seed(0)
+        config = transformers.Qwen2Config(
+            vocab_size=32000, hidden_size=512, intermediate_size=1408, num_hidden_layers=6,
+            num_attention_heads=8, num_key_value_heads=2, max_position_embeddings=2048,
+        )
+        return None, transformers.AutoModelForCausalLM.from_config(config).eval()
+    tokenizer = transformers.AutoTokenizer.from_pretrained(args.model)
+    model = transformers.AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+    return tokenizer, model
+
+
+def prompt_ids(tokenizer) -> torch.Tensor:
+    if tokenizer is None:
+        torch.manual_seed(1)
+        return torch.randint(0, 32000, (1, 96))
+    text = tokenizer.apply_chat_template(build_answer_messages(SAMPLE_CONTEXT, SAMPLE_QUESTION), tokenize=False, add_generation_prompt=True)
+    return tokenizer(text, add_special_tokens=False, return_tensors="pt").input_ids
+
+
+def rss_mb() -> float:
+    """Peak resident set size of this process (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct")
+    parser.add_argument("--tiny", action="store_true", help="Use a random tiny model (no download)")
+    parser.add_argument("--modes", nargs="+", default=list(CPU_MODES), choices=CPU_MODES)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="Intra-op threads (as CPU_NUM_THREADS)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    threads = configure_cpu_threads(args.threads)
+    print(f"Model: {'tiny random' if args.tiny else args.model}, {threads} threads")
+
+    results, reference = [], None
+    # fp32 first so the other modes can be compared with its output
+    for mode in sorted(args.modes, key=lambda name: name != "fp32"):
+        rss_before = rss_mb()
+        tokenizer, model = load(args)
+        model = prepare_cpu_model(model, mode)
+        ids = prompt_ids(tokenizer)
+        eos = tokenizer.eos_token_id if tokenizer is not None else None
+
+        def run():
+            output = model.generate(
+                input_ids=ids, attention_mask=torch.ones_like(ids), max_new_tokens=args.max_new_tokens,
+                min_new_tokens=args.max_new_tokens, do_sample=False, pad_token_id=eos or 0, eos_token_id=eos,
+            )
+            return output[0, ids.shape[1]:].tolist()
+
+        with torch.inference_mode():
+            run()  # warm up kernels and allocator
+            started = time.perf_counter()
+            model(input_ids=ids)
+            prefill_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            for _ in range(args.repeats):
+                generated = run()
+            seconds = time.perf_counter() - started
+
+        if mode == "fp32":
+            reference = generated
+        agreement = None
+        if reference is not None:
+            agreement = next((index for index, (a, b) in enumerate(zip(generated, reference)) if a != b), len(generated))
+
+        results.append({
+            "mode": mode,
+            "tokens_per_sec": round(args.repeats * len(generated) / seconds, 1),
+            "prefill_ms": round(prefill_ms, 1),
+            "weights_mb": round(model_memory_bytes(model) / 2**20, 1),
+            "peak_rss_growth_mb": round(rss_mb() - rss_before, 1),
+            "tokens_matching_fp32": agreement,
+        })
+        del model
+        gc.collect()
+
+    fp32 = next((row for row in results if row["mode"] == "fp32"), None)
+    for row in results:
+        row["speedup"] = round(row["tokens_per_sec"] / fp32["tokens_per_sec"], 2) if fp32 else None
+
+    header = ["mode", "tokens_per_sec", "speedup", "prefill_ms", "weights_mb", "peak_rss_growth_mb", "tokens_matching_fp32"]
+    print(" | ".join(f"{column:>20}" for column in header))
+    for row in results:
+        print(" | ".join(f"{str(row[column]):>20}" for column in header))
+    print("Peak RSS only grows, so later modes show growth beyond the earlier peak (run one mode for absolute numbers).")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "model": "tiny" if args.tiny else args.model, "threads": threads, "results": results,
+        }, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
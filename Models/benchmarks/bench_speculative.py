@@ -0,0 +1,142 @@
+"""
+Benchmark: prompt-lookup speculative decoding on CPU
+
+Generates grounded answers for RAG-style prompts (the answer generator's prompt built from
+synthetic or user-supplied context) with plain greedy `model.generate` and with
+PromptLookupDecoder, and reports tokens/sec, speedup and draft acceptance.
+
+Uses a small instruct model by default so it runs on a laptop CPU. --tiny uses a randomly
+initialised model instead (no download; its greedy outputs are degenerate and repetitive,
+so those numbers only exercise the mechanics, not real acceptance rates).
+
+Usage (from Models/):
+    python benchmarks/bench_speculative.py --model Qwen/Qwen2.5-0.5B-Instruct --max-new-tokens 128
+    python benchmarks/bench_speculative.py --context-file ../backend/polished_chunks_debug.txt
+    python benchmarks/bench_speculative.py --tiny
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import torch
+import transformers
+
+MODELS_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(MODELS_DIR))
+
+from model_runtime.prompts import build_answer_messages
+from model_runtime.speculative import PromptLookupDecoder
+
+SAMPLE_CONTEXT = """
+The ingestion service accepts PDF, DOCX and TXT uploads. Each file is split into parent chunks of
+2000 characters, and every parent is further split into child chunks of 400 characters with an
+overlap of 50 characters. Child chunks are embedded with EmbeddingGemma and stored in the
+rag_child_vectors collection, while parent chunks are stored in the rag_parent_documents collection.
+At query time, the refined query is embedded, the top-k child chunks are retrieved, and the parent
+chunks they reference are passed to the answer generator as context.
+"""
+
+SAMPLE_QUESTIONS = [
+    "How are uploaded files chunked?",
+    "Where are child chunks and parent chunks stored?",
+    "What happens at query time?",
+]
+
+
+def load(args):
+    if args.tiny:
+        torch.manual_seed(0)
+        config = transformers.Qwen2Config(
+            vocab_size=32000, hidden_size=256, intermediate_size=704, num_hidden_layers=4,
+            num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=4096,
+        )
+        model = transformers.AutoModelForCausalLM.from_config(config).eval()
+        # No tokenizer: prompts are hashed words (see prompt_ids)
+        return None, model
+    tokenizer = transformers.AutoTokenizer.from_pretrained(args.model)
+    model = transformers.AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+    return tokenizer, model
+
+
+def prompt_ids(tokenizer, model, context: str, question: str) -> torch.Tensor:
+    if tokenizer is None:
+        words = (context + " " + question).split()
+        return torch.tensor([[zlib.crc32(word.encode()) % model.config.vocab_size for word in words]])
+    text = tokenizer.apply_chat_template(build_answer_messages(context, question), tokenize=False, add_generation_prompt=True)
+    return tokenizer(text, add_special_tokens=False, return_tensors="pt").input_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="Qwen/Qwen2.5-0.5B-Instruct")
+    parser.add_argument("--tiny", action="store_true", help="Use a random tiny model (no download)")
+    parser.add_argument("--context-file", help="Text file used as the retrieved context")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--draft-tokens", nargs="+", type=int, default=[5, 10, 20], help="num_draft_tokens values to try")
+    parser.add_argument("--max-ngram", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="torch.set_num_threads")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    tokenizer, model = load(args)
+    context = Path(args.context_file).read_text()[:6000] if args.context_file else SAMPLE_CONTEXT
+    prompts = [prompt_ids(tokenizer, model, context, question) for question in SAMPLE_QUESTIONS]
+    eos = tokenizer.eos_token_id if tokenizer is not None else -1
+    print(f"Model: {'tiny random' if args.tiny else args.model}, {len(prompts)} prompts of ~{prompts[0].shape[1]} tokens")
+
+    def run_greedy(ids):
+        output = model.generate(
+            input_ids=ids, attention_mask=torch.ones_like(ids), max_new_tokens=args.max_new_tokens,
+            do_sample=False, pad_token_id=eos if eos >= 0 else 0, eos_token_id=eos if eos >= 0 else None,
+        )
+        return output[0, ids.shape[1]:].tolist()
+
+    # Warm up kernels and allocator once
+    run_greedy(prompts[0][:, :32])
+
+    started = time.perf_counter()
+    baseline = [run_greedy(ids) for ids in prompts]
+    baseline_seconds = time.perf_counter() - started
+    baseline_tokens = sum(len(tokens) for tokens in baseline)
+    results = [{
+        "decoder": "greedy", "draft_tokens": None, "tokens_per_sec": round(baseline_tokens / baseline_seconds, 1),
+        "speedup": 1.0, "acceptance_rate": None, "tokens_per_forward": 1.0, "identical": True,
+    }]
+
+    for draft_tokens in args.draft_tokens:
+        decoder = PromptLookupDecoder(model, max_ngram=args.max_ngram, num_draft_tokens=draft_tokens)
+        drafted = accepted = passes = tokens = 0
+        identical = True
+        started = time.perf_counter()
+        for ids, expected in zip(prompts, baseline):
+            generated, stats = decoder.generate(ids, args.max_new_tokens, {eos})
+            identical &= generated == expected
+            drafted, accepted = drafted + stats.drafted, accepted + stats.accepted
+            passes, tokens = passes + stats.forward_passes, tokens + len(generated)
+        seconds = time.perf_counter() - started
+        results.append({
+            "decoder": "prompt-lookup", "draft_tokens": draft_tokens,
+            "tokens_per_sec": round(tokens / seconds, 1),
+            "speedup": round((tokens / seconds) / (baseline_tokens / baseline_seconds), 2),
+            "acceptance_rate": round(accepted / drafted, 3) if drafted else 0.0,
+            "tokens_per_forward": round(tokens / passes, 2),
+            "identical": identical,
+        })
+
+    header = ["decoder", "draft_tokens", "tokens_per_sec", "speedup", "acceptance_rate", "tokens_per_forward", "identical"]
+    print(" | ".join(f"{column:>18}" for column in header))
+    for row in results:
+        print(" | ".join(f"{str(row[column]):>18}" for column in header))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"model": "tiny" if args.tiny else args.model, "results": results}, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
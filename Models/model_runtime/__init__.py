@@ -0,0 +1 @@
+# Shared inference helpers for the Beam LLM endpoints (no Beam imports, so they can be tested locally)
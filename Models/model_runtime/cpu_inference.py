@@ -0,0 +1,79 @@
+import os
+import warnings
+from typing import Optional
+
+import torch
+
+
+# ============================================================
+# CPU inference: thread count and weight quantization
+# ============================================================
+CPU_MODES = ("int8", "bf16", "fp32")
+
+
+def configure_cpu_threads(num_threads: Optional[int] = None) -> int:
+    """
+    Sets the intra-op thread count used by CPU matmuls.
+
+    Defaults to the `CPU_NUM_THREADS` environment variable, else leaves PyTorch's choice
+    (one thread per physical core). Containers often report the host's cores rather than
+    their CPU quota, so pinning this to the allocated vCPUs avoids oversubscription.
+    Returns the thread count in effect.
+    """
+    if num_threads is None and os.getenv("CPU_NUM_THREADS"):
+        num_threads = int(os.environ["CPU_NUM_THREADS"])
+    if num_threads:
+        torch.set_num_threads(num_threads)
+        try:
+            # Only allowed before any inter-op parallel work has started
+            torch.set_num_interop_threads(max(1, min(num_threads, 4)))
+        except RuntimeError:
+            pass
+    return torch.get_num_threads()
+
+
+def prepare_cpu_model(model, mode: Optional[str] = None):
+    """
+    Converts a float32 model loaded on CPU for faster inference.
+
+    Modes (default from the `CPU_QUANTIZATION` environment variable, else "int8"):
+        - "int8": dynamic quantization of every nn.Linear (int8 weights, activations
+          quantized on the fly), ~4x smaller projection weights and faster matmuls;
+        - "bf16": bfloat16 weights, only faster on CPUs with native bf16 (AVX512-BF16/AMX);
+        - "fp32": unchanged.
+    Returns the model to use (quantization swaps modules, so always use the return value).
+    """
+    mode = (mode or os.getenv("CPU_QUANTIZATION", "int8")).lower()
+    if mode not in CPU_MODES:
+        raise ValueError(f"Unknown CPU inference mode '{mode}'. Expected one of {', '.join(CPU_MODES)}.")
+
+    if mode == "bf16":
+        return model.to(torch.bfloat16)
+    if mode == "int8":
+        with warnings.catch_warnings():
+            # torch.ao quantization warns that it is deprecated in favour of torchao, whose int8
+            # kernels are only fast under torch.compile; the eager dynamic kernels are faster here
+            warnings.simplefilter("ignore")
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def model_memory_bytes(model) -> int:
+    """Bytes held by the model's weights, counting packed int8 weights and tied tensors once."""
+    seen, total = set(), 0
+    for value in model.state_dict().values():
+        for tensor in _tensors(value):
+            if tensor.data_ptr() in seen:
+                continue
+            seen.add(tensor.data_ptr())
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def _tensors(value):
+    """Tensors inside a state_dict entry (quantized linears store a (weight, bias) tuple)."""
+    if isinstance(value, torch.Tensor):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _tensors(item)
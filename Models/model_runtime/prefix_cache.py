@@ -0,0 +1,81 @@
+import copy
+
+import torch
+
+
+# ============================================================
+# Prefix KV-cache reuse for constant system prompts
+# ============================================================
+def split_prompt_at(prompt_text: str, placeholder: str) -> str:
+    """
+    Returns the part of a rendered prompt that comes before `placeholder`.
+
+    Render the chat template once with a placeholder where the first variable field goes;
+    everything before it is identical for every request and can be prefilled once.
+    """
+    if placeholder not in prompt_text:
+        raise ValueError("Placeholder not found in the rendered prompt.")
+    return prompt_text.split(placeholder, 1)[0]
+
+
+class PrefixCache:
+    """
+    Holds the KV cache of a constant prompt prefix so each request only prefills its own suffix.
+
+    The prefix is run through the model once at startup. Every request gets a deep copy of
+    that cache (generation appends to it in place) and `generate` then only computes the
+    tokens after the prefix, which cuts time-to-first-token for long system prompts.
+
+    Args:
+        model: A loaded causal LM.
+        prefix_ids (torch.Tensor): Token ids of the constant prefix, shape (1, prefix_length).
+        prefix_text (str, optional): The text the ids were tokenized from.
+    """
+
+    def __init__(self, model, prefix_ids: torch.Tensor, prefix_text: str | None = None):
+        self.model = model
+        self.prefix_ids = prefix_ids.to(model.device)
+        self.prefix_text = prefix_text
+        with torch.no_grad():
+            self.cache = model(input_ids=self.prefix_ids, use_cache=True).past_key_values
+
+    @classmethod
+    def from_text(cls, model, tokenizer, prefix_text: str) -> "PrefixCache":
+        prefix_ids = tokenizer(prefix_text, add_special_tokens=False, return_tensors="pt").input_ids
+        return cls(model, prefix_ids, prefix_text)
+
+    @property
+    def prefix_length(self) -> int:
+        return self.prefix_ids.shape[1]
+
+    def build_input_ids(self, tokenizer, suffix_text: str) -> torch.Tensor:
+        """Prefix ids followed by the tokenized suffix, so the prefix tokens always match the cache."""
+        suffix_ids = tokenizer(suffix_text, add_special_tokens=False, return_tensors="pt").input_ids.to(self.model.device)
+        return torch.cat([self.prefix_ids, suffix_ids], dim=1)
+
+    def matches(self, input_ids: torch.Tensor) -> bool:
+        return (
+            input_ids.shape[0] == 1
+            and input_ids.shape[1] > self.prefix_length
+            and torch.equal(input_ids[:, :self.prefix_length], self.prefix_ids)
+        )
+
+    def cache_copy(self):
+        """A private copy of the prefix cache for one request."""
+        return copy.deepcopy(self.cache)
+
+    def generate(self, input_ids: torch.Tensor, **generate_kwargs) -> torch.Tensor:
+        """
+        `model.generate` for a single prompt that starts with the cached prefix.
+
+        Prompts that do not start with the prefix (or batches) fall back to a normal full prefill.
+        """
+        attention_mask = torch.ones_like(input_ids)
+        if not self.matches(input_ids):
+            return self.model.generate(input_ids=input_ids, attention_mask=attention_mask, **generate_kwargs)
+        return self.model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=self.cache_copy(),
+            **generate_kwargs
+        )
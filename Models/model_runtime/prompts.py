@@ -0,0 +1,168 @@
+import re
+
+from .prefix_cache import split_prompt_at
+
+
+# ============================================================
+# Role prompts shared by the LLM endpoints and the unified service
+# ============================================================
+
+
+# ------------------------------------------------------------
+# Query refinement
+# ------------------------------------------------------------
+# 1. Define the System Prompt/Instruction (STRICT OUTPUT)
+REFINER_SYSTEM_PROMPT = (
+    "You are a Query Refiner Assistant for a Retrieval-Augmented Generation (RAG) system. "
+    "Your task: Rewrite the user's query into a clearer, more explicit version optimized for embedding-based similarity search. "
+    "It MUST be short, precise, and focused on the user's intent. "
+    "The refined query must be ONE sentence under 30 words. "
+    "Do NOT include explanations, politeness, or extra text. Output ONLY the refined query."
+)
+
+
+# Everything before the user's query is identical for every request. It ends before the space
+# ahead of the query: byte-level BPE merges that space into the query's first word (" what"), so
+# the prefix and suffix tokenized separately give the same ids as the whole prompt.
+REFINEMENT_PREFIX = (
+    f"<|im_start|>system\n{REFINER_SYSTEM_PROMPT}<|im_end|>\n"
+    f"<|im_start|>user\nUser query:"
+)
+
+
+def build_refinement_suffix(user_query: str) -> str:
+    """The per-request part of the prompt that follows REFINEMENT_PREFIX."""
+    return (
+        f" {user_query}<|im_end|>\n"
+        f"<|im_start|>assistant\n"
+    )
+
+
+def build_refinement_prompt(user_query: str) -> str:
+    """Construct the full ChatML-style prompt for one user query."""
+    return REFINEMENT_PREFIX + build_refinement_suffix(user_query)
+
+
+def clean_refined_output(full_output: str) -> str:
+    """Aggressive cleanup: keep only the first line, up to and including the first period."""
+    refined = full_output.strip()
+
+    # Step 1: Trim the output to the first line
+    refined = refined.split('\n')[0].strip()
+
+    # Step 2: Aggressively remove everything after the first period ('.')
+    if '.' in refined:
+        refined = refined.split('.')[0] + '.'
+
+    # Step 3: Final trim
+    return refined.strip()
+
+
+# ------------------------------------------------------------
+# Answer generation
+# ------------------------------------------------------------
+# System Prompt: Highly specific RAG instructions.
+# It contains no per-request data, so its KV cache is computed once at startup (see PrefixCache).
+ANSWER_SYSTEM_PROMPT = """
+You are an intelligent, expert-level Answer Generation Assistant for a Retrieval-Augmented Generation (RAG) system. Your sole purpose is to synthesize a response based strictly on the provided context.
+
+### Instructions
+1.  **STRICT GROUNDING & REASONING:**
+    * Your answer MUST be derived **ONLY** from the text provided in the <CONTEXT> tags. **NEVER** use external knowledge, speculate, or invent facts.
+    * **Internal Verification:** Before writing, verify that the synthesized answer is fully supported by the <CONTEXT>. Do not show this verification step.
+    * **Source Text Adherence:** Where possible, directly use or closely paraphrase the **exact phrasing** from the source text to construct your answer to maintain high fidelity.
+
+2.  **UNANSWERABLE CONDITION:**
+    * If the <CONTEXT> does not contain sufficient information to fully answer the user's <QUERY>, you **MUST** respond with the **EXACT** phrase: `No answer found in the provided context.` Do not add any other text or formatting.
+
+3.  **FORMAT:**
+    * Produce a clear, highly structured, and easy-to-read answer. Use appropriate markdown (headings, bolding, bullet points) for readability.
+"""
+
+# Marks where the variable part of the prompt starts when rendering the static prefix
+CONTEXT_PLACEHOLDER = "\u0000RAG_CONTEXT\u0000"
+
+
+# Added when the query was not rewritten by the Query Refiner before retrieval
+CLARIFY_QUERY_INSTRUCTION = (
+    "The user query was not rewritten before retrieval and may be vague, conversational or misspelled. "
+    "First work out what the user most likely means given the context (do not show this step), then answer that.\n"
+)
+
+
+def build_answer_messages(rag_context: str, user_query: str, clarify_query: bool = False) -> list[dict]:
+    """Builds the system + user chat messages for one RAG question."""
+
+    # User's turn: the retrieved context (variable) comes after all static instructions,
+    # followed by the query and the request for the final output
+    clarification = CLARIFY_QUERY_INSTRUCTION if clarify_query else ""
+    user_prompt = f"""
+### Context for Grounding
+<CONTEXT>
+{rag_context}
+</CONTEXT>
+
+{clarification}Based ONLY on the context provided, answer the following user query:
+<QUERY>
+{user_query}
+</QUERY>
+
+Produce the final, structured answer here:
+<FINAL_ANSWER>
+"""
+
+    return [
+        {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def static_answer_prefix(tokenizer) -> str:
+    """
+    The rendered chat prompt up to the first variable field (the context), identical for every request.
+
+    It ends on the last letter before the context ("...<CONTEXT"), not on "<CONTEXT>\n": Qwen's
+    pre-tokenizer merges punctuation with the newlines after it (">\n\n" when the context starts
+    with a newline), so only a letter-to-punctuation boundary tokenizes the same on both sides.
+    """
+    rendered = tokenizer.apply_chat_template(
+        build_answer_messages(CONTEXT_PLACEHOLDER, ""),
+        tokenize=False,
+        add_generation_prompt=True
+    )
+    return re.sub(r"\W+$", "", split_prompt_at(rendered, CONTEXT_PLACEHOLDER))
+
+
+def answer_input_ids(tokenizer, prefix_cache, rag_context: str, user_query: str, clarify_query: bool = False):
+    """
+    Tokenized answer prompt. The static part is taken from `prefix_cache` (built from
+    `static_answer_prefix`) so its tokens always match the cached KV entries.
+    """
+    prompt_text = tokenizer.apply_chat_template(
+        build_answer_messages(rag_context, user_query, clarify_query),
+        tokenize=False,
+        add_generation_prompt=True # Essential for Instruct models
+    )
+    prefix_text = prefix_cache.prefix_text
+    if prompt_text.startswith(prefix_text):
+        return prefix_cache.build_input_ids(tokenizer, prompt_text[len(prefix_text):])
+    return tokenizer(prompt_text, add_special_tokens=False, return_tensors="pt").input_ids.to(prefix_cache.model.device)
+
+
+def extract_final_answer(decoded: str) -> str:
+    """Extract ONLY the answer (after <FINAL_ANSWER>) from the decoded generation."""
+
+    # 1. Clean up potential closing tags and initial whitespace
+    answer_only = decoded.strip()
+
+    # Simple cleanup of closing tags if the model appended them
+    if answer_only.endswith("</FINAL_ANSWER>"):
+        answer_only = answer_only.replace("</FINAL_ANSWER>", "").strip()
+
+    # 2. Check for the no-answer fallback phrase
+    if answer_only == "No answer found in the provided context.":
+        return answer_only
+
+    # Final safety cleanup: remove any text that might accidentally precede the answer,
+    # which can happen if the model re-starts the prompt structure.
+    return answer_only.split("<QUERY>")[0].split("</CONTEXT>")[-1].strip()
@@ -0,0 +1,333 @@
+import queue
+import threading
+from typing import Callable, List, Optional
+
+import torch
+from transformers import DynamicCache
+
+from model_runtime.tracing import TimedFuture
+
+
+# ============================================================
+# KV cache helpers
+# ============================================================
+def cache_to_layers(cache) -> List[tuple]:
+    """(key, value) tensors per layer, shaped (batch, kv_heads, length, head_dim)."""
+    if hasattr(cache, "layers"):          # transformers >= 4.56
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    if hasattr(cache, "key_cache"):       # DynamicCache before 4.56
+        return list(zip(cache.key_cache, cache.value_cache))
+    return [tuple(layer) for layer in cache]  # legacy tuple format
+
+
+def layers_to_cache(layers: List[tuple]):
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(layers))
+    return DynamicCache(tuple(layers))
+
+
+def _left_pad(tensor: torch.Tensor, amount: int, dim: int) -> torch.Tensor:
+    if amount == 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = amount
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+
+# ============================================================
+# Requests
+# ============================================================
+class GenerationRequest:
+    """One sequence being generated: its prompt, decoding settings, tokens so far and result future."""
+    __slots__ = ("input_ids", "max_new_tokens", "stop_token_ids", "stop_condition", "temperature", "top_p", "generated", "future")
+
+    def __init__(self, input_ids: torch.Tensor, max_new_tokens: int, stop_token_ids: set,
+                 temperature: float = 0.0, top_p: float = 1.0,
+                 stop_condition: Optional[Callable[[List[int]], bool]] = None):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.stop_token_ids = stop_token_ids
+        self.stop_condition = stop_condition
+        self.temperature = temperature
+        self.top_p = top_p
+        self.generated: List[int] = []
+        self.future: TimedFuture = TimedFuture()
+
+    def is_finished(self) -> bool:
+        return (
+            len(self.generated) >= self.max_new_tokens
+            or (bool(self.generated) and self.generated[-1] in self.stop_token_ids)
+            or (self.stop_condition is not None and self.stop_condition(self.generated))
+        )
+
+
+_STOP = object()
+
+
+def select_tokens(logits: torch.Tensor, requests: List[GenerationRequest]) -> torch.Tensor:
+    """
+    Next token for each row of `logits` (batch, vocab) using that row's decoding settings:
+    greedy when `temperature` is 0, otherwise temperature + nucleus (top-p) sampling.
+    """
+    tokens = logits.argmax(dim=-1)
+    rows = [row for row, request in enumerate(requests) if request.temperature > 0]
+    if not rows:
+        return tokens
+
+    index = torch.tensor(rows, device=logits.device)
+    temperature = torch.tensor([requests[row].temperature for row in rows], device=logits.device)
+    top_p = torch.tensor([requests[row].top_p for row in rows], device=logits.device)
+    probs = torch.softmax(logits.index_select(0, index).float() / temperature.unsqueeze(1), dim=-1)
+
+    # Keep the smallest set of most likely tokens whose mass reaches top_p (always at least one)
+    sorted_probs, sorted_ids = probs.sort(dim=-1, descending=True)
+    outside = sorted_probs.cumsum(dim=-1) - sorted_probs > top_p.unsqueeze(1)
+    sorted_probs = sorted_probs.masked_fill(outside, 0.0)
+    choice = torch.multinomial(sorted_probs, num_samples=1)
+    tokens[index] = sorted_ids.gather(1, choice).squeeze(1)
+    return tokens
+
+
+# ============================================================
+# Continuous batching scheduler
+# ============================================================
+class ContinuousBatchScheduler:
+    """
+    Decoding for many concurrent requests in one shared, continuously refilled batch.
+
+    A background thread owns the model. Between two decode steps (at token boundaries) it:
+        1. admits waiting requests: each is prefilled on its own (reusing the longest of
+           `prefix_caches` its prompt starts with) and merged into the running batch;
+        2. runs one decode step for every active sequence at once;
+        3. retires sequences that produced a stop token or reached `max_new_tokens`.
+
+    Sequences of different lengths share the batch through left padding: the padded KV cache
+    positions are masked out and every sequence gets its own position ids, so each one
+    decodes exactly as it would alone. A lone request runs the same B=1 loop as `generate`.
+    Each request carries its own decoding settings (greedy or temperature/top-p sampling),
+    so requests for different roles can share a batch.
+
+    Args:
+        model: A loaded causal LM.
+        eos_token_id (int | list[int]): Token(s) that end a sequence.
+        max_batch_size (int): Upper bound on sequences decoded together.
+        prefix_caches (list[PrefixCache], optional): Cached static prompt prefixes to skip during prefill.
+    """
+
+    def __init__(self, model, eos_token_id, max_batch_size: int = 8, prefix_caches=()):
+        self.model = model
+        self.eos_token_ids = set(eos_token_id if isinstance(eos_token_id, (list, tuple, set)) else [eos_token_id])
+        self.max_batch_size = max_batch_size
+        # Longest first, so a prompt uses the most specific cached prefix it starts with
+        self.prefix_caches = sorted(prefix_caches, key=lambda cache: cache.prefix_length, reverse=True)
+
+        # Running batch state (owned by the background thread)
+        self._active: List[GenerationRequest] = []
+        self._layers: Optional[List[tuple]] = None   # padded KV cache of the active batch
+        self._attention_mask: Optional[torch.Tensor] = None
+        self._last_tokens: Optional[torch.Tensor] = None
+
+        # Counters for throughput reporting
+        self.decode_steps = 0
+        self.tokens_generated = 0
+        self.batch_size_total = 0
+        self.peak_batch_size = 0
+
+        self._waiting: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="continuous-batcher", daemon=True)
+        self._thread.start()
+
+    # --- PUBLIC API ---
+
+    def submit(
+        self,
+        input_ids: torch.Tensor,
+        max_new_tokens: int,
+        stop_token_ids: Optional[set] = None,
+        temperature: float = 0.0,
+        top_p: float = 1.0,
+        stop_condition: Optional[Callable[[List[int]], bool]] = None,
+    ) -> TimedFuture:
+        """
+        Queues a prompt (shape (1, L) or (L,)); the future resolves to the generated token ids
+        and reports how long the prompt waited for admission (`future.queue_seconds`).
+        `temperature` 0 means greedy decoding. `stop_condition(generated)` can end a sequence
+        early (e.g. `SentenceBoundary.reached`).
+        """
+        request = GenerationRequest(
+            input_ids.reshape(1, -1).to(self.model.device),
+            max_new_tokens,
+            set(stop_token_ids) if stop_token_ids is not None else self.eos_token_ids,
+            temperature,
+            top_p,
+            stop_condition,
+        )
+        if max_new_tokens <= 0:
+            request.future.set_result([])
+        else:
+            self._waiting.put(request)
+        return request.future
+
+    def generate(self, input_ids: torch.Tensor, max_new_tokens: int, timeout: Optional[float] = None, **kwargs) -> List[int]:
+        """Blocking helper for request handlers."""
+        return self.submit(input_ids, max_new_tokens, **kwargs).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            "decode_steps": self.decode_steps,
+            "tokens_generated": self.tokens_generated,
+            "avg_batch_size": self.batch_size_total / self.decode_steps if self.decode_steps else 0.0,
+            "peak_batch_size": self.peak_batch_size,
+            "active": len(self._active),
+            "waiting": self._waiting.qsize(),
+        }
+
+    def close(self) -> None:
+        """Stops the loop once the active and queued requests are done."""
+        self._waiting.put(_STOP)
+        self._thread.join()
+
+    # --- SCHEDULING LOOP ---
+
+    def _run(self) -> None:
+        stopping = False
+        while True:
+            # Admit new sequences at the token boundary (block only when idle)
+            while len(self._active) < self.max_batch_size:
+                try:
+                    request = self._waiting.get(block=not self._active and not stopping)
+                except queue.Empty:
+                    break
+                if request is _STOP:
+                    stopping = True
+                    continue
+                self._admit(request)
+
+            if not self._active:
+                if stopping:
+                    return
+                continue
+
+            try:
+                self._decode_step()
+            except Exception as error:
+                self._fail_active(error)
+
+    def _fail_active(self, error: Exception) -> None:
+        for request in self._active:
+            if not request.future.done():
+                request.future.set_exception(error)
+        self._active, self._layers, self._attention_mask, self._last_tokens = [], None, None, None
+
+    @torch.no_grad()
+    def _admit(self, request: GenerationRequest) -> None:
+        request.future.mark_started()
+        try:
+            layers, first_token = self._prefill(request)
+            request.generated.append(first_token)
+            self.tokens_generated += 1
+            if request.is_finished():
+                request.future.set_result(request.generated)
+                return
+            merged = self._merge(layers, request.input_ids.shape[1], first_token)
+        except Exception as error:
+            # Only this request fails (e.g. OOM while merging); the running batch is left untouched
+            if not request.future.done():
+                request.future.set_exception(error)
+            return
+        self._layers, self._attention_mask, self._last_tokens = merged
+        self._active.append(request)
+
+    def _merge(self, layers: List[tuple], length: int, first_token: int):
+        """The batch state (KV layers, attention mask, last tokens) with a newly prefilled row added."""
+        mask = torch.ones((1, length), dtype=torch.long, device=self.model.device)
+        token = torch.tensor([[first_token]], device=self.model.device)
+        if not self._active:
+            return layers, mask, token
+
+        # Left-pad whichever side is shorter so the cache lengths line up, then stack the rows
+        current = self._attention_mask.shape[1]
+        pad_batch, pad_new = max(0, length - current), max(0, current - length)
+        merged_layers = [
+            (torch.cat([_left_pad(k, pad_batch, 2), _left_pad(nk, pad_new, 2)], dim=0),
+             torch.cat([_left_pad(v, pad_batch, 2), _left_pad(nv, pad_new, 2)], dim=0))
+            for (k, v), (nk, nv) in zip(self._layers, layers)
+        ]
+        attention_mask = torch.cat(
+            [_left_pad(self._attention_mask, pad_batch, 1), _left_pad(mask, pad_new, 1)], dim=0
+        )
+        return merged_layers, attention_mask, torch.cat([self._last_tokens, token], dim=0)
+
+    def _prefill(self, request: GenerationRequest):
+        """Runs one prompt alone; returns its KV cache layers and the first generated token."""
+        input_ids = request.input_ids
+        length = input_ids.shape[1]
+        start, past = 0, None
+        for prefix_cache in self.prefix_caches:
+            if prefix_cache.matches(input_ids):
+                start, past = prefix_cache.prefix_length, prefix_cache.cache_copy()
+                break
+
+        outputs = self.model(
+            input_ids=input_ids[:, start:],
+            attention_mask=torch.ones((1, length), dtype=torch.long, device=input_ids.device),
+            position_ids=torch.arange(start, length, device=input_ids.device).unsqueeze(0),
+            past_key_values=past,
+            use_cache=True,
+        )
+        first_token = int(select_tokens(outputs.logits[:, -1], [request])[0])
+        return cache_to_layers(outputs.past_key_values), first_token
+
+    @torch.no_grad()
+    def _decode_step(self) -> None:
+        batch_size = len(self._active)
+        # The new token's position is the number of real (unpadded) tokens before it
+        position_ids = self._attention_mask.sum(dim=1, keepdim=True)
+        attention_mask = torch.cat(
+            [self._attention_mask, self._attention_mask.new_ones((batch_size, 1))], dim=1
+        )
+
+        outputs = self.model(
+            input_ids=self._last_tokens,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=layers_to_cache(self._layers),
+            use_cache=True,
+        )
+        next_tokens = select_tokens(outputs.logits[:, -1], self._active)
+
+        self._layers = cache_to_layers(outputs.past_key_values)
+        self._attention_mask = attention_mask
+        self._last_tokens = next_tokens.unsqueeze(1)
+        self.decode_steps += 1
+        self.tokens_generated += batch_size
+        self.batch_size_total += batch_size
+        self.peak_batch_size = max(self.peak_batch_size, batch_size)
+
+        # Record the tokens and retire finished sequences
+        keep = []
+        for row, (request, token) in enumerate(zip(self._active, next_tokens.tolist())):
+            request.generated.append(token)
+            if request.is_finished():
+                request.future.set_result(request.generated)
+            else:
+                keep.append(row)
+
+        if len(keep) == batch_size:
+            return
+        if not keep:
+            self._active, self._layers, self._attention_mask, self._last_tokens = [], None, None, None
+            return
+
+        index = torch.tensor(keep, device=self._last_tokens.device)
+        self._active = [self._active[row] for row in keep]
+        self._attention_mask = self._attention_mask.index_select(0, index)
+        self._last_tokens = self._last_tokens.index_select(0, index)
+
+        # Drop leading columns that are padding for every remaining row
+        first_used = int(self._attention_mask.any(dim=0).nonzero()[0])
+        self._attention_mask = self._attention_mask[:, first_used:]
+        self._layers = [
+            (k.index_select(0, index)[:, :, first_used:], v.index_select(0, index)[:, :, first_used:])
+            for k, v in self._layers
+        ]
@@ -0,0 +1,122 @@
+from typing import List
+
+import torch
+
+
+# ============================================================
+# Prompt-lookup (n-gram) speculative decoding
+# ============================================================
+def find_draft(tokens: List[int], max_ngram: int = 3, num_draft_tokens: int = 10, min_ngram: int = 1) -> List[int]:
+    """
+    Drafts the next tokens by copying from earlier in the sequence.
+
+    Looks for the most recent earlier occurrence of the last `max_ngram` tokens (falling back
+    to shorter n-grams down to `min_ngram`) and returns up to `num_draft_tokens` tokens that
+    followed it. Answers that paraphrase the retrieved context repeat long spans of the
+    prompt, so these drafts are often right.
+    """
+    length = len(tokens)
+    for size in range(min(max_ngram, length - 1), min_ngram - 1, -1):
+        pattern = tokens[length - size:]
+        for start in range(length - size - 1, -1, -1):
+            if tokens[start:start + size] == pattern:
+                follow = start + size
+                return tokens[follow:min(follow + num_draft_tokens, length)]
+    return []
+
+
+class SpeculativeStats:
+    """Acceptance metrics of one speculative generation."""
+    __slots__ = ("drafted", "accepted", "forward_passes", "tokens_generated")
+
+    def __init__(self):
+        self.drafted = 0
+        self.accepted = 0
+        self.forward_passes = 0
+        self.tokens_generated = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "drafted": self.drafted,
+            "accepted": self.accepted,
+            "acceptance_rate": self.accepted / self.drafted if self.drafted else 0.0,
+            "forward_passes": self.forward_passes,
+            "tokens_per_forward": self.tokens_generated / self.forward_passes if self.forward_passes else 0.0,
+        }
+
+
+class PromptLookupDecoder:
+    """
+    Greedy decoding that verifies n-gram drafts from the prompt in a single forward pass.
+
+    Each step feeds the last token plus a draft from `find_draft`; the model's greedy
+    predictions are compared with the draft, the matching prefix is accepted together with
+    the model's own next token, and the KV cache is cropped back to the accepted length.
+    The output is therefore identical to plain greedy decoding, only with fewer forward
+    passes when drafts are accepted.
+
+    Args:
+        model: A loaded causal LM.
+        max_ngram (int): Longest n-gram matched when looking up drafts.
+        num_draft_tokens (int): Maximum tokens drafted per step.
+        prefix_caches (list[PrefixCache], optional): Cached static prompt prefixes to skip during prefill.
+    """
+
+    def __init__(self, model, max_ngram: int = 3, num_draft_tokens: int = 10, prefix_caches=()):
+        self.model = model
+        self.max_ngram = max_ngram
+        self.num_draft_tokens = num_draft_tokens
+        self.prefix_caches = sorted(prefix_caches, key=lambda cache: cache.prefix_length, reverse=True)
+
+    @torch.no_grad()
+    def generate(self, input_ids: torch.Tensor, max_new_tokens: int, stop_token_ids: set) -> tuple[List[int], SpeculativeStats]:
+        """Returns the generated token ids (prompt excluded) and the acceptance statistics."""
+        input_ids = input_ids.reshape(1, -1).to(self.model.device)
+        stats = SpeculativeStats()
+        if max_new_tokens <= 0:
+            return [], stats
+
+        # Prefill (through the prefix cache when the prompt starts with one)
+        start, past = 0, None
+        for prefix_cache in self.prefix_caches:
+            if prefix_cache.matches(input_ids):
+                start, past = prefix_cache.prefix_length, prefix_cache.cache_copy()
+                break
+        outputs = self.model(input_ids=input_ids[:, start:], past_key_values=past, use_cache=True)
+        stats.forward_passes += 1
+        cache = outputs.past_key_values
+
+        tokens = input_ids[0].tolist()
+        generated = [int(outputs.logits[0, -1].argmax())]
+
+        while len(generated) < max_new_tokens and generated[-1] not in stop_token_ids:
+            draft = find_draft(tokens + generated, self.max_ngram, self.num_draft_tokens)
+            draft = draft[:max_new_tokens - len(generated) - 1]
+            step_ids = torch.tensor([[generated[-1]] + draft], device=self.model.device)
+
+            outputs = self.model(input_ids=step_ids, past_key_values=cache, use_cache=True)
+            stats.forward_passes += 1
+            cache = outputs.past_key_values
+            predictions = outputs.logits[0].argmax(dim=-1).tolist()
+
+            # Accept the draft while it agrees with the model, then take the model's own token
+            accepted = 0
+            while accepted < len(draft) and predictions[accepted] == draft[accepted]:
+                accepted += 1
+            new_tokens = draft[:accepted] + [predictions[accepted]]
+            stats.drafted += len(draft)
+            stats.accepted += accepted
+
+            # Drop the KV entries of the rejected draft tokens (a negative crop removes that many)
+            rejected = len(draft) - accepted
+            if rejected:
+                cache.crop(-rejected)
+
+            for token in new_tokens:
+                generated.append(token)
+                if token in stop_token_ids or len(generated) >= max_new_tokens:
+                    break
+
+        stats.tokens_generated = len(generated)
+        return generated, stats
+
@@ -0,0 +1,73 @@
+from typing import List, Set
+
+import torch
+from transformers import StoppingCriteria
+
+
+def eos_token_ids(model, tokenizer) -> Set[int]:
+    """
+    Every token that ends a generation: the model's generation_config.eos_token_id (for Qwen
+    both <|im_end|> and <|endoftext|>) plus the tokenizer's EOS, as `model.generate` stops on.
+    """
+    configured = model.generation_config.eos_token_id
+    if configured is None:
+        configured = []
+    elif isinstance(configured, int):
+        configured = [configured]
+    ids = set(configured)
+    if tokenizer.eos_token_id is not None:
+        ids.add(tokenizer.eos_token_id)
+    return ids
+
+
+# ============================================================
+# Early stopping at sentence boundaries
+# ============================================================
+class SentenceBoundary:
+    """
+    Detects the end of the first sentence or line of a generation, token by token.
+
+    `clean_refined_output` keeps only the text up to the first period or the first line
+    (after stripping leading whitespace), so everything generated after that point is wasted.
+    The token sets are computed once at startup with one batched decode over the vocabulary:
+        - any token whose text contains "." ends the sentence;
+        - a token containing a newline ends it once some non-whitespace text was generated.
+    """
+
+    def __init__(self, tokenizer):
+        vocabulary = range(len(tokenizer))
+        texts = tokenizer.batch_decode([[token_id] for token_id in vocabulary])
+        self.period_ids = {token_id for token_id, text in zip(vocabulary, texts) if "." in text}
+        self.newline_ids = {token_id for token_id, text in zip(vocabulary, texts) if "\n" in text}
+        self.blank_ids = {token_id for token_id, text in zip(vocabulary, texts) if not text.strip()}
+
+    def reached(self, new_tokens: List[int]) -> bool:
+        """True when the last of `new_tokens` completes the first sentence or line."""
+        if not new_tokens:
+            return False
+        last = new_tokens[-1]
+        if last in self.period_ids:
+            return True
+        return last in self.newline_ids and any(token not in self.blank_ids for token in new_tokens)
+
+    def count_generated(self, new_tokens: List[int], stop_ids: Set[int]) -> int:
+        """Tokens actually decoded for one row: up to its boundary or any EOS in `stop_ids` (the rest is padding)."""
+        for index, token in enumerate(new_tokens):
+            if token in stop_ids or self.reached(new_tokens[:index + 1]):
+                return index + 1
+        return len(new_tokens)
+
+
+class SentenceBoundaryCriteria(StoppingCriteria):
+    """`model.generate` stopping criteria: each row of the batch stops at its own boundary."""
+
+    def __init__(self, boundary: SentenceBoundary, prompt_length: int):
+        self.boundary = boundary
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.tensor(
+            [self.boundary.reached(row[self.prompt_length:].tolist()) for row in input_ids],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
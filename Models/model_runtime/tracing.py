@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from concurrent.futures import Future
+from typing import Iterable, Optional, Tuple
+
+
+# ============================================================
+# Queue timing
+# ============================================================
+class TimedFuture(Future):
+    """Future that remembers when its request was queued and when a worker started on it."""
+
+    def __init__(self):
+        super().__init__()
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+
+    def mark_started(self) -> None:
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+
+    @property
+    def queue_seconds(self) -> float:
+        """Time spent waiting for the batcher / scheduler (so far, if it has not started yet)."""
+        return (self.started_at if self.started_at is not None else time.perf_counter()) - self.submitted_at
+
+
+# ============================================================
+# Endpoint trace
+# ============================================================
+def parse_traceparent(header: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(trace_id, parent span id) from a W3C `traceparent` value, or (None, None)."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+class EndpointTrace:
+    """
+    Trace context and timing of one endpoint call.
+
+    The backend sends its `traceparent` in the request body (Beam endpoint functions only see
+    the body) and reads `timings` back from the response:
+        {"trace_id", "span_id", "queue_ms", "compute_ms"}
+    queue_ms is the longest wait of the call's requests for the batcher / scheduler; compute_ms
+    is the rest of the handler time. Every call is also printed as one JSON line, so the Beam
+    logs can be joined with the backend's spans by trace id.
+
+    Args:
+        endpoint (str): Name used in the log line (e.g. "answer").
+        traceparent (str, optional): The caller's W3C trace context.
+    """
+
+    def __init__(self, endpoint: str, traceparent: Optional[str] = None):
+        self.endpoint = endpoint
+        self.trace_id, self.parent_span_id = parse_traceparent(traceparent)
+        self.span_id = os.urandom(8).hex()
+        self.started_at = time.perf_counter()
+        self.queue_seconds = 0.0
+
+    def waited_for(self, futures: Iterable[Future]) -> None:
+        """Records the queue wait of the TimedFutures the handler submitted."""
+        waits = [future.queue_seconds for future in futures if isinstance(future, TimedFuture)]
+        self.queue_seconds = max(waits, default=0.0)
+
+    def finish(self, **attributes) -> dict:
+        """Logs the call and returns the `timings` dict for the response."""
+        total = time.perf_counter() - self.started_at
+        timings = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "queue_ms": round(self.queue_seconds * 1000, 1),
+            "compute_ms": round(max(total - self.queue_seconds, 0.0) * 1000, 1),
+        }
+        print(json.dumps({"event": "endpoint_call", "endpoint": self.endpoint, "parent_span_id": self.parent_span_id, **timings, **attributes}))
+        return timings
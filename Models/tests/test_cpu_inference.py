@@ -0,0 +1,77 @@
+"""
+Unit tests for model_runtime.cpu_inference
+Quantizes a tiny randomly initialised Qwen2 model (CPU, no download) and checks that it still
+generates with the shared decoders, that its weights shrink, and that the configuration is validated.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model_runtime.cpu_inference import configure_cpu_threads, model_memory_bytes, prepare_cpu_model
+from model_runtime.scheduler import ContinuousBatchScheduler
+from model_runtime.speculative import PromptLookupDecoder
+
+EOS_TOKEN_ID = 255
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = transformers.Qwen2Config(
+        vocab_size=256, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=1024,
+    )
+    return transformers.AutoModelForCausalLM.from_config(config).eval()
+
+
+def test_int8_quantization():
+    """Test that int8 quantization shrinks the weights and works with generate, the scheduler and speculative decoding"""
+    print("=== Test 1: int8 Dynamic Quantization ===\n")
+
+    model = _tiny_model()
+    fp32_bytes = model_memory_bytes(model)
+    quantized = prepare_cpu_model(model, "int8")
+    int8_bytes = model_memory_bytes(quantized)
+    assert int8_bytes < fp32_bytes, f"Quantized weights should be smaller: {int8_bytes} vs {fp32_bytes}"
+    assert not any(type(module) is torch.nn.Linear for module in quantized.modules()), "Every Linear is swapped"
+
+    prompt = torch.randint(0, 250, (1, 16))
+    expected = quantized.generate(
+        input_ids=prompt, attention_mask=torch.ones_like(prompt), max_new_tokens=10,
+        do_sample=False, pad_token_id=0, eos_token_id=EOS_TOKEN_ID,
+    )[0, 16:].tolist()
+
+    generated, _ = PromptLookupDecoder(quantized).generate(prompt, 10, {EOS_TOKEN_ID})
+    assert generated == expected, "Speculative decoding must match greedy on the quantized model"
+
+    scheduler = ContinuousBatchScheduler(quantized, eos_token_id=EOS_TOKEN_ID)
+    assert len(scheduler.generate(prompt, 10, timeout=60)) == len(expected)
+    scheduler.close()
+
+    print(f"✅ {fp32_bytes} -> {int8_bytes} bytes, decoders run on the quantized model\n")
+
+
+def test_modes_and_threads(monkeypatch):
+    """Test the bf16/fp32 modes, the env defaults and the thread configuration"""
+    print("=== Test 2: Modes and Threads ===\n")
+
+    assert next(prepare_cpu_model(_tiny_model(), "bf16").parameters()).dtype == torch.bfloat16
+    assert next(prepare_cpu_model(_tiny_model(), "fp32").parameters()).dtype == torch.float32
+
+    monkeypatch.setenv("CPU_QUANTIZATION", "fp32")
+    assert next(prepare_cpu_model(_tiny_model()).parameters()).dtype == torch.float32, "Mode read from the env"
+
+    with pytest.raises(ValueError):
+        prepare_cpu_model(_tiny_model(), "int4")
+
+    previous = torch.get_num_threads()
+    monkeypatch.setenv("CPU_NUM_THREADS", "1")
+    assert configure_cpu_threads() == 1
+    assert configure_cpu_threads(previous) == previous
+
+    print("✅ Modes and thread count applied\n")
@@ -0,0 +1,107 @@
+"""
+Unit tests for the embedding endpoint's DynamicBatcher
+Checks that concurrent requests are merged into shared encode() calls and that
+every caller gets back exactly its own vectors.
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Models_embedding"))
+
+from batcher import DynamicBatcher
+
+
+def _fake_encode(batch_sizes):
+    """Encoder that maps each text to [len(text), position-free marker] and records batch sizes."""
+    lock = threading.Lock()
+
+    def encode(texts):
+        with lock:
+            batch_sizes.append(len(texts))
+        time.sleep(0.01)  # pretend the model takes a moment
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+    return encode
+
+
+def test_concurrent_requests_share_batches():
+    """Test that concurrent callers are merged into fewer encode() calls"""
+    print("=== Test 1: Concurrent Requests Share Batches ===\n")
+
+    batch_sizes = []
+    batcher = DynamicBatcher(_fake_encode(batch_sizes), max_batch_size=64, max_wait_ms=20)
+    requests = [[f"{chr(97 + i)}{'x' * i}", f"{chr(65 + i)}"] for i in range(16)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(batcher.embed, requests))
+    batcher.close()
+
+    for texts, vectors in zip(requests, results):
+        assert vectors == [[float(len(text)), float(ord(text[0]))] for text in texts], "Caller got someone else's vectors"
+
+    assert sum(batch_sizes) == 32, f"Every text should be encoded once, got {sum(batch_sizes)}"
+    assert len(batch_sizes) < len(requests), f"Expected merged batches, got {batch_sizes}"
+    print(f"✅ 16 requests served with {len(batch_sizes)} encode calls: {batch_sizes}")
+    print(f"✅ Stats: {batcher.stats()}\n")
+
+
+def test_max_batch_size_caps_collection():
+    """Test that collection stops once max_batch_size texts are waiting"""
+    print("=== Test 2: Max Batch Size ===\n")
+
+    batch_sizes = []
+    batcher = DynamicBatcher(_fake_encode(batch_sizes), max_batch_size=4, max_wait_ms=50)
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        list(pool.map(batcher.embed, [["a"]] * 12))
+    batcher.close()
+
+    assert max(batch_sizes) <= 4, f"Batches should hold at most 4 texts, got {batch_sizes}"
+    print(f"✅ Batch sizes: {batch_sizes}\n")
+
+
+def test_empty_input_and_errors():
+    """Test that empty input returns immediately and encode errors reach every caller"""
+    print("=== Test 3: Empty Input and Errors ===\n")
+
+    def failing_encode(texts):
+        raise RuntimeError("GPU on fire")
+
+    batcher = DynamicBatcher(failing_encode, max_wait_ms=1)
+    assert batcher.embed([]) == [], "Empty input should give an empty result"
+    with pytest.raises(RuntimeError, match="GPU on fire"):
+        batcher.embed(["hello"])
+    batcher.close()
+    print("✅ Empty input and encode errors handled\n")
+
+
+def test_small_model_on_cpu():
+    """Test the batcher around a real (small) SentenceTransformer on CPU"""
+    print("=== Test 4: Small SentenceTransformer on CPU ===\n")
+
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    try:
+        model = sentence_transformers.SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2", device="cpu")
+    except Exception as error:
+        pytest.skip(f"Small model not available: {error}")
+
+    batcher = DynamicBatcher(
+        lambda texts: model.encode(texts, convert_to_numpy=True).tolist(),
+        max_batch_size=32,
+        max_wait_ms=10,
+    )
+    texts = [f"sentence number {i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        batched = list(pool.map(lambda text: batcher.embed([text])[0], texts))
+    batcher.close()
+
+    direct = model.encode(texts, convert_to_numpy=True)
+    for got, expected in zip(batched, direct):
+        assert max(abs(a - b) for a, b in zip(got, expected)) < 1e-4, "Batched vector differs from direct encode"
+    print(f"✅ {len(texts)} concurrent requests match direct encode ({batcher.stats()['batches']} batches)\n")
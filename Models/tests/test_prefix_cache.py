@@ -0,0 +1,167 @@
+"""
+Unit tests for model_runtime.prefix_cache
+Uses a tiny randomly initialised Qwen2 model on CPU (no download) to check that reusing the
+prefix KV cache gives the same greedy output while prefilling only the request suffix, and
+a small byte-level BPE tokenizer (Qwen's kind, trained locally) to check that the cached
+refinement and answer prefixes and their suffixes tokenize like the whole prompt.
+"""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model_runtime.prefix_cache import PrefixCache, split_prompt_at
+from model_runtime.prompts import (
+    REFINEMENT_PREFIX,
+    answer_input_ids,
+    build_answer_messages,
+    build_refinement_prompt,
+    build_refinement_suffix,
+    static_answer_prefix,
+)
+
+QUERIES = ["what is the refund policy", "how do parents and children get stored", "where are uploads kept", "what file types are accepted"]
+CONTEXTS = ["Refunds are accepted within 30 days.", "\nParents are stored as documents.\n\nChildren as vectors.", "\n\n- uploads: pdf, docx", "- txt files"]
+
+# Qwen2's pre-tokenizer split pattern (tokenizer.json), applied before byte-level BPE
+QWEN_PRETOKENIZE_PATTERN = (
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+CHATML_TEMPLATE = (
+    "{% for message in messages %}<|im_start|>{{ message['role'] }}\n{{ message['content'] }}<|im_end|>\n{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def _tiny_model(vocab_size=256):
+    torch.manual_seed(0)
+    config = transformers.Qwen2Config(
+        vocab_size=vocab_size, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=1024,
+    )
+    return transformers.AutoModelForCausalLM.from_config(config).eval()
+
+
+def _byte_level_tokenizer():
+    """A byte-level BPE tokenizer with Qwen's pre-tokenizer and chat template, trained on refinement and answer prompts."""
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers, trainers
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.Sequence([
+        pre_tokenizers.Split(Regex(QWEN_PRETOKENIZE_PATTERN), behavior="isolated"),
+        pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False),
+    ])
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=1000, min_frequency=1, special_tokens=["<|im_start|>", "<|im_end|>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    answer_prompts = [
+        "\n".join(message["content"] for message in build_answer_messages(context, query)) for context, query in zip(CONTEXTS, QUERIES)
+    ]
+    tokenizer.train_from_iterator(([build_refinement_prompt(query) for query in QUERIES] + answer_prompts) * 20, trainer)
+    return transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, chat_template=CHATML_TEMPLATE)
+
+
+def _prefill_lengths(model):
+    """Records how many tokens each forward pass receives."""
+    lengths = []
+    model.register_forward_pre_hook(lambda module, args, kwargs: lengths.append(kwargs["input_ids"].shape[1]), with_kwargs=True)
+    return lengths
+
+
+def test_split_prompt_at():
+    """Test that the static prefix is everything before the placeholder"""
+    print("=== Test 1: Split Prompt ===\n")
+    assert split_prompt_at("<sys>rules</sys><ctx>@@</ctx>", "@@") == "<sys>rules</sys><ctx>"
+    with pytest.raises(ValueError):
+        split_prompt_at("no placeholder here", "@@")
+    print("✅ Prefix split correctly\n")
+
+
+def test_cached_generation_matches_and_skips_prefix():
+    """Test that cached generation equals full generation and only prefills the suffix"""
+    print("=== Test 2: Cached Generation ===\n")
+
+    model = _tiny_model()
+    prefix_ids = torch.randint(0, 256, (1, 300))
+    suffix_ids = torch.randint(0, 256, (1, 12))
+    input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+    generate_kwargs = dict(max_new_tokens=8, do_sample=False, pad_token_id=0)
+
+    cache = PrefixCache(model, prefix_ids)
+    expected = model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), **generate_kwargs)
+
+    lengths = _prefill_lengths(model)
+    for _ in range(2):  # the shared cache must not be modified by a request
+        lengths.clear()
+        cached = cache.generate(input_ids, **generate_kwargs)
+        assert torch.equal(cached, expected), "Cached generation should match full prefill"
+        assert lengths[0] == 12, f"Only the suffix should be prefilled, first forward saw {lengths[0]} tokens"
+
+    print(f"✅ Outputs match; first forward processed {lengths[0]} tokens instead of {input_ids.shape[1]}\n")
+
+
+def test_time_to_first_token():
+    """Test that the prefix cache cuts the prefill by the prefix length and lowers time-to-first-token"""
+    print("=== Test 3: Time To First Token ===\n")
+
+    model = _tiny_model()
+    prefix_ids = torch.randint(0, 256, (1, 800))
+    input_ids = torch.cat([prefix_ids, torch.randint(0, 256, (1, 16))], dim=1)
+    cache = PrefixCache(model, prefix_ids)
+    kwargs = dict(max_new_tokens=1, do_sample=False, pad_token_id=0)
+
+    def best_of(fn, runs=5):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    lengths = _prefill_lengths(model)
+    full = best_of(lambda: model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), **kwargs))
+    full_prefill = lengths[-1]
+    cached = best_of(lambda: cache.generate(input_ids, **kwargs))
+    cached_prefill = lengths[-1]
+
+    assert full_prefill - cached_prefill == cache.prefix_length, f"Prefill should drop by the prefix length ({full_prefill} -> {cached_prefill})"
+    # Best of 5 runs; prefilling 16 tokens instead of 816 takes about half the time on CPU, so
+    # require only a 10% gain so timer noise cannot fail the test
+    assert cached < full * 0.9, f"Prefix cache should lower time-to-first-token ({full * 1000:.1f} ms -> {cached * 1000:.1f} ms)"
+    print(f"✅ TTFT full prefill: {full * 1000:.1f} ms ({full_prefill} tokens), with prefix cache: {cached * 1000:.1f} ms ({cached_prefill} tokens)\n")
+
+
+def test_refinement_prefix_tokenizes_like_the_full_prompt():
+    """Test that the cached refinement prefix plus the suffix gives the ids of the prompt tokenized in one piece"""
+    print("=== Test 4: Refinement Prefix Boundary ===\n")
+
+    tokenizer = _byte_level_tokenizer()
+    cache = PrefixCache.from_text(_tiny_model(vocab_size=1024), tokenizer, REFINEMENT_PREFIX)
+    for query in QUERIES:
+        suffix = build_refinement_suffix(query)
+        expected = tokenizer(REFINEMENT_PREFIX + suffix, add_special_tokens=False).input_ids
+        assert cache.build_input_ids(tokenizer, suffix)[0].tolist() == expected, f"Prefix boundary changes the tokens of {query!r}"
+    print(f"✅ {len(QUERIES)} refinement prompts tokenize the same with and without the prefix cache\n")
+
+
+def test_answer_prefix_tokenizes_like_the_full_prompt():
+    """Test that the cached answer prefix plus the suffix gives the ids of the prompt tokenized in one piece,
+    also for contexts starting with a newline"""
+    print("=== Test 5: Answer Prefix Boundary ===\n")
+
+    tokenizer = _byte_level_tokenizer()
+    cache = PrefixCache.from_text(_tiny_model(vocab_size=1024), tokenizer, static_answer_prefix(tokenizer))
+    for context, query in zip(CONTEXTS, QUERIES):
+        prompt = tokenizer.apply_chat_template(build_answer_messages(context, query), tokenize=False, add_generation_prompt=True)
+        assert prompt.startswith(cache.prefix_text)
+        expected = tokenizer(prompt, add_special_tokens=False).input_ids
+        assert answer_input_ids(tokenizer, cache, context, query)[0].tolist() == expected, f"Prefix boundary changes the tokens of {context!r}"
+    print(f"✅ {len(CONTEXTS)} answer prompts tokenize the same with and without the prefix cache\n")
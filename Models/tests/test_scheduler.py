@@ -0,0 +1,168 @@
+"""
+Unit tests for model_runtime.scheduler
+Uses a tiny randomly initialised Qwen2 model on CPU (no download) to check that sequences decoded
+in a shared, continuously refilled batch produce exactly the tokens of solo greedy generation.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model_runtime.prefix_cache import PrefixCache
+from model_runtime.scheduler import ContinuousBatchScheduler
+
+EOS_TOKEN_ID = 255
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = transformers.Qwen2Config(
+        vocab_size=256, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=1024,
+    )
+    # Double precision so batched and solo runs cannot differ by rounding
+    return transformers.AutoModelForCausalLM.from_config(config).to(torch.float64).eval()
+
+
+def _solo_generate(model, input_ids, max_new_tokens):
+    output = model.generate(
+        input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+        max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=0, eos_token_id=EOS_TOKEN_ID,
+    )
+    return output[0, input_ids.shape[1]:].tolist()
+
+
+def test_concurrent_requests_match_solo_generation():
+    """Test that prompts of different lengths and budgets decode exactly as they would alone"""
+    print("=== Test 1: Batched Equals Solo ===\n")
+
+    model = _tiny_model()
+    prompts = [torch.randint(0, 250, (1, length)) for length in (5, 17, 9, 30, 12, 3)]
+    budgets = [12, 4, 20, 8, 1, 15]
+    expected = [_solo_generate(model, ids, budget) for ids, budget in zip(prompts, budgets)]
+
+    scheduler = ContinuousBatchScheduler(model, eos_token_id=EOS_TOKEN_ID, max_batch_size=4)
+    futures = []
+    for ids, budget in zip(prompts, budgets):
+        futures.append(scheduler.submit(ids, budget))
+        time.sleep(0.002)  # stagger arrivals so requests join a batch that is already decoding
+    results = [future.result(timeout=60) for future in futures]
+    stats = scheduler.stats()
+    scheduler.close()
+
+    assert results == expected, "Continuous batching must not change greedy outputs"
+    assert stats["peak_batch_size"] > 1, f"Requests should share decode steps: {stats}"
+    assert stats["peak_batch_size"] <= 4, f"Batch size limit exceeded: {stats}"
+    print(f"✅ {len(results)} outputs match solo generation")
+    print(f"✅ Stats: {stats}\n")
+
+
+def test_stop_token_and_prefix_cache():
+    """Test early stopping on EOS and prefill through the prefix cache"""
+    print("=== Test 2: Stop Tokens and Prefix Cache ===\n")
+
+    model = _tiny_model()
+    prefixes = [torch.randint(0, 250, (1, 40)), torch.randint(0, 250, (1, 25))]
+    prompts = [torch.cat([prefix, torch.randint(0, 250, (1, n))], dim=1) for prefix, n in zip(prefixes, (4, 11))]
+    expected = [_solo_generate(model, ids, 10) for ids in prompts]
+
+    scheduler = ContinuousBatchScheduler(
+        model, eos_token_id=EOS_TOKEN_ID, max_batch_size=8,
+        prefix_caches=[PrefixCache(model, prefix) for prefix in prefixes],
+    )
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda ids: scheduler.generate(ids, 10, timeout=60), prompts))
+
+    # Pick a token the first prompt produces and treat it as a stop token
+    stop_token = expected[0][2]
+    stopped = scheduler.generate(prompts[0], 10, stop_token_ids={stop_token}, timeout=60)
+    scheduler.close()
+
+    assert results == expected, "Prefix-cached prefill must not change greedy outputs"
+    assert stopped == expected[0][:expected[0].index(stop_token) + 1], f"Should stop at {stop_token}: {stopped}"
+    print(f"✅ Outputs match; stopped after {len(stopped)} tokens on token {stop_token}\n")
+
+
+def test_mixed_greedy_and_sampled_requests():
+    """Test that sampled requests share a batch without changing greedy neighbours"""
+    print("=== Test 3: Per-Request Decoding Settings ===\n")
+
+    model = _tiny_model()
+    greedy_prompt, sampled_prompt = torch.randint(0, 250, (1, 10)), torch.randint(0, 250, (1, 14))
+    expected = _solo_generate(model, greedy_prompt, 16)
+
+    torch.manual_seed(1)
+    scheduler = ContinuousBatchScheduler(model, eos_token_id=-1, max_batch_size=4)
+    sampled = [scheduler.submit(sampled_prompt, 16, temperature=1.5, top_p=0.95) for _ in range(3)]
+    greedy = scheduler.submit(greedy_prompt, 16)
+    # A vanishing nucleus keeps only the most likely token, i.e. greedy decoding
+    narrow = scheduler.submit(greedy_prompt, 16, temperature=1.0, top_p=1e-9)
+    sampled_outputs = [future.result(timeout=60) for future in sampled]
+    results = (greedy.result(timeout=60), narrow.result(timeout=60))
+    scheduler.close()
+
+    assert results == (expected, expected), "Greedy rows must not be affected by sampled rows"
+    assert len({tuple(output) for output in sampled_outputs}) > 1, "Sampled requests should differ"
+    print(f"✅ Greedy outputs unchanged; {len(sampled_outputs)} sampled outputs differ\n")
+
+
+def test_throughput_report():
+    """Report tokens/sec for sequential solo generation versus the scheduler"""
+    print("=== Test 4: Throughput ===\n")
+
+    model = _tiny_model().to(torch.float32)
+    prompts = [torch.randint(0, 250, (1, 64)) for _ in range(8)]
+
+    started = time.perf_counter()
+    for ids in prompts:
+        _solo_generate(model, ids, 32)
+    sequential = time.perf_counter() - started
+
+    scheduler = ContinuousBatchScheduler(model, eos_token_id=-1, max_batch_size=8)
+    started = time.perf_counter()
+    for future in [scheduler.submit(ids, 32) for ids in prompts]:
+        future.result(timeout=60)
+    batched = time.perf_counter() - started
+    scheduler.close()
+
+    tokens = 8 * 32
+    print(f"✅ Sequential: {tokens / sequential:.0f} tok/s, continuous batching: {tokens / batched:.0f} tok/s\n")
+
+
+def test_admission_failure_keeps_scheduler_running():
+    """Test that a request failing while joining the batch fails alone and the scheduler keeps serving"""
+    print("=== Test 5: Admission Failure ===\n")
+
+    model = _tiny_model()
+    prompts = [torch.randint(0, 250, (1, length)) for length in (8, 11, 6)]
+    expected = [_solo_generate(model, ids, 24) for ids in prompts]
+
+    scheduler = ContinuousBatchScheduler(model, eos_token_id=EOS_TOKEN_ID, max_batch_size=4)
+    merge, calls = scheduler._merge, []
+
+    def failing_merge(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("CUDA out of memory")
+        return merge(*args)
+
+    scheduler._merge = failing_merge
+    futures = [scheduler.submit(ids, 24) for ids in prompts]
+    raising = scheduler.submit(prompts[0], 24, stop_condition=lambda tokens: 1 / 0)
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        futures[1].result(timeout=60)
+    with pytest.raises(ZeroDivisionError):
+        raising.result(timeout=60)
+    assert [futures[0].result(timeout=60), futures[2].result(timeout=60)] == [expected[0], expected[2]]
+    # Requests submitted after the failures are still served
+    assert scheduler.generate(prompts[1], 24, timeout=60) == expected[1]
+    scheduler.close()
+    print("✅ Failed admissions only failed their own request; the batch and later requests completed\n")
@@ -0,0 +1,87 @@
+"""
+Unit tests for model_runtime.speculative
+Checks n-gram draft lookup and that prompt-lookup speculative decoding on a tiny randomly
+initialised Qwen2 model (CPU, no download) gives exactly the greedy `generate` output.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model_runtime.prefix_cache import PrefixCache
+from model_runtime.speculative import PromptLookupDecoder, find_draft
+
+EOS_TOKEN_ID = 255
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = transformers.Qwen2Config(
+        vocab_size=256, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=1024,
+    )
+    return transformers.AutoModelForCausalLM.from_config(config).to(torch.float64).eval()
+
+
+def _greedy(model, input_ids, max_new_tokens):
+    output = model.generate(
+        input_ids=input_ids, attention_mask=torch.ones_like(input_ids),
+        max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=0, eos_token_id=EOS_TOKEN_ID,
+    )
+    return output[0, input_ids.shape[1]:].tolist()
+
+
+def test_find_draft():
+    """Test that drafts copy what followed the most recent earlier match of the last n-gram"""
+    print("=== Test 1: Draft Lookup ===\n")
+
+    tokens = [1, 2, 3, 4, 5, 9, 2, 3, 7, 8, 2, 3]
+    assert find_draft(tokens, max_ngram=2, num_draft_tokens=3) == [7, 8, 2], "Most recent bigram match wins"
+    assert find_draft(tokens, max_ngram=3, num_draft_tokens=2) == [7, 8], "Falls back to shorter n-grams"
+    assert find_draft([1, 2, 3], max_ngram=2) == [], "No earlier match means no draft"
+    print("✅ Drafts found as expected\n")
+
+
+def test_speculative_matches_greedy():
+    """Test that speculative decoding reproduces greedy generation, with and without a prefix cache"""
+    print("=== Test 2: Identical To Greedy ===\n")
+
+    model = _tiny_model()
+    # A prompt with repeated spans, like an answer prompt quoting its context
+    span = torch.randint(0, 250, (1, 24))
+    prompt = torch.cat([torch.randint(0, 250, (1, 10)), span, torch.randint(0, 250, (1, 6)), span[:, :8]], dim=1)
+    expected = _greedy(model, prompt, 40)
+
+    decoder = PromptLookupDecoder(model, max_ngram=3, num_draft_tokens=6)
+    generated, stats = decoder.generate(prompt, 40, {EOS_TOKEN_ID})
+    assert generated == expected, "Speculative output must equal greedy output"
+    assert stats.forward_passes <= len(generated), f"Never more passes than tokens: {stats.as_dict()}"
+
+    cached = PromptLookupDecoder(model, prefix_caches=[PrefixCache(model, prompt[:, :10])])
+    assert cached.generate(prompt, 40, {EOS_TOKEN_ID})[0] == expected, "Prefix-cached prefill must not change the output"
+
+    print(f"✅ Outputs match; stats: {stats.as_dict()}\n")
+
+
+def test_stop_token_and_budget():
+    """Test that generation stops at a stop token and never exceeds max_new_tokens"""
+    print("=== Test 3: Stop Token and Budget ===\n")
+
+    model = _tiny_model()
+    prompt = torch.randint(0, 250, (1, 30))
+    expected = _greedy(model, prompt, 12)
+    decoder = PromptLookupDecoder(model, num_draft_tokens=8)
+
+    for budget in (1, 5, 12):
+        generated, _ = decoder.generate(prompt, budget, {EOS_TOKEN_ID})
+        assert generated == expected[:budget], f"Budget {budget}: {generated}"
+
+    stop_token = expected[3]
+    generated, _ = decoder.generate(prompt, 12, {stop_token})
+    assert generated == expected[:expected.index(stop_token) + 1], f"Should stop at {stop_token}: {generated}"
+    print(f"✅ Budgets respected; stopped after {len(generated)} tokens\n")
@@ -0,0 +1,149 @@
+"""
+Unit tests for model_runtime.stopping
+Uses a tiny randomly initialised Qwen2 model and a toy tokenizer (CPU, no download) to check
+that stopping at the first sentence boundary yields the same cleaned refinement as decoding
+the full budget, with fewer generated tokens, and that generation stops on every EOS token of
+the model's generation config.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model_runtime.prompts import clean_refined_output
+from model_runtime.scheduler import ContinuousBatchScheduler
+from model_runtime.stopping import SentenceBoundary, SentenceBoundaryCriteria, eos_token_ids
+
+VOCAB_SIZE = 256
+EOS_TOKEN_ID = 255
+
+
+class ToyTokenizer:
+    """Token text: a few periods, newlines and blanks among ordinary words."""
+
+    eos_token_id = EOS_TOKEN_ID
+
+    def text(self, token_id):
+        if token_id % 17 == 0:
+            return "."
+        if token_id % 23 == 0:
+            return "\n"
+        if token_id % 29 == 0:
+            return " "
+        return f" w{token_id}"
+
+    def __len__(self):
+        return VOCAB_SIZE
+
+    def batch_decode(self, sequences):
+        return [self.decode(sequence) for sequence in sequences]
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return "".join(self.text(int(token_id)) for token_id in token_ids if int(token_id) != EOS_TOKEN_ID)
+
+
+def _tiny_model():
+    torch.manual_seed(0)
+    config = transformers.Qwen2Config(
+        vocab_size=VOCAB_SIZE, hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=1024,
+    )
+    return transformers.AutoModelForCausalLM.from_config(config).to(torch.float64).eval()
+
+
+def test_boundary_detection():
+    """Test that periods always stop and newlines stop only after some text"""
+    print("=== Test 1: Boundary Detection ===\n")
+
+    boundary = SentenceBoundary(ToyTokenizer())
+    assert boundary.reached([1, 2, 17]), "A period ends the sentence"
+    assert not boundary.reached([23]), "A leading newline is stripped by the cleanup, keep going"
+    assert not boundary.reached([29, 23]), "Only whitespace so far, keep going"
+    assert boundary.reached([23, 5, 46]), "A newline after text ends the line"
+    assert boundary.count_generated([5, 6, 17, 9, 9], {EOS_TOKEN_ID}) == 3
+    assert boundary.count_generated([5, EOS_TOKEN_ID, EOS_TOKEN_ID], {EOS_TOKEN_ID}) == 2
+    # A row ending on the second EOS (Qwen's <|endoftext|>, also the pad id) is padded with it
+    assert boundary.count_generated([5, 6, 254, 254, 254], {EOS_TOKEN_ID, 254}) == 3
+    print("✅ Boundaries detected as expected\n")
+
+
+def test_early_stop_keeps_cleaned_output():
+    """Test that early-stopped generation cleans to the same refinement with fewer tokens"""
+    print("=== Test 2: Early Stop (single and batch) ===\n")
+
+    model, tokenizer = _tiny_model(), ToyTokenizer()
+    boundary = SentenceBoundary(tokenizer)
+    prompts = [torch.randint(0, 250, (1, 8 + 3 * row)) for row in range(6)]
+    kwargs = dict(do_sample=False, pad_token_id=EOS_TOKEN_ID, eos_token_id=EOS_TOKEN_ID)
+
+    saved = 0
+    for ids in prompts:
+        full = model.generate(input_ids=ids, attention_mask=torch.ones_like(ids), max_new_tokens=60, **kwargs)[0, ids.shape[1]:]
+        stopped = model.generate(
+            input_ids=ids, attention_mask=torch.ones_like(ids), max_new_tokens=60,
+            stopping_criteria=transformers.StoppingCriteriaList([SentenceBoundaryCriteria(boundary, ids.shape[1])]),
+            **kwargs,
+        )[0, ids.shape[1]:]
+        assert clean_refined_output(tokenizer.decode(stopped)) == clean_refined_output(tokenizer.decode(full))
+        assert torch.equal(stopped, full[:len(stopped)]), "Early stopping must only truncate"
+        saved += len(full) - len(stopped)
+
+    # Batched: every row stops at its own boundary
+    batch = torch.randint(0, 250, (4, 10))
+    outputs = model.generate(
+        input_ids=batch, attention_mask=torch.ones_like(batch), max_new_tokens=60,
+        stopping_criteria=transformers.StoppingCriteriaList([SentenceBoundaryCriteria(boundary, 10)]),
+        **kwargs,
+    )[:, 10:]
+    for row, output in zip(batch, outputs):
+        full = model.generate(input_ids=row[None], attention_mask=torch.ones_like(row[None]), max_new_tokens=60, **kwargs)[0, 10:]
+        count = boundary.count_generated(output.tolist(), {EOS_TOKEN_ID})
+        assert torch.equal(output[:count], full[:count]), "Batched rows must match solo generation"
+        assert clean_refined_output(tokenizer.decode(output[:count])) == clean_refined_output(tokenizer.decode(full))
+
+    print(f"✅ Same cleaned outputs, {saved} tokens not decoded across {len(prompts)} prompts\n")
+
+
+def test_scheduler_stop_condition():
+    """Test that the scheduler ends a sequence when its stop_condition is met"""
+    print("=== Test 3: Scheduler stop_condition ===\n")
+
+    model, tokenizer = _tiny_model(), ToyTokenizer()
+    boundary = SentenceBoundary(tokenizer)
+    ids = torch.randint(0, 250, (1, 12))
+
+    scheduler = ContinuousBatchScheduler(model, eos_token_id=EOS_TOKEN_ID)
+    full = scheduler.generate(ids, 60, timeout=60)
+    stopped = scheduler.generate(ids, 60, stop_condition=boundary.reached, timeout=60)
+    scheduler.close()
+
+    assert stopped == full[:boundary.count_generated(full, {EOS_TOKEN_ID})], f"Unexpected stop: {stopped}"
+    assert clean_refined_output(tokenizer.decode(stopped)) == clean_refined_output(tokenizer.decode(full))
+    print(f"✅ Stopped after {len(stopped)} of {len(full)} tokens\n")
+
+
+def test_stops_on_every_eos_token():
+    """Test that the scheduler stops on any EOS of generation_config (Qwen: <|im_end|> and <|endoftext|>)"""
+    print("=== Test 4: All EOS Tokens ===\n")
+
+    model, tokenizer = _tiny_model(), ToyTokenizer()
+    ids = torch.randint(0, 250, (1, 12))
+    unstopped = ContinuousBatchScheduler(model, eos_token_id=EOS_TOKEN_ID)
+    full = unstopped.generate(ids, 20, timeout=60)
+    unstopped.close()
+
+    # Make the third generated token a second EOS, like <|endoftext|> next to <|im_end|>
+    end_of_text = full[2]
+    model.generation_config.eos_token_id = [EOS_TOKEN_ID, end_of_text]
+    assert eos_token_ids(model, tokenizer) == {EOS_TOKEN_ID, end_of_text}
+
+    scheduler = ContinuousBatchScheduler(model, eos_token_id=eos_token_ids(model, tokenizer))
+    stopped = scheduler.generate(ids, 20, timeout=60)
+    scheduler.close()
+    assert stopped == full[:full.index(end_of_text) + 1], f"Generation should stop at the second EOS: {stopped}"
+    print(f"✅ Stopped after {len(stopped)} of {len(full)} tokens on the generation config's second EOS\n")
@@ -0,0 +1,76 @@
+"""
+Unit tests for model_runtime.tracing
+Checks that the batcher's futures report how long they waited for a worker, and that
+EndpointTrace splits a handler's time into queue and compute under the caller's trace id.
+"""
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "Models_embedding"))
+
+from batcher import DynamicBatcher
+from model_runtime.tracing import EndpointTrace, TimedFuture, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_queue_time_of_batched_requests():
+    """Test that a request queued behind a slow batch reports its wait as queue time"""
+    print("=== Test 1: Queue Time ===\n")
+
+    release = threading.Event()
+
+    def encode(texts):
+        if texts == ["slow"]:
+            release.wait(1)
+        return [[1.0] for _ in texts]
+
+    batcher = DynamicBatcher(encode, max_batch_size=1, max_wait_ms=1)
+    first = batcher.submit(["slow"])
+    time.sleep(0.02)
+    second = batcher.submit(["fast"])
+    time.sleep(0.05)
+    release.set()
+    first.result(timeout=1)
+    second.result(timeout=1)
+    batcher.close()
+
+    assert isinstance(second, TimedFuture)
+    assert second.queue_seconds >= 0.04, f"Second request should have waited for the first, got {second.queue_seconds:.3f}s"
+    assert first.queue_seconds < second.queue_seconds
+    print(f"✅ Queued request waited {second.queue_seconds * 1000:.1f} ms, first {first.queue_seconds * 1000:.1f} ms\n")
+
+
+def test_endpoint_trace(capsys):
+    """Test the timings returned to the backend and the JSON log line"""
+    print("=== Test 2: Endpoint Trace ===\n")
+
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent("garbage") == (None, None)
+    assert parse_traceparent(None) == (None, None)
+
+    future = TimedFuture()
+    trace = EndpointTrace("answer", f"00-{TRACE_ID}-{PARENT_ID}-01")
+    time.sleep(0.03)
+    future.mark_started()
+    time.sleep(0.02)
+    future.set_result([1, 2, 3])
+    trace.waited_for([future])
+    timings = trace.finish(batch_size=1)
+
+    assert timings["trace_id"] == TRACE_ID
+    assert len(timings["span_id"]) == 16
+    assert timings["queue_ms"] >= 25
+    assert timings["compute_ms"] >= 15
+    logged = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert logged["event"] == "endpoint_call" and logged["parent_span_id"] == PARENT_ID and logged["batch_size"] == 1
+    print(f"✅ Timings {timings}\n")
+
+    untraced = EndpointTrace("refine").finish()
+    assert untraced["trace_id"] is None and untraced["queue_ms"] == 0.0
+    print("✅ Calls without a traceparent still report timings\n")
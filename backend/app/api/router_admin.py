@@ -0,0 +1,51 @@
+import asyncio
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core import profiling
+
+# Setup the API router
+router = APIRouter()
+
+
+# --- Admin gate: every route needs the X-Admin-Token header to match PROFILING_TOKEN ---
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not profiling.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING_TOKEN)")
+    if not profiling.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+# --- Time-boxed sampling window across the worker ---
+@router.post("/profile/sample", dependencies=[Depends(require_admin)])
+async def sample_worker(
+    seconds: float = Query(10.0, description="Length of the sampling window"),
+    interval_ms: float = Query(5.0, description="Time between two stack samples"),
+    focus: List[str] = Query([], description="Only keep the call trees of these functions, e.g. ingest_webhook"),
+):
+    """
+    Samples every thread of this worker while it keeps serving traffic and returns the call
+    tree (also stored for download, see GET /admin/profiles).
+    """
+    try:
+        return await asyncio.to_thread(profiling.sample_worker, seconds, interval_ms / 1000, focus)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# --- Stored reports ---
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    return {"profiles": profiling.list_profiles()}
+
+
+@router.get("/profiles/{file_name}", dependencies=[Depends(require_admin)])
+def download_profile(file_name: str):
+    path = profiling.profile_path(file_name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No profile file '{file_name}'")
+    return FileResponse(path, filename=file_name)
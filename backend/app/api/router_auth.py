@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 # Import the service and its custom error
 from app.service.auth_service import AuthService, AuthenticationError
@@ -45,14 +46,22 @@ class UserDisplayResponse(BaseModel):
 # Create a router for authentication endpoints
 router = APIRouter()
 
-# Initialize your authentication service
+# Your authentication service, created on the first auth request (connecting to AstraDB
+# at import time slowed every worker start and broke offline imports).
 # This one instance will be used by all requests.
-try:
-    auth_service = AuthService()
-except ValueError as e:
-    # This catches the ASTRA_DB_URL missing error
-    print(f"❌ CRITICAL ERROR: Failed to initialize AuthService. {e}")
-    auth_service = None
+_auth_service: Optional[AuthService] = None
+
+
+def get_auth_service() -> Optional[AuthService]:
+    """Returns the shared AuthService, or None when the database is unavailable."""
+    global _auth_service
+    if _auth_service is None:
+        try:
+            _auth_service = AuthService()
+        except Exception as e:
+            # This catches the ASTRA_DB_URL missing error and connection failures
+            print(f"❌ CRITICAL ERROR: Failed to initialize AuthService. {e}")
+    return _auth_service
 
 # --- API Endpoints ---
 
@@ -90,6 +99,7 @@ async def register_user(user_data: UserCreateRequest):
     """
     # Check if the auth service failed to start
     print("Register user called")
+    auth_service = get_auth_service()
     if not auth_service:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -145,6 +155,7 @@ async def login_user(user_data: UserLoginRequest):
     Handle user login.
     Receives email and password.
     """
+    auth_service = get_auth_service()
     if not auth_service:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -1,9 +1,18 @@
+from typing import List, Optional
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from app.service.rag.retrieval.query_refiner import refine_query
-from app.vectordb.vectordb import search_and_retrieve_context
-from app.service.rag.retrieval.answer_generator import generate_answer
+from app.service.rag.retrieval.query_pipeline import (
+    REFINE,
+    validate_pipeline_mode,
+    prepare_retrieval_query,
+    prepare_retrieval_queries,
+)
+from app.core.metrics import BATCH_SIZE
+from app.core.timing import stage
+from app.vectordb.vectordb import search_and_retrieve_context, search_and_retrieve_contexts
+from app.service.rag.retrieval.answer_generator import generate_answer, generate_answers
 
 # Setup the API router
 router = APIRouter()
@@ -13,10 +22,23 @@ router = APIRouter()
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5  # Number of similar child documents to retrieve
+    mode: Optional[str] = None  # "refine" | "raw" | "rewrite" (default: QUERY_PIPELINE_MODE)
 
 class QueryResponse(BaseModel):
     answer: str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5  # Number of similar child documents to retrieve, per query
+    mode: Optional[str] = None  # "refine" | "raw" | "rewrite" (default: QUERY_PIPELINE_MODE)
+
+class BatchQueryResponse(BaseModel):
+    answers: List[str]  # One answer per query, in request order
+
+# Upper bound on questions per batch call
+MAX_BATCH_QUERIES = 64
+NO_DOCUMENTS_ANSWER = "No relevant documents found for your query. Try ingesting more data."
+
 
 # --- Health Check ---
 @router.get("/health")
@@ -32,15 +54,23 @@ async def query_documents(request: QueryRequest):
     1. Refine the user query using LLM.
     2. Search for relevant child chunks and retrieve associated parent document contents (LangChain/AstraDB).
     3. Generate an answer from the context using the Answer Generator LLM.
+
+    In "raw" / "rewrite" mode step 1 is skipped (the raw query or a cheap local rewrite
+    is embedded) and the Answer Generator clarifies the query itself, so the request
+    makes a single LLM round-trip.
     """
+    try:
+        mode = validate_pipeline_mode(request.mode)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
 
-    # --- Step 1: Query Refinement using LLM ---
+    # --- Step 1: Query Refinement using LLM (or a local stand-in) ---
     print(f"📝 Original Query: {request.query}")
 
     try:
-        # Get the LLM to refine the query
-        refined_query = await refine_query(request.query)
-        print(f"✨ Refined Query: {refined_query}")
+        with stage("refine"):
+            refined_query, clarify_query = await prepare_retrieval_query(request.query, mode)
+        print(f"✨ {'Refined' if mode == REFINE else 'Retrieval'} Query ({mode}): {refined_query}")
     except Exception as error:
         print(f"❌ Query refinement failed: {error}")
         raise HTTPException(
@@ -58,7 +88,7 @@ async def query_documents(request: QueryRequest):
         )
 
         if not rag_contents:
-            return QueryResponse(answer="No relevant documents found for your query. Try ingesting more data.")
+            return QueryResponse(answer=NO_DOCUMENTS_ANSWER)
 
         print(f"🔍 Retrieved context from {len(rag_contents)} parent documents.")
 
@@ -72,7 +102,8 @@ async def query_documents(request: QueryRequest):
 
     # ---- Step 3: Send to Beam LLM Answer Generator ----
     try:
-        answer = await generate_answer(rag_contents, request.query)
+        with stage("generate"):
+            answer = await generate_answer(rag_contents, request.query, clarify_query=clarify_query)
         print("🧠 Beam Answer Generated!")
     except Exception as error:
         print(f"❌ Beam Answer Generator Failed: {error}")
@@ -87,6 +118,80 @@ async def query_documents(request: QueryRequest):
     )
 
 
+# --- Batch RAG Query Endpoint ---
+@router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_documents_batch(request: BatchQueryRequest):
+    """
+    Runs the RAG Query Pipeline for many questions in one call:
+    1. Refine all queries with a single batched LLM request (or embed them raw / locally
+       rewritten in "raw" / "rewrite" mode).
+    2. Embed all refined queries in one embedding request, run the vector searches
+       concurrently and fetch each referenced parent document only once.
+    3. Generate the answers through batched requests to the Answer Generator LLM.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required.")
+    try:
+        mode = validate_pipeline_mode(request.mode)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries in one batch (max {MAX_BATCH_QUERIES})."
+        )
+
+    print(f"📝 Batch of {len(request.queries)} queries received.")
+    BATCH_SIZE.labels("query").observe(len(request.queries))
+
+    # --- Step 1: Batched Query Refinement (skipped in "raw" / "rewrite" mode) ---
+    try:
+        with stage("refine"):
+            refined_queries, clarify_query = await prepare_retrieval_queries(request.queries, mode)
+    except Exception as error:
+        print(f"❌ Batch query refinement failed: {error}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Query refinement failed: {str(error)}"
+        )
+
+    # --- Step 2: Batched Retrieval of Parent Documents ---
+    try:
+        rag_contents_per_query = await search_and_retrieve_contexts(
+            queries=refined_queries,
+            top_k=request.top_k
+        )
+    except Exception as e:
+        print(f"❌ Batch retrieval failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Context retrieval failed: {str(e)}"
+        )
+
+    # ---- Step 3: Batched Answer Generation (only for queries with context) ----
+    answers = [NO_DOCUMENTS_ANSWER] * len(request.queries)
+    answerable = [index for index, rag_contents in enumerate(rag_contents_per_query) if rag_contents]
+    if answerable:
+        try:
+            with stage("generate"):
+                generated = await generate_answers(
+                    [rag_contents_per_query[index] for index in answerable],
+                    [request.queries[index] for index in answerable],
+                    clarify_query=clarify_query
+                )
+        except Exception as error:
+            print(f"❌ Beam Answer Generator Failed: {error}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Beam answer generation failed: {str(error)}"
+            )
+        for index, answer in zip(answerable, generated):
+            answers[index] = answer
+
+    print(f"✅ Batch Query Process Completed ({len(answerable)}/{len(answers)} answered from context)")
+    return BatchQueryResponse(answers=answers)
+
+
 # # --- Alternative Endpoint: Query without Refinement ---
 # @router.post("/query/direct", response_model=QueryResponse)
 # async def query_documents_direct(request: QueryRequest):
@@ -0,0 +1,95 @@
+"""
+Prometheus metrics served at GET /metrics
+    rag_request_duration_seconds{route, method, status}   every HTTP request (app/main.py middleware)
+    rag_stage_duration_seconds{stage}                      every `timing.stage(...)` block
+    rag_beam_request_duration_seconds{service, outcome}    every call to a Beam endpoint
+    rag_beam_errors_total{service, reason}                 failed Beam calls (HTTP status or exception type)
+    rag_beam_phase_seconds{service, phase}                 model-reported queue / compute time and the
+                                                           remaining overhead (network, gateway, cold start)
+    rag_batch_size{operation}                              items per embed / refine / answer / query batch
+    rag_cache_requests_total{cache, result}                cache hits and misses
+    rag_ingest_stage_occupancy{stage}                      share of an ingestion's wall time each pipeline
+                                                           stage was busy (several near 1 = overlapping)
+    rag_chunk_length{kind, unit}                           length of every ingested parent / child chunk, in
+                                                           tokens of the embedding model (else characters)
+With several workers set PROMETHEUS_MULTIPROC_DIR to an empty directory so /metrics
+aggregates all of them (prometheus_client multiprocess mode).
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+from app.core.tracing import span
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+REQUEST_SECONDS = Histogram("rag_request_duration_seconds", "HTTP request latency", ["route", "method", "status"], buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram("rag_stage_duration_seconds", "Time spent in one pipeline stage", ["stage"], buckets=LATENCY_BUCKETS)
+BEAM_SECONDS = Histogram("rag_beam_request_duration_seconds", "Beam endpoint round-trip time", ["service", "outcome"], buckets=LATENCY_BUCKETS)
+BEAM_PHASE_SECONDS = Histogram("rag_beam_phase_seconds", "Split of a Beam round-trip", ["service", "phase"], buckets=LATENCY_BUCKETS)
+BEAM_ERRORS = Counter("rag_beam_errors_total", "Failed Beam endpoint calls", ["service", "reason"])
+BATCH_SIZE = Histogram("rag_batch_size", "Items per batched call", ["operation"], buckets=BATCH_BUCKETS)
+INGEST_STAGE_OCCUPANCY = Histogram("rag_ingest_stage_occupancy", "Busy share of a pipelined ingestion stage", ["stage"], buckets=RATIO_BUCKETS)
+CHUNK_LENGTH = Histogram("rag_chunk_length", "Length of an ingested chunk", ["kind", "unit"], buckets=LENGTH_BUCKETS)
+CACHE_REQUESTS = Counter("rag_cache_requests_total", "Cache lookups", ["cache", "result"])
+
+
+@contextmanager
+def beam_call(service: str, batch_size: int = 1):
+    """
+    Times one Beam round-trip inside a `beam.<service>` trace span (send `tracing.trace_headers()`
+    from inside the block so the endpoint continues the trace).
+
+    The caller fills the yielded dict: `call["status"] = resp.status` and, from the response,
+    `call["timings"] = data.get("timings")` (the model's queue_ms / compute_ms). An exception
+    raised inside counts as an error (reason: the HTTP status, else the exception type) and is
+    re-raised.
+    """
+    BATCH_SIZE.labels(service).observe(batch_size)
+    call = {"status": None, "timings": None}
+    started = time.perf_counter()
+    with span(f"beam.{service}", batch_size=batch_size) as beam_span:
+        try:
+            yield call
+        except Exception as error:
+            BEAM_SECONDS.labels(service, "error").observe(time.perf_counter() - started)
+            status = call["status"] if call["status"] not in (None, 200) else getattr(error, "status", None)
+            BEAM_ERRORS.labels(service, f"http_{status}" if status else type(error).__name__).inc()
+            raise
+        finally:
+            if call["status"] is not None:
+                beam_span.attributes["http.status_code"] = call["status"]
+        elapsed = time.perf_counter() - started
+        BEAM_SECONDS.labels(service, "ok").observe(elapsed)
+        _record_model_timings(service, beam_span, elapsed, call["timings"])
+
+
+def _record_model_timings(service: str, beam_span, elapsed: float, timings) -> None:
+    """Splits a round-trip into model queue, model compute and everything else."""
+    if not isinstance(timings, dict) or "compute_ms" not in timings:
+        return
+    queue_seconds = float(timings.get("queue_ms", 0.0)) / 1000
+    compute_seconds = float(timings["compute_ms"]) / 1000
+    overhead_seconds = max(elapsed - queue_seconds - compute_seconds, 0.0)
+    for phase, seconds in (("queue", queue_seconds), ("compute", compute_seconds), ("overhead", overhead_seconds)):
+        BEAM_PHASE_SECONDS.labels(service, phase).observe(seconds)
+        beam_span.attributes[f"model.{phase}_ms"] = round(seconds * 1000, 1)
+
+
+def record_cache(cache: str, hits: int, misses: int) -> None:
+    CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition for this process or all workers."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
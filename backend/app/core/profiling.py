@@ -0,0 +1,236 @@
+"""
+Opt-in profiling of a live worker (admin only, disabled unless PROFILING_TOKEN is set)
+
+Two modes, both gated by the `X-Admin-Token` header matching PROFILING_TOKEN:
+  * one request: send `X-Profile: 1` (or `?profile=1`) with the request. It runs under cProfile
+    and the response's `X-Profile-Id` names the stored report.
+  * a sampling window: POST /admin/profile/sample?seconds=10 samples the Python stack of every
+    thread of the worker (pyinstrument-style, low overhead) and returns a call tree, optionally
+    restricted to the call trees of `focus` functions (e.g. ingest_webhook, query_documents).
+
+Reports are stored in PROFILE_DIR (default backend/_profiles) and listed / downloaded through
+GET /admin/profiles (app/api/router_admin.py):
+    <id>.txt        text report (cProfile: top functions by cumulative time; sampling: call tree)
+    <id>.prof       cProfile stats, for snakeviz / `python -m pstats`
+    <id>.collapsed  sampled stacks in collapsed format, for flamegraph.pl / speedscope
+
+cProfile only sees the event loop thread: async routes such as ingest_webhook and
+query_documents are covered, but sync `def` routes and `asyncio.to_thread` work are not (use a
+sampling window for those), and coroutines of other requests running on the worker at the same
+time show up too. One profile runs at a time per worker.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parents[2]   # .../backend
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "_profiles")))
+MAX_SAMPLE_SECONDS = 300
+REPORT_LINES = 60
+PROFILE_FILE = re.compile(r"^[0-9]{8}-[0-9]{6}-[a-z]+-[0-9a-f]{8}\.(txt|prof|collapsed)$")
+
+# cProfile and the sampler are process-wide: only one of them runs at a time
+_profiler_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """True when profiling is enabled and `token` matches PROFILING_TOKEN."""
+    return bool(PROFILING_TOKEN) and token is not None and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+def _new_profile_id(kind: str) -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{kind}-{uuid.uuid4().hex[:8]}"
+
+
+def _acquire():
+    if not _profiler_lock.acquire(blocking=False):
+        raise ProfilerBusy("Another profile is running on this worker")
+
+
+# ============================================================
+# One request under cProfile
+# ============================================================
+async def profile_call(label: str, call):
+    """
+    Awaits `call()` under cProfile and stores the report.
+    Returns (result, profile id); raises ProfilerBusy if a profile is already running.
+    """
+    _acquire()
+    profile = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profile.enable()
+        try:
+            result = await call()
+        finally:
+            profile.disable()
+    finally:
+        _profiler_lock.release()
+    return result, save_cprofile(profile, label, time.perf_counter() - started)
+
+
+def save_cprofile(profile: cProfile.Profile, label: str, seconds: float) -> str:
+    profile_id = _new_profile_id("request")
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile.dump_stats(str(PROFILE_DIR / f"{profile_id}.prof"))
+
+    text = io.StringIO()
+    text.write(f"{label}: {seconds * 1000:.1f} ms wall time\n")
+    stats = pstats.Stats(profile, stream=text)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(REPORT_LINES)
+    (PROFILE_DIR / f"{profile_id}.txt").write_text(text.getvalue(), encoding="utf-8")
+    print(f"📈 Profiled {label} in {seconds * 1000:.1f} ms: {profile_id}")
+    return profile_id
+
+
+# ============================================================
+# Sampling window across the worker
+# ============================================================
+Stack = Tuple[str, ...]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Records the Python stack of every thread (except its own) every `interval` seconds.
+    With `focus`, only stacks passing through one of those function names are kept, starting
+    at the outermost such frame, so the report covers just those call trees.
+    """
+
+    def __init__(self, interval: float = 0.005, focus: Iterable[str] = ()):
+        self.interval = interval
+        self.focus = set(focus)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def _stack(self, frame) -> Optional[Stack]:
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        if self.focus:
+            start = next((index for index, item in enumerate(frames) if item.f_code.co_name in self.focus), None)
+            if start is None:
+                return None
+            frames = frames[start:]
+        return tuple(_frame_label(item) for item in frames)
+
+    def sample_once(self) -> None:
+        own = threading.get_ident()
+        self.samples += 1
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = self._stack(frame)
+            if stack:
+                self.stacks[stack] += 1
+
+    def run(self, seconds: float) -> "StackSampler":
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            self.sample_once()
+            time.sleep(self.interval)
+        return self
+
+
+def render_call_tree(stacks: Counter, min_percent: float = 1.0, max_depth: int = 40) -> str:
+    """pyinstrument-style tree: every frame with its share of the samples that reached it."""
+    total = sum(stacks.values())
+    if not total:
+        return "(no samples)"
+    tree: Dict = {}
+    for stack, count in stacks.items():
+        node = tree
+        for label in stack[:max_depth]:
+            entry = node.setdefault(label, [0, {}])
+            entry[0] += count
+            node = entry[1]
+
+    lines: List[str] = []
+
+    def walk(node, depth):
+        for label, (count, children) in sorted(node.items(), key=lambda item: -item[1][0]):
+            percent = count / total * 100
+            if percent < min_percent:
+                continue
+            lines.append(f"{percent:6.1f}%  {'  ' * depth}{label}")
+            walk(children, depth + 1)
+
+    walk(tree, 0)
+    return "\n".join(lines)
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """One `frame;frame;frame count` line per stack (flamegraph.pl / speedscope input)."""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+def sample_worker(seconds: float, interval: float = 0.005, focus: Iterable[str] = ()) -> dict:
+    """
+    Samples the worker for `seconds` (blocking: run it in a thread) and stores the report.
+    Raises ValueError for an invalid window and ProfilerBusy if a profile is already running.
+    """
+    if not 0 < seconds <= MAX_SAMPLE_SECONDS:
+        raise ValueError(f"seconds must be in (0, {MAX_SAMPLE_SECONDS}]")
+    if not 0.001 <= interval <= 1.0:
+        raise ValueError("interval must be between 1 ms and 1 s")
+    _acquire()
+    try:
+        sampler = StackSampler(interval, focus).run(seconds)
+    finally:
+        _profiler_lock.release()
+
+    profile_id = _new_profile_id("sample")
+    tree = render_call_tree(sampler.stacks)
+    header = (
+        f"Sampled {seconds:g} s every {interval * 1000:g} ms: {sampler.samples} ticks, "
+        f"{sum(sampler.stacks.values())} stacks kept"
+        + (f" (focus: {', '.join(sorted(sampler.focus))})" if sampler.focus else "")
+    )
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / f"{profile_id}.txt").write_text(f"{header}\n{tree}\n", encoding="utf-8")
+    (PROFILE_DIR / f"{profile_id}.collapsed").write_text(render_collapsed(sampler.stacks), encoding="utf-8")
+    print(f"📈 {header}: {profile_id}")
+    return {"profile_id": profile_id, "samples": sampler.samples, "report": f"{header}\n{tree}"}
+
+
+# ============================================================
+# Stored reports
+# ============================================================
+def list_profiles() -> List[dict]:
+    """Stored reports, newest first: [{"profile_id", "files"}]."""
+    if not PROFILE_DIR.exists():
+        return []
+    files: Dict[str, List[str]] = {}
+    for path in PROFILE_DIR.iterdir():
+        if PROFILE_FILE.match(path.name):
+            files.setdefault(path.name.split(".")[0], []).append(path.name)
+    return [{"profile_id": profile_id, "files": sorted(files[profile_id])} for profile_id in sorted(files, reverse=True)]
+
+
+def profile_path(file_name: str) -> Optional[Path]:
+    """Path of a stored report file, or None if the name is not a report file that exists."""
+    if not PROFILE_FILE.match(file_name):
+        return None
+    path = PROFILE_DIR / file_name
+    return path if path.is_file() else None
@@ -0,0 +1,168 @@
+"""
+Process-wide connections (AstraDB stores, auth database, Beam embeddings client, tokenizer)
+Created lazily on first use, once per worker, and warmed up in parallel by the FastAPI
+lifespan so imports never touch the network.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+# ============================================================
+# Resource factories
+# ============================================================
+# Imports happen inside the factories so importing this module stays cheap and offline.
+def _create_embeddings():
+    from app.embedding.embedding_client import BeamGemmaEmbeddings
+    return BeamGemmaEmbeddings()
+
+
+def _create_vector_store():
+    from app.vectordb.vectordb_init import init_vector_store
+    return init_vector_store(resources.get("embeddings"))
+
+
+def _create_parent_store():
+    from app.vectordb.vectordb_init import init_parent_store
+    return init_parent_store()
+
+
+def _create_tokenizer():
+    from app.embedding.tokenizer import load_tokenizer
+    return load_tokenizer()
+
+
+def _create_auth_database():
+    from astrapy import DataAPIClient
+
+    astra_db_url = os.getenv("ASTRA_DB_URL")
+    astra_db_token = os.getenv("ASTRA_DB_TOKEN")
+    if not astra_db_url or not astra_db_token:
+        raise ValueError(
+            "Missing required environment variables!\n"
+            "Please set in backend/.env file:\n"
+            "  - ASTRA_DB_URL\n"
+            "  - ASTRA_DB_TOKEN"
+        )
+    database = DataAPIClient().get_database(astra_db_url, token=astra_db_token)
+    print(f"Connected to database {database.info().name}\n")
+    return database
+
+
+FACTORIES: Dict[str, Callable[[], Any]] = {
+    "embeddings": _create_embeddings,
+    "vector_store": _create_vector_store,
+    "parent_store": _create_parent_store,
+    "auth_database": _create_auth_database,
+    "tokenizer": _create_tokenizer,
+}
+
+# Resources warmed up at startup (comma-separated); the rest are created on first use.
+# The auth routes are disabled in main.py, so its database is not connected by default.
+STARTUP_RESOURCES = [
+    name.strip()
+    for name in os.getenv("STARTUP_RESOURCES", "embeddings,vector_store,parent_store").split(",")
+    if name.strip()
+]
+
+
+# ============================================================
+# Resource container
+# ============================================================
+class Resources:
+    """
+    Lazily created, shared connections with startup timings.
+
+    `get(name)` creates a resource on first use (thread-safe, at most once per process)
+    and `warm_up()` creates several in parallel threads so their network handshakes overlap.
+    Every creation is timed; failures are recorded and re-raised to the caller of `get`,
+    so a missing credential only breaks the routes that need it.
+
+    Args:
+        factories (dict[str, Callable]): Resource name -> zero-argument constructor.
+    """
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        self.factories = dict(factories)
+        self._values: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in self.factories}
+        self.timings_ms: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.startup_ms: Optional[float] = None
+
+    def get(self, name: str) -> Any:
+        """Returns the resource, creating it on first use."""
+        if name in self._values:
+            return self._values[name]
+        if name not in self.factories:
+            raise KeyError(f"Unknown resource '{name}'. Expected one of {', '.join(self.factories)}.")
+
+        with self._locks[name]:
+            if name not in self._values:
+                started = time.perf_counter()
+                try:
+                    self._values[name] = self.factories[name]()
+                    self.errors.pop(name, None)
+                except Exception as error:
+                    self.errors[name] = str(error)
+                    raise
+                finally:
+                    self.timings_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+        return self._values[name]
+
+    async def aget(self, name: str) -> Any:
+        """`get` for async code: a first-time creation runs in a worker thread, off the event loop."""
+        if name in self._values:
+            return self._values[name]
+        return await asyncio.to_thread(self.get, name)
+
+    async def warm_up(self, names: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Creates the given resources concurrently and records the total startup time.
+
+        Failures do not stop the others (or the server); they are reported by `health()`.
+        """
+        names = list(names)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.aget(name) for name in names), return_exceptions=True)
+        self.startup_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        failed = 0
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"❌ Failed to initialise {name}: {result}")
+        print(f"✅ Warmed up {len(names) - failed}/{len(names)} resources in {self.startup_ms} ms.")
+        return self.health()
+
+    def health(self) -> Dict[str, Any]:
+        """Startup timings and the state of every resource, for the /health endpoint."""
+        details = {}
+        for name in self.factories:
+            if name in self._values:
+                state = "ready"
+            elif name in self.errors:
+                state = "error"
+            else:
+                state = "not_initialised"
+            details[name] = {"status": state, "init_ms": self.timings_ms.get(name)}
+            if name in self.errors:
+                details[name]["error"] = self.errors[name]
+        return {
+            "status": "degraded" if self.errors else "ok",
+            "startup_ms": self.startup_ms,
+            "resources": details,
+        }
+
+    def reset(self) -> None:
+        """Drops every resource (the next `get` reconnects)."""
+        self._values.clear()
+        self.timings_ms.clear()
+        self.errors.clear()
+        self.startup_ms = None
+
+
+# One container per worker process
+resources = Resources(FACTORIES)
@@ -0,0 +1,59 @@
+"""
+Per-request stage timings (refine, embed, search, parent_fetch, generate, ...)
+Every stage is also observed in the rag_stage_duration_seconds histogram (app/core/metrics.py)
+and recorded as a trace span (app/core/tracing.py).
+The HTTP middleware in app/main.py starts a timing dict for every request and returns it
+to the client in a standard `Server-Timing` header, e.g.
+    Server-Timing: refine;dur=352.1, embed;dur=41.0, search;dur=0.8, parent_fetch;dur=0.3, generate;dur=905.7
+so benchmarks and browser dev tools can see where a request spent its time.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.core.metrics import STAGE_SECONDS
+from app.core.tracing import span
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def begin_request() -> Dict[str, float]:
+    """Starts collecting stage timings for the current request; returns the (mutable) dict."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """Runs the block as a trace span and records its duration in the histogram and the request's timings."""
+    started = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """Records a duration measured elsewhere (e.g. a pipeline stage's busy time) like a `stage` block."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={duration_ms:.1f}" for name, duration_ms in timings.items())
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Inverse of `server_timing_header` (used by the benchmarks)."""
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, *params = [field.strip() for field in entry.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                timings[name] = float(param[4:])
+    return timings
@@ -0,0 +1,263 @@
+"""
+Request tracing with W3C trace context (https://www.w3.org/TR/trace-context/)
+
+Every HTTP request gets a root span (continuing the caller's `traceparent` header when there
+is one); every `timing.stage(...)` block and every Beam call (`metrics.beam_call`) is a child
+span. Beam calls carry the `traceparent` header, and the model endpoints report their queue
+and compute time back, so a slow query can be split into model queue / compute and the rest
+(network, Beam gateway, cold start).
+
+Finished spans go to the exporter picked by TRACE_EXPORTER:
+    none  (default) nothing is recorded
+    file  JSON lines appended to TRACE_FILE (default backend/_traces/spans.jsonl)
+    otlp  batched OTLP/HTTP JSON posts to OTLP_ENDPOINT (default http://localhost:4318/v1/traces),
+          e.g. an OpenTelemetry collector or Jaeger
+A per-request waterfall can be printed from the file export:
+    python -m app.core.tracing _traces/spans.jsonl [TRACE_ID]
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[2]   # .../backend
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = Path(os.getenv("TRACE_FILE", str(BASE_DIR / "_traces" / "spans.jsonl")))
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "rag-backend")
+TRACE_EXPORTERS = ("none", "file", "otlp")
+
+
+class Span:
+    """One timed operation of a trace."""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, **attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, object] = dict(attributes)
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+            "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes, "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id) from a `traceparent` header, or (None, None) if absent/invalid."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or set(parts[1]) == {"0"}:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    return parts[1], parts[2]
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def trace_headers() -> Dict[str, str]:
+    """`traceparent` header for an outgoing call made inside the current span ({} outside a trace)."""
+    active = _current_span.get()
+    return {"traceparent": active.traceparent} if active is not None else {}
+
+
+def trace_payload() -> Dict[str, str]:
+    """
+    `{"traceparent": ...}` to add to a Beam request body while spans are exported ({} otherwise).
+    Beam endpoint functions only see the JSON body, not the headers; like `clarify_query`, the
+    key is only sent when needed so older model deployments keep accepting the payload.
+    """
+    return trace_headers() if exporter.kind != "none" else {}
+
+
+@contextmanager
+def span(name: str, traceparent: Optional[str] = None, **attributes):
+    """
+    Runs the block as a span: the child of the current span, or the root of a trace
+    (continuing `traceparent` when given). Yields the Span so attributes can be added.
+    """
+    parent = _current_span.get()
+    if parent is not None and traceparent is None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = parse_traceparent(traceparent)
+        trace_id = trace_id or os.urandom(16).hex()
+    current = Span(name, trace_id, parent_id, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as error:
+        current.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        exporter.export(current)
+
+
+# ============================================================
+# Exporters
+# ============================================================
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[Span]) -> dict:
+    """OTLP/HTTP JSON body for a list of finished spans."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": [
+            {
+                "traceId": item.trace_id, "spanId": item.span_id, "parentSpanId": item.parent_id or "",
+                "name": item.name, "kind": 1,
+                "startTimeUnixNano": str(item.start_ns), "endTimeUnixNano": str(item.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+                "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+            }
+            for item in spans
+        ]}],
+    }]}
+
+
+class SpanExporter:
+    """
+    Hands finished spans to a background thread that writes them in batches, so requests
+    never wait on the file or the collector. Export errors are printed and the batch dropped.
+    """
+
+    def __init__(self, kind: str = TRACE_EXPORTER, batch_size: int = 256, flush_seconds: float = 1.0):
+        if kind not in TRACE_EXPORTERS:
+            raise ValueError(f"Unknown TRACE_EXPORTER '{kind}'. Choose one of {TRACE_EXPORTERS}.")
+        self.kind = kind
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, finished: Span) -> None:
+        if self.kind == "none":
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(finished)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Blocks until every span queued so far has been written."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            # Collect up to batch_size spans or flush_seconds worth; a flush() marker ends the batch early
+            batch, marker = [], None
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                if isinstance(item, threading.Event):
+                    marker = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as error:
+                    print(f"❌ Span export to {self.kind} failed ({len(batch)} spans dropped): {error}")
+            if marker is not None:
+                marker.set()
+
+    def _write(self, batch: List[Span]) -> None:
+        if self.kind == "file":
+            TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(TRACE_FILE, "a", encoding="utf-8") as handle:
+                handle.writelines(json.dumps(item.as_dict(), default=str) + "\n" for item in batch)
+        else:
+            request = urllib.request.Request(
+                OTLP_ENDPOINT, data=json.dumps(to_otlp(batch)).encode(), headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+
+
+exporter = SpanExporter()
+
+
+# ============================================================
+# Waterfall (from the file export)
+# ============================================================
+def render_waterfall(spans: List[dict], width: int = 60) -> str:
+    """Text waterfall of one trace: spans indented by depth, bars on a shared time axis."""
+    if not spans:
+        return "(no spans)"
+    start = min(item["start_ns"] for item in spans)
+    total = max(max(item["end_ns"] for item in spans) - start, 1)
+    children: Dict[Optional[str], List[dict]] = {}
+    ids = {item["span_id"] for item in spans}
+    for item in sorted(spans, key=lambda item: item["start_ns"]):
+        children.setdefault(item["parent_id"] if item["parent_id"] in ids else None, []).append(item)
+
+    lines = []
+
+    def walk(parent_id, depth):
+        for item in children.get(parent_id, []):
+            offset = int((item["start_ns"] - start) / total * width)
+            length = max(int((item["end_ns"] - item["start_ns"]) / total * width), 1)
+            label = ("  " * depth + item["name"])[:32]
+            extras = " ".join(f"{key}={value}" for key, value in item["attributes"].items() if key.startswith("model."))
+            lines.append(f"{label:<32} {' ' * offset}{'█' * length:<{width - offset}} {item['duration_ms']:>9.1f} ms{'  ❌' if item['error'] else ''} {extras}")
+            walk(item["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    spans_file = Path(sys.argv[1]) if len(sys.argv) > 1 else TRACE_FILE
+    records = [json.loads(line) for line in spans_file.read_text(encoding="utf-8").splitlines() if line.strip()]
+    trace_id = sys.argv[2] if len(sys.argv) > 2 else records[-1]["trace_id"]
+    print(f"Trace {trace_id}")
+    print(render_waterfall([record for record in records if record["trace_id"] == trace_id]))
@@ -2,12 +2,40 @@ import os
 from typing import List, Any
 import aiohttp # 💡 Use asynchronous client for non-blocking I/O
 import asyncio
+import numpy as np
 from langchain_core.embeddings import Embeddings
 
+from app.core.metrics import beam_call
+from app.core.tracing import trace_headers, trace_payload
+
 # Configuration (Read from environment variables)
 BEAM_ENDPOINT_URL = os.getenv("BEAM_EMBEDDING_URL")
 BEAM_API_TOKEN = os.getenv("BEAM_EMBEDDINGS_KEY") 
 
+# EmbeddingGemma produces 768 values; its Matryoshka training lets us keep only the
+# leading 512/256/128 for cheaper storage and search. Must match the Beam endpoint's EMBEDDING_DIM.
+FULL_EMBEDDING_DIM = 768
+SUPPORTED_EMBEDDING_DIMS = (768, 512, 256, 128)
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", str(FULL_EMBEDDING_DIM)))
+
+
+def truncate_and_normalize(vectors: List[List[float]], dimension: int) -> List[List[float]]:
+    """
+    Keeps the first `dimension` values of each vector and rescales it to unit length.
+
+    Empty vectors (failed embeddings) are passed through unchanged.
+    """
+    result = []
+    for vector in vectors:
+        if not vector:
+            result.append(vector)
+            continue
+        truncated = np.asarray(vector[:dimension], dtype=np.float32)
+        norm = float(np.linalg.norm(truncated))
+        result.append((truncated / norm if norm else truncated).tolist())
+    return result
+
+
 class BeamGemmaEmbeddings(Embeddings):
     """
     Custom LangChain Embeddings class using synchronous 'requests'.
@@ -15,7 +43,7 @@ class BeamGemmaEmbeddings(Embeddings):
     This implementation resolves the startup conflict but uses blocking I/O for network calls.
     """
     
-    def __init__(self, endpoint_url: str = BEAM_ENDPOINT_URL, api_token: str = BEAM_API_TOKEN, **kwargs: Any):
+    def __init__(self, endpoint_url: str = BEAM_ENDPOINT_URL, api_token: str = BEAM_API_TOKEN, output_dim: int = EMBEDDING_DIM, **kwargs: Any):
         """Initializes the Beam Embeddings client and authenticates."""
         super().__init__(**kwargs)
         
@@ -23,8 +51,11 @@ class BeamGemmaEmbeddings(Embeddings):
             raise ValueError(
                 "Beam embedding URL (BEAM_EMBEDDING_URL) and API token (BEAM_EMBEDDINGS_KEY) must be provided."
             )
+        if output_dim not in SUPPORTED_EMBEDDING_DIMS:
+            raise ValueError(f"Unsupported embedding dimension {output_dim}; choose one of {SUPPORTED_EMBEDDING_DIMS}.")
               
         self.endpoint_url = endpoint_url
+        self.output_dim = output_dim
         self.headers = {
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json",
@@ -35,19 +66,27 @@ class BeamGemmaEmbeddings(Embeddings):
     
     async def _aembed(self, texts: List[str]) -> List[List[float]]:
         """Internal asynchronous worker using aiohttp."""
-        payload = {"input": texts}
+        payload = {"input": texts, "dimensions": self.output_dim}
         
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.post(self.endpoint_url, json=payload, timeout=60) as response:
-                    response.raise_for_status()
-                    result = await response.json()
+            with beam_call("embed", len(texts)) as call:
+                async with aiohttp.ClientSession(headers=self.headers) as session:
+                    async with session.post(self.endpoint_url, json={**payload, **trace_payload()}, headers=trace_headers(), timeout=60) as response:
+                        call["status"] = response.status
+                        response.raise_for_status()
+                        result = await response.json()
+                        call["timings"] = result.get("timings")
             
             # Note: Assuming the endpoint returns "embedding" or "embeddings" (using "embedding" for safety)
             embeddings = result.get("embeddings", [])
             
             if not isinstance(embeddings, list):
                 raise ValueError("Beam endpoint did not return a valid list of embeddings.")
+
+            # Older endpoint deployments ignore "dimensions"; truncate here so stored and
+            # query vectors always have the configured size.
+            if any(len(embedding) > self.output_dim for embedding in embeddings):
+                embeddings = truncate_and_normalize(embeddings, self.output_dim)
                 
             return embeddings
             
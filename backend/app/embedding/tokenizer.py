@@ -0,0 +1,90 @@
+"""
+The embedding model's tokenizer, run locally to size and measure chunks in tokens
+
+EmbeddingGemma reads at most EMBEDDING_MAX_TOKENS tokens per text, and characters are a poor
+proxy for that: 600 characters are ~150 tokens of English prose but several hundred of Chinese.
+With CHUNK_UNIT=tokens (app/service/rag/ingestion/chunker.py) chunk sizes are counted with the
+model's own tokenizer, through the `tokenizers` package (Rust, no model weights):
+    EMBEDDING_TOKENIZER   a tokenizer.json path, or a Hugging Face model id (default: the embedding model)
+    TOKENIZER_CACHE_DIR   where a downloaded tokenizer.json is kept (default _tokenizers/), so the
+                          vocabulary is fetched once (HUGGINGFACE_HUB_TOKEN for the gated Gemma repo)
+                          and read from disk afterwards
+Loaded once per worker as the "tokenizer" resource (app/core/resources.py). With CHUNK_UNIT=chars
+the ingestion report still counts tokens when the tokenizer is on disk (`tokenizer_available`).
+"""
+import importlib.util
+import os
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# EmbeddingGemma's context window; longer inputs are truncated by the embedding endpoint
+EMBEDDING_MAX_TOKENS = 2048
+EMBEDDING_TOKENIZER = os.getenv("EMBEDDING_TOKENIZER", "google/embeddinggemma-300m")
+TOKENIZER_CACHE_DIR = Path(os.getenv("TOKENIZER_CACHE_DIR", str(BACKEND_DIR / "_tokenizers")))
+
+
+def cached_tokenizer_path(name: str, cache_dir: Path = TOKENIZER_CACHE_DIR) -> Path:
+    """Where the tokenizer.json of a Hugging Face model id is cached."""
+    return Path(cache_dir) / f"{name.replace('/', '--')}.json"
+
+
+def tokenizer_available(name: str = EMBEDDING_TOKENIZER, cache_dir: Path = TOKENIZER_CACHE_DIR) -> bool:
+    """Whether `load_tokenizer` works offline: `tokenizers` is installed and the file is local or cached."""
+    if importlib.util.find_spec("tokenizers") is None:
+        return False
+    return Path(name).is_file() or cached_tokenizer_path(name, cache_dir).is_file()
+
+
+def load_tokenizer(name: str = EMBEDDING_TOKENIZER, cache_dir: Path = TOKENIZER_CACHE_DIR) -> Any:
+    """
+    Loads a `tokenizers.Tokenizer` from a tokenizer.json path or a Hugging Face model id.
+
+    A model id is read from the cache, or downloaded once and saved there.
+
+    Raises:
+        RuntimeError: `tokenizers` is not installed.
+    """
+    try:
+        from tokenizers import Tokenizer
+    except ImportError as error:
+        raise RuntimeError("Token-based chunking needs the `tokenizers` package: pip install tokenizers") from error
+
+    path = Path(name)
+    if path.is_file():
+        return Tokenizer.from_file(str(path))
+    cached = cached_tokenizer_path(name, cache_dir)
+    if cached.is_file():
+        return Tokenizer.from_file(str(cached))
+
+    tokenizer = Tokenizer.from_pretrained(name, token=os.getenv("HUGGINGFACE_HUB_TOKEN"))
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    tokenizer.save(str(cached))
+    print(f"✅ Downloaded the {name} tokenizer to {cached}")
+    return tokenizer
+
+
+def token_starts(tokenizer: Any, text: str, start: int = 0, end: Optional[int] = None) -> List[int]:
+    """
+    Offsets in `text` where the tokens of text[start:end] begin (no special tokens), ascending.
+
+    One encoding of a whole range lets any span inside it be counted without encoding it again:
+    see `count_tokens`.
+    """
+    end = len(text) if end is None else end
+    encoding = tokenizer.encode(text[start:end], add_special_tokens=False)
+    return [start + offset for offset, _ in encoding.offsets]
+
+
+def count_tokens(starts: List[int], start: int, end: int) -> int:
+    """Tokens beginning in [start, end), given the `token_starts` of a range containing it."""
+    return bisect_left(starts, end) - bisect_left(starts, start)
+
+
+def token_lengths(tokenizer: Any, texts: List[str]) -> List[int]:
+    """Token counts of `texts` encoded on their own (no special tokens), in one batch call."""
+    if not texts:
+        return []
+    return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
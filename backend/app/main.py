@@ -1,22 +1,36 @@
-from fastapi import FastAPI
-import httpx
+from contextlib import asynccontextmanager
+import time
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 import os
 from dotenv import load_dotenv
 load_dotenv()
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.resources import STARTUP_RESOURCES, resources
+from app.core.metrics import REQUEST_SECONDS, render_metrics
+from app.core.profiling import ProfilerBusy, is_admin, profile_call
+from app.core.timing import begin_request, server_timing_header
+from app.core.tracing import span
 # import app.api.router_auth as auth_router
 import app.api.router_ingest as ingest_router
 import app.api.router_query as query_router
+import app.api.router_admin as admin_router
 # from app.service.beam_client import query_llm
-# Initialize FastAPI app
-app = FastAPI()
 
-# Initialize the vector database
-# @app.on_event("startup")
-# def startup_event():
-#     print("Initialising vector database (if not already created)...")
-#     init_vector_db()
+# Connect to AstraDB and build the Beam embeddings client once per worker, in parallel, before
+# serving. Nothing connects at import time; failures are reported by /health and only break
+# the routes that need the failed resource (which retry the connection on their next call).
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"Initialising resources: {', '.join(STARTUP_RESOURCES) or 'none'}...")
+    await resources.warm_up(STARTUP_RESOURCES)
+    yield
+    resources.reset()
+
+
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
 
 
 # BEAM_LLM_URL = os.getenv("BEAM_LLM_URL")
@@ -41,12 +55,58 @@ app.add_middleware(
     # Popular headers include Authorization, Content-Type, X-Requested-With, etc.
 )
 
+def route_template(scope) -> str:
+    """Path template of the matched route (e.g. /api/query), "unmatched" for a 404."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Routes of an included router report their path without the router's prefix
+    prefix = next((prefix for router, prefix in ROUTER_PREFIXES if any(item is route for item in router.routes)), "")
+    return prefix + route.path
+
+
+# Opt-in profiling of one request (X-Profile: 1 or ?profile=1, plus the X-Admin-Token header):
+# the request runs under cProfile and X-Profile-Id names the report (app/core/profiling.py)
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if request.headers.get("X-Profile") != "1" and request.query_params.get("profile") != "1":
+        return await call_next(request)
+    if not is_admin(request.headers.get("X-Admin-Token")):
+        return JSONResponse({"detail": "Profiling needs a valid X-Admin-Token"}, status_code=403)
+    try:
+        response, profile_id = await profile_call(f"{request.method} {request.url.path}", lambda: call_next(request))
+    except ProfilerBusy as e:
+        return JSONResponse({"detail": str(e)}, status_code=409)
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+# Trace every request (continuing the caller's traceparent), report per-stage timings
+# (refine, embed, search, ...) in a Server-Timing response header and record the request
+# latency per route template for /metrics
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    timings = begin_request()
+    started = time.perf_counter()
+    with span(f"{request.method} {request.url.path}", traceparent=request.headers.get("traceparent")) as root:
+        response = await call_next(request)
+        route_path = route_template(request.scope)
+        root.name = f"{request.method} {route_path}"
+        root.attributes["http.status_code"] = response.status_code
+    REQUEST_SECONDS.labels(route_path, request.method, str(response.status_code)).observe(time.perf_counter() - started)
+    response.headers["X-Trace-Id"] = root.trace_id
+    if timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
 # If the request URL starts with /auth, forward it to router_auth.py
 # app.include_router(
 #    auth_router.router,     # The router object from router_auth.py
 #    prefix="/auth",          # All routes from this file will start with /auth
 #    tags=["Authentication"]  # Groups them nicely in the API docs
 # )
+ROUTER_PREFIXES = [(ingest_router.router, "/ingest"), (query_router.router, "/api"), (admin_router.router, "/admin")]
+
 app.include_router(
     ingest_router.router,
     prefix="/ingest",
@@ -58,6 +118,24 @@ app.include_router(
     prefix="/api", 
     tags=["Query"])
 
+# Profiling reports and sampling windows (admin only, see app/core/profiling.py)
+app.include_router(
+    admin_router.router,
+    prefix="/admin",
+    tags=["Admin"],
+    include_in_schema=False)
+
+# Liveness plus startup timings and the state of each shared connection
+@app.get("/health")
+def health():
+    return resources.health()
+
+# Prometheus metrics: request/stage/Beam latency histograms, Beam errors, batch sizes, cache hits
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 # A simple test endpoint to verify the backend is running, not being used at all
 @app.get("/hello")
 def hello_from_backend():
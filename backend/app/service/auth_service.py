@@ -2,41 +2,27 @@
 User authentication service
 Handles user registration, login, and account management
 """
-import os
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
-from astrapy import DataAPIClient
 
 # from auth_schema import get_users_table_definition
 from app.core.password_utils import hash_password, verify_password
 from app.core.validation import validate_email_format, validate_password_strength, sanitize_email
+from app.core.resources import resources
 
-### This part of the code will run once when the module is imported ###
 # Load environment variables from .env file
 load_dotenv()
 
-# Database connection by using URL and private token in .env file
-ASTRA_DB_URL = os.getenv("ASTRA_DB_URL")
-ASTRA_DB_TOKEN = os.getenv("ASTRA_DB_TOKEN")
 
-# If either variable is missing, raise an error
-if not ASTRA_DB_URL or not ASTRA_DB_TOKEN:
-    raise ValueError(
-        "Missing required environment variables!\n"
-        "Please set in backend/.env file:\n"
-        "  - ASTRA_DB_URL\n"
-        "  - ASTRA_DB_TOKEN"
-    )
+def get_database():
+    """
+    The AstraDB database handle, connected on first use.
 
-# Initialize database client
-client = DataAPIClient()
-# Connect to the database
-database = client.get_database(ASTRA_DB_URL, token=ASTRA_DB_TOKEN)
-
-print(f"Connected to database {database.info().name}\n")
-
-### It ends here ###
+    The connection (and the ASTRA_DB_URL / ASTRA_DB_TOKEN check) used to run at import time;
+    it now lives in app/core/resources.py so importing this module needs no network.
+    """
+    return resources.get("auth_database")
 
 class AuthenticationError(Exception):
     # Custom exception for authentication errors
@@ -58,7 +44,7 @@ class AuthService:
     def _drop_table(self):
         """Drop the users table (for testing purposes)"""
         try:
-            database.drop_table(self.table_name)
+            get_database().drop_table(self.table_name)
             print(f"✅ Table '{self.table_name}' dropped successfully")
         except Exception as e:
             print(f"❌ Failed to drop table: {e}")
@@ -67,7 +53,7 @@ class AuthService:
 
     def get_table(self):
         """Get or create the users table"""
-        table = database.get_collection(self.table_name)
+        table = get_database().get_collection(self.table_name)
         return table
     
     def _get_next_user_id(self) -> int:
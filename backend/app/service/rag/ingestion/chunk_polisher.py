@@ -18,26 +18,37 @@ def polish_chunks(chunks):
             We are only modifying the "text" field in each dictionary.
     """
     for chunk in chunks:
-        text = chunk["text"]
+        # Amend the chunk text
+        chunk["text"] = polish_text(chunk["text"])
 
-        # --- Step 1: Normalize whitespace and line breaks ---
-        # Remove excessive spaces, tabs, or newlines so all spacing becomes single spaces.
-        text = re.sub(r"\s+", " ", text.strip())
+    return chunks
 
-        # --- Step 2: Fix spacing before punctuation ---
-        # Example: "Hello , world !" → "Hello, world!"
-        text = re.sub(r"\s+([.,!?;:])", r"\1", text)
 
-        # --- Step 3: Ensure first character is capitalized ---
-        # Helps maintain cleaner sentence casing for readability and consistency.
-        if text and not text[0].isupper():
-            text = text[0].upper() + text[1:]
+def polish_text(text: str) -> str:
+    """
+    Cleans one chunk text (the steps of `polish_chunks`); used directly on ChildChunk records.
 
-        # --- Step 4: Replace bullet symbols or stray artifacts ---
-        # Converts common bullet characters (•) to a plain dash ("-") for uniformity.
-        text = re.sub(r"•\s*", "- ", text)
+    Args:
+        text (str): The raw chunk text.
 
-        # Amend the chunk text
-        chunk["text"] = text
+    Returns:
+        str: The polished text.
+    """
+    # --- Step 1: Normalize whitespace and line breaks ---
+    # Remove excessive spaces, tabs, or newlines so all spacing becomes single spaces.
+    text = re.sub(r"\s+", " ", text.strip())
+
+    # --- Step 2: Fix spacing before punctuation ---
+    # Example: "Hello , world !" → "Hello, world!"
+    text = re.sub(r"\s+([.,!?;:])", r"\1", text)
+
+    # --- Step 3: Ensure first character is capitalized ---
+    # Helps maintain cleaner sentence casing for readability and consistency.
+    if text and not text[0].isupper():
+        text = text[0].upper() + text[1:]
+
+    # --- Step 4: Replace bullet symbols or stray artifacts ---
+    # Converts common bullet characters (•) to a plain dash ("-") for uniformity.
+    text = re.sub(r"•\s*", "- ", text)
 
-    return chunks
\ No newline at end of file
+    return text
\ No newline at end of file
@@ -1,40 +1,85 @@
-from typing import List, Tuple
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from pydantic import BaseModel, Field
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Any, List, Optional, Tuple
 from uuid import uuid4 
 
-# Define Schema for Parent and Child chunks
-class ParentChunkModel(BaseModel):
-    """Schema for the large, context-rich Parent Documents (Document Store)."""
-    # Uses Field(..., alias="_id") and by_alias=True config for AstraDB compatibility
-    # The MongoDB driver prefers '_id', but we use 'parent_id' internally.
-    db_id: str = Field(..., alias="_id")
-    content: str                    # The large text segment (full context for LLM)
+from app.embedding.tokenizer import EMBEDDING_MAX_TOKENS, token_starts
+
+# Define the records for Parent and Child chunks
+# Plain slotted dataclasses: one small object per chunk from the chunker to the store, where
+# vectordb.upsert_documents converts them once into what AstraDB expects (no validation, no dicts).
+#
+# A chunk does not hold its own copy of the text: it is a span [start, end) of the extracted
+# document text (the output of extract_text, pages joined by newlines) over a `source` buffer
+# shared by all chunks of one split, where `base` is the document offset of source[0].
+# `content` / `text` slice the buffer when the chunk is sent to the embedder or a store, and
+# the offsets are stored with it (start_index / end_index) for exact source highlighting.
+# Built from a plain string (e.g. ParentChunk(id, "some text", name)), a chunk spans all of it.
+@dataclass(slots=True)
+class ParentChunk:
+    """The large, context-rich Parent Documents (Document Store)."""
+    id: str                         # Key in the Document Store (AstraDB '_id'); children refer to it as parent_id
+    source: str                     # Shared text buffer the chunk is a span of
     document_name: str
-    
-    class Config:
-        populate_by_name = True     # Allows initialization by field alias (_id)
-        
-class ChildChunkModel(BaseModel):
-    """Schema for the small, embedded Child Chunks (Vector Store)."""
+    start: int = 0                  # Span in the document text
+    end: Optional[int] = None       # (defaults to the end of `source`)
+    base: int = 0                   # Document offset of source[0]
+
+    def __post_init__(self):
+        if self.end is None:
+            self.end = self.base + len(self.source)
+
+    @property
+    def content(self) -> str:
+        """The large text segment (full context for LLM)."""
+        return self.source[self.start - self.base:self.end - self.base]
+
+@dataclass(slots=True)
+class ChildChunk:
+    """The small, embedded Child Chunks (Vector Store)."""
     index: int                       # Global sequential index
-    text: str                        # The small text segment (embedded for vector search)
-    parent_id: str                   # Foreign key linking back to the ParentChunkModel._id
+    source: str                      # Shared text buffer the chunk is a span of
+    parent_id: str                   # Foreign key linking back to ParentChunk.id
     file_name: str                   # Original file name
+    start: int = 0                   # Span in the document text
+    end: Optional[int] = None        # (defaults to the end of `source`)
+    base: int = 0                    # Document offset of source[0]
+    polished: Optional[str] = None   # Set by the polish stage; what gets embedded and stored
+
+    def __post_init__(self):
+        if self.end is None:
+            self.end = self.base + len(self.source)
+
+    @property
+    def text(self) -> str:
+        """The small text segment (embedded for vector search): the polished text once there is one."""
+        return self.source[self.start - self.base:self.end - self.base] if self.polished is None else self.polished
 
 # ================================================================
 # Parent-Child Splitting Logic (Used by Ingestion Route)
 # ================================================================
 
+SEPARATORS = ["\n\n", "\n", " ", ""]   # Paragraphs, then lines, then words, then characters
+
+# Sizes when chunking in tokens of the embedding model (a tokenizer is passed): about what the
+# character defaults give on English prose, but the same embedding input size for CJK text,
+# where a character is often a token of its own
+PARENT_MAX_TOKENS = int(os.getenv("PARENT_MAX_TOKENS", "384"))
+CHILD_MAX_TOKENS = int(os.getenv("CHILD_MAX_TOKENS", "160"))
+
 def split_parent_child_chunks(
     text: str,
     file_name: str, 
     parent_max_chars: int = 1500,
-    child_max_chars: int = 600
-) -> Tuple[List[ParentChunkModel], List[ChildChunkModel]]:
+    child_max_chars: int = 600,
+    tokenizer: Any = None,
+    parent_max_tokens: int = PARENT_MAX_TOKENS,
+    child_max_tokens: int = CHILD_MAX_TOKENS,
+) -> Tuple[List[ParentChunk], List[ChildChunk]]:
     """
-    Splits text into separate Parent (Context) and Child (Vector) chunks using LangChain RecursiveCharacterTextSplitter.
+    Splits text into separate Parent (Context) and Child (Vector) chunks using RecursiveSpanSplitter.
 
     Parent Chunks are larger segments of text while Child Chunks are smaller segments derived from each Parent Chunk.
     A metadata field `parent_id` is included in each Child Chunk to link it back to its Parent Chunk such that
@@ -45,72 +90,267 @@ def split_parent_child_chunks(
         file_name (str): The name of the original document (e.g., 'sample.pdf').
         parent_max_chars (int, optional): The maximum size for large **Parent Chunks** (Context Store). Defaults to 1500.
         child_max_chars (int, optional): The maximum size for small **Child Chunks** (Vector Store). Defaults to 600.
+        tokenizer (tokenizers.Tokenizer, optional): Size chunks in tokens of this tokenizer
+            (app/embedding/tokenizer.py) instead of characters. Defaults to None.
+        parent_max_tokens (int, optional): Parent chunk size with a tokenizer. Defaults to PARENT_MAX_TOKENS.
+        child_max_tokens (int, optional): Child chunk size with a tokenizer, at most EMBEDDING_MAX_TOKENS. Defaults to CHILD_MAX_TOKENS.
 
     Returns:
-        Tuple[List[ParentChunkModel], List[ChildChunkModel]]: A tuple containing:
-            - Index 0: `final_parent_chunks` (List of ParentChunkModel)
-            - Index 1: `final_child_chunks` (List of ChildChunkModel)
+        Tuple[List[ParentChunk], List[ChildChunk]]: A tuple containing:
+            - Index 0: `final_parent_chunks` (List of ParentChunk)
+            - Index 1: `final_child_chunks` (List of ChildChunk)
 
     Notes:
-        - Uses **LangChain's RecursiveCharacterTextSplitter** for semantically aware splitting.
+        - Uses **RecursiveSpanSplitter** (same chunks as LangChain's RecursiveCharacterTextSplitter) for semantically aware splitting.
         - The `child_max_chars` limits chunk size to ensure compatibility with embedding model input limits and database byte constraints.
         - Each child chunk will have a 10% overlap with adjacent chunks to preserve context.
+        - Parents and children are spans over `text` itself (no copies); their start / end offsets index `text`.
     """
-    if not text.strip():
-        return [], []
-
-    # 1. Define Splitters for both parent and child splitters
-    # Purpose: Maximize context for the LLM during answer generation.
-    parent_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=parent_max_chars,
-        chunk_overlap=0,
-        separators=["\n\n", "\n", " ", ""]
-    )
-    
-    # Purpose: Maximize search precision and fit within the embedding model's optimal input size.
-    child_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=child_max_chars, 
-        chunk_overlap=int(child_max_chars * 0.1), # 10% overlap helps capture context around boundaries
-        separators=["\n\n", "\n", " ", ""]
-    )
-    
-    # 2. Create base document for the splitter to process (Document object from LangChain)
-    base_doc = Document(page_content=text, metadata={"document_name": file_name})
-    
-    # 3. Split the document into parent chunks (Return List [Document])
-    parent_docs = parent_splitter.split_documents([base_doc])
-    
-    final_parent_chunks = []
-    final_child_chunks = []
-    child_global_index = 0
-
-    # 4. For each Parent Document, create Child Documents
-    for parent_doc in parent_docs:
-        # Generate a unique ID for this parent chunk
-        parent_id = str(uuid4())
-        
-        # Format the Parent Chunk for insertion into the AstraDB Document Store (Parent_Store)
-        final_parent_chunks.append(
-            ParentChunkModel(
-                db_id=parent_id,
-                content=parent_doc.page_content.strip(),
-                document_name=parent_doc.metadata.get("document_name"),
-            )
+    # One feed of the whole text, then the tail: the same chunks as splitting it at once
+    splitter = StreamingParentChildSplitter(file_name, parent_max_chars, child_max_chars, tokenizer, parent_max_tokens, child_max_tokens)
+    parents, children = splitter.feed(text)
+    tail_parents, tail_children = splitter.flush()
+    return parents + tail_parents, children + tail_children
+
+
+class StreamingParentChildSplitter:
+    """
+    `split_parent_child_chunks` for text that arrives in pieces (e.g. PDF pages).
+
+    `feed(piece)` appends the piece (pieces are joined with newlines, like `extract_text`, so the
+    chunk offsets index the extract_text output) and returns the parent chunks that are
+    complete, with their children, as spans over the current buffer; the last parent chunk of
+    the buffer stays open because the next piece may extend it. `flush()` returns the rest.
+    Parent chunks never overlap, so no text is lost or repeated and the size limits hold; a
+    boundary near a feed point can land elsewhere than when splitting the whole text at once
+    (a later piece can change which separator the splitter prefers). A single feed followed by
+    `flush()` gives exactly the one-shot result. Child indexes continue across feeds.
+
+    With a tokenizer, the buffer is encoded once per feed and the parents and their children are
+    sized by the tokens starting inside them (RecursiveSpanSplitter with token offsets), so the
+    limits are parent_max_tokens / child_max_tokens and the character limits are unused.
+
+    Args:
+        file_name (str): The name of the original document (e.g., 'sample.pdf').
+        parent_max_chars (int, optional): The maximum size for large **Parent Chunks**. Defaults to 1500.
+        child_max_chars (int, optional): The maximum size for small **Child Chunks**. Defaults to 600.
+        tokenizer (tokenizers.Tokenizer, optional): Size chunks in its tokens instead. Defaults to None.
+        parent_max_tokens (int, optional): Parent chunk size with a tokenizer. Defaults to PARENT_MAX_TOKENS.
+        child_max_tokens (int, optional): Child chunk size with a tokenizer. Defaults to CHILD_MAX_TOKENS.
+
+    Raises:
+        ValueError: child_max_tokens exceeds the embedding model's EMBEDDING_MAX_TOKENS.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        parent_max_chars: int = 1500,
+        child_max_chars: int = 600,
+        tokenizer: Any = None,
+        parent_max_tokens: int = PARENT_MAX_TOKENS,
+        child_max_tokens: int = CHILD_MAX_TOKENS,
+    ):
+        if tokenizer is not None:
+            if child_max_tokens > EMBEDDING_MAX_TOKENS:
+                raise ValueError(f"child_max_tokens must be at most {EMBEDDING_MAX_TOKENS} (the embedding model's input limit), got {child_max_tokens}")
+            parent_max_chars, child_max_chars = parent_max_tokens, child_max_tokens
+        self.file_name = file_name
+        self.tokenizer = tokenizer
+        self.parent_max_chars = parent_max_chars
+        self._buffer = ""
+        self._tokens: Optional[List[int]] = None   # Token starts of the buffer (with a tokenizer)
+        self._base = 0          # Document offset of the buffer
+        self._emitted = 0       # Leading characters of the buffer already returned as parents
+        self._started = False
+        self._child_index = 0
+
+        # 1. Define Splitters for both parent and child splitters (sizes in tokens with a tokenizer)
+        # Purpose: Maximize context for the LLM during answer generation.
+        self.parent_splitter = RecursiveSpanSplitter(
+            chunk_size=parent_max_chars,
+            chunk_overlap=0,
         )
-        
-        # 5. Split Parent Document into Child Documents (Return List [Document])
-        child_docs = child_splitter.split_documents([parent_doc])
-        
-        for child_doc in child_docs:
-            # Format the Child Chunk for insertion into the AstraDB Vector Store (Vector_Store)
-            final_child_chunks.append(
-                ChildChunkModel(
-                    index=child_global_index,
-                    text=child_doc.page_content.strip(),
-                    parent_id=parent_id, # Links back to Parent Chunk
-                    file_name=file_name,
-                )
+
+        # Purpose: Maximize search precision and fit within the embedding model's optimal input size.
+        self.child_splitter = RecursiveSpanSplitter(
+            chunk_size=child_max_chars,
+            chunk_overlap=int(child_max_chars * 0.1), # 10% overlap helps capture context around boundaries
+        )
+
+    def feed(self, piece: str) -> Tuple[List[ParentChunk], List[ChildChunk]]:
+        if self._started:
+            # The open parent plus the new piece become the next buffer
+            self._buffer = f"{self._buffer[self._emitted:]}\n{piece}"
+            self._base, self._emitted = self._base + self._emitted, 0
+        else:
+            self._buffer = piece
+        self._started = True
+        if self.tokenizer is not None:
+            self._tokens = token_starts(self.tokenizer, self._buffer)
+        if (len(self._buffer) if self._tokens is None else len(self._tokens)) <= self.parent_max_chars:
+            return [], []
+        parent_spans = self.parent_splitter.split(self._buffer, tokens=self._tokens)
+        if len(parent_spans) < 2:
+            return [], []
+        # Everything before the last parent is final; the last one may still grow
+        self._emitted = parent_spans[-1][0]
+        return self._chunks(self._buffer, self._base, parent_spans[:-1], self._tokens)
+
+    def flush(self) -> Tuple[List[ParentChunk], List[ChildChunk]]:
+        # The tail stays a span of the current buffer (a single feed: of the caller's text)
+        source, base, emitted, tokens = self._buffer, self._base, self._emitted, self._tokens
+        if self.tokenizer is not None and tokens is None:
+            tokens = token_starts(self.tokenizer, source)
+        parent_spans = self.parent_splitter.split(source, emitted, tokens=tokens)
+        self._buffer, self._tokens, self._base, self._emitted = "", None, base + len(source), 0
+        return self._chunks(source, base, parent_spans, tokens)
+
+    def _chunks(
+        self, source: str, base: int, parent_spans: List[Tuple[int, int]], tokens: Optional[List[int]] = None
+    ) -> Tuple[List[ParentChunk], List[ChildChunk]]:
+        final_parent_chunks = []
+        final_child_chunks = []
+
+        # 2. For each Parent span, create its Child spans (split in place: the parent text is never copied)
+        for parent_start, parent_end in parent_spans:
+            # Generate a unique ID for this parent chunk
+            parent_id = str(uuid4())
+
+            # Format the Parent Chunk for insertion into the AstraDB Document Store (Parent_Store)
+            final_parent_chunks.append(
+                ParentChunk(parent_id, source, self.file_name, base + parent_start, base + parent_end, base)
             )
-            child_global_index += 1
-            
-    return final_parent_chunks, final_child_chunks
\ No newline at end of file
+
+            # 3. Split the Parent span into Child spans
+            for child_start, child_end in self.child_splitter.split(source, parent_start, parent_end, tokens):
+                # Format the Child Chunk for insertion into the AstraDB Vector Store (Vector_Store)
+                final_child_chunks.append(
+                    ChildChunk(
+                        self._child_index, source, parent_id, self.file_name,  # parent_id links back to Parent Chunk
+                        base + child_start, base + child_end, base,
+                    )
+                )
+                self._child_index += 1
+
+        return final_parent_chunks, final_child_chunks
+
+
+class RecursiveSpanSplitter:
+    """
+    LangChain's RecursiveCharacterTextSplitter (with its defaults: separators kept at the start
+    of the following piece, chunks stripped, length in characters) working on offsets.
+
+    `split(text, start, end)` returns the (start, end) spans of the chunks of text[start:end]
+    without keeping any substring: the same chunks LangChain returns for that text, found in a
+    single pass over the piece lengths of each level instead of regex splits, string joins and
+    a `find` per chunk. The rules are LangChain's:
+      * the first separator occurring in the range splits it into pieces, each piece starting
+        with its separator;
+      * pieces shorter than chunk_size are merged into chunks of at most chunk_size characters,
+        the next chunk starting with the last pieces of the previous one (at most chunk_overlap
+        characters); longer pieces are split again with the next separators;
+      * chunks are stripped of surrounding whitespace, and dropped if nothing is left.
+
+    Given `tokens`, the offsets where the tokens of the text begin (`token_starts` over a range
+    containing [start, end), e.g. the whole buffer), sizes are counted in tokens instead: a piece
+    counts the tokens beginning inside it (two bisects), and the last level splits between
+    tokens instead of characters. Counts come from that one encoding of the range, so a chunk
+    encoded on its own can differ by a token or so where its boundary cuts a word.
+
+    Args:
+        chunk_size (int): The maximum size of a chunk, in characters (or tokens).
+        chunk_overlap (int, optional): Characters (or tokens) shared by consecutive chunks at most. Defaults to 0.
+        separators (List[str], optional): Separators, most preferred first. Defaults to SEPARATORS.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0, separators: Optional[List[str]] = None):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be > 0, got {chunk_size}")
+        if not 0 <= chunk_overlap <= chunk_size:
+            raise ValueError(f"chunk_overlap must be between 0 and chunk_size ({chunk_size}), got {chunk_overlap}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = list(SEPARATORS if separators is None else separators)
+
+    def split(self, text: str, start: int = 0, end: Optional[int] = None, tokens: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+        spans: List[Tuple[int, int]] = []
+        self._split(text, start, len(text) if end is None else end, 0, spans, tokens)
+        return spans
+
+    def _split(self, text: str, start: int, end: int, level: int, spans: List[Tuple[int, int]], tokens: Optional[List[int]] = None) -> None:
+        # Pick the first separator that occurs in the range ("" always does: single characters)
+        separators = self.separators
+        separator, next_level = separators[-1], len(separators)
+        for index in range(level, len(separators)):
+            if not separators[index]:
+                separator, next_level = "", len(separators)
+                break
+            if text.find(separators[index], start, end) != -1:
+                separator, next_level = separators[index], index + 1
+                break
+
+        # Cut before every occurrence, so each piece starts with its separator
+        # (piece lengths come from str.split and the cuts from their running sum: both in C)
+        if separator:
+            step = len(separator)
+            lengths = list(map(len, text[start:end].split(separator)))
+            sizes = [length + step for length in lengths[1:]]
+            if lengths[0]:
+                sizes.insert(0, lengths[0])
+            cuts = list(accumulate(sizes, initial=start))
+        elif tokens is None:
+            sizes = [1] * (end - start)
+            cuts = list(range(start, end + 1))
+        else:
+            # In tokens the smallest pieces are the tokens themselves
+            inner = tokens[bisect_right(tokens, start):bisect_left(tokens, end)]
+            cuts = [start, *dict.fromkeys(inner), end] if end > start else []
+        if tokens is not None:
+            positions = [bisect_left(tokens, cut) for cut in cuts]
+            sizes = [after - before for before, after in zip(positions, positions[1:])]
+
+        # Merge runs of short pieces; split long pieces again with the next separators
+        if not sizes:
+            return
+        if max(sizes) < self.chunk_size:
+            self._merge(text, cuts, sizes, 0, len(sizes), spans)
+            return
+        run_start = 0
+        for index, size in enumerate(sizes):
+            if size < self.chunk_size:
+                continue
+            if index > run_start:
+                self._merge(text, cuts, sizes, run_start, index, spans)
+            if next_level >= len(separators):
+                spans.append((cuts[index], cuts[index + 1]))
+            else:
+                self._split(text, cuts[index], cuts[index + 1], next_level, spans, tokens)
+            run_start = index + 1
+        if len(sizes) > run_start:
+            self._merge(text, cuts, sizes, run_start, len(sizes), spans)
+
+    def _merge(self, text: str, cuts: List[int], sizes: List[int], first: int, last: int, spans: List[Tuple[int, int]]) -> None:
+        """Merges the pieces first..last-1 (contiguous, so a chunk is the span of its pieces)."""
+        chunk_size, chunk_overlap = self.chunk_size, self.chunk_overlap
+        window = first      # first piece of the chunk being built
+        total = 0           # its length
+        for index in range(first, last):
+            size = sizes[index]
+            if total + size > chunk_size and index > window:
+                self._emit(text, cuts[window], cuts[index], spans)
+                # Keep the last pieces (at most chunk_overlap characters) as the start of the next chunk
+                while total > chunk_overlap or (total + size > chunk_size and total > 0):
+                    total -= sizes[window]
+                    window += 1
+            total += size
+        self._emit(text, cuts[window], cuts[last], spans)
+
+    @staticmethod
+    def _emit(text: str, start: int, end: int, spans: List[Tuple[int, int]]) -> None:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
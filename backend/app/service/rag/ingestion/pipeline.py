@@ -0,0 +1,276 @@
+"""
+Pipelined ingestion: extract -> chunk -> polish -> store, connected by bounded asyncio queues
+
+Each stage works on the output of the previous one as soon as it is available, so the first
+child chunks are embedded and stored while later PDF pages are still being extracted:
+
+    extract   PDF pages / Word paragraph groups / text slices (`iter_text`, in a worker thread)
+    chunk     StreamingParentChildSplitter: parents are emitted once the next page can no longer extend them
+    polish    polish_text on the child records (their text is sliced out of the shared buffer here), grouped into store batches of INGEST_STORE_BATCH children
+    store     upsert_documents (embedding + parent/child writes), INGEST_STORE_WORKERS batches in flight
+
+The queues hold at most INGEST_QUEUE_SIZE items, so a slow store stage holds back extraction
+instead of buffering the whole document. Every stage reports its busy time and occupancy
+(busy / wall time) in the result, the rag_ingest_stage_occupancy histogram and one trace span
+per stage; several stages with a high occupancy mean they overlapped.
+
+Chunks are sized in characters, or with CHUNK_UNIT=tokens in tokens of the embedding model's
+tokenizer (the "tokenizer" resource, see app/embedding/tokenizer.py). The polish stage measures
+every parent and (polished) child in tokens whenever the tokenizer can be loaded offline (else in
+characters); the result reports their length distribution per document and how many children
+exceed EMBEDDING_MAX_TOKENS, and every length goes to the rag_chunk_length histogram.
+
+If any stage fails the others are cancelled and everything stored so far is deleted again
+(vectordb.delete_documents) before the error is raised as IngestionStageError.
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from app.core.metrics import CHUNK_LENGTH, INGEST_STAGE_OCCUPANCY
+from app.core.resources import resources
+from app.core.timing import record_stage
+from app.core.tracing import span
+from app.embedding.tokenizer import EMBEDDING_MAX_TOKENS, token_lengths, tokenizer_available
+from app.service.rag.ingestion.chunk_polisher import polish_text
+from app.service.rag.ingestion.chunker import (
+    CHILD_MAX_TOKENS,
+    PARENT_MAX_TOKENS,
+    ChildChunk,
+    ParentChunk,
+    StreamingParentChildSplitter,
+)
+from app.service.rag.ingestion.text_extractor import iter_text
+from app.vectordb.vectordb import delete_documents, upsert_documents
+
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+INGEST_STORE_BATCH = int(os.getenv("INGEST_STORE_BATCH", "64"))
+INGEST_STORE_WORKERS = int(os.getenv("INGEST_STORE_WORKERS", "4"))
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")  # chars | tokens
+STAGES = ("extract", "chunk", "polish", "store")
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+
+class IngestionStageError(RuntimeError):
+    """A pipeline stage failed; `stage` names it and `error` is the original exception."""
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class _StageClock:
+    """Busy time per stage: time with at least one item of that stage in progress."""
+
+    def __init__(self):
+        self.busy = {name: 0.0 for name in STAGES}
+        self.items = {name: 0 for name in STAGES}
+        self._in_flight = {name: 0 for name in STAGES}
+        self._since = {name: 0.0 for name in STAGES}
+
+    @contextmanager
+    def working(self, name: str):
+        if self._in_flight[name] == 0:
+            self._since[name] = time.perf_counter()
+        self._in_flight[name] += 1
+        try:
+            yield
+        finally:
+            self._in_flight[name] -= 1
+            self.items[name] += 1
+            if self._in_flight[name] == 0:
+                self.busy[name] += time.perf_counter() - self._since[name]
+
+
+def _distribution(lengths: List[int]) -> Dict[str, Any]:
+    """Count, min, median, 95th percentile, max and mean of chunk lengths."""
+    if not lengths:
+        return {"count": 0}
+    ordered = sorted(lengths)
+    count = len(ordered)
+    return {
+        "count": count,
+        "min": ordered[0],
+        "p50": ordered[count // 2],
+        "p95": ordered[min(count - 1, int(count * 0.95))],
+        "max": ordered[-1],
+        "mean": round(sum(ordered) / count, 1),
+    }
+
+
+async def ingest_document(
+    content_type: str,
+    data: bytes,
+    file_name: str,
+    parent_max_chars: int = 1500,
+    child_max_chars: int = 600,
+    parent_max_tokens: int = PARENT_MAX_TOKENS,
+    child_max_tokens: int = CHILD_MAX_TOKENS,
+) -> Dict[str, Any]:
+    """
+    Extracts, chunks, polishes and stores one document with the stages overlapping.
+
+    Args:
+        content_type (str): The MIME type of the file (e.g., "application/pdf").
+        data (bytes): The raw bytes of the file.
+        file_name (str): The name of the original document.
+        parent_max_chars (int, optional): Parent chunk size. Defaults to 1500.
+        child_max_chars (int, optional): Child chunk size. Defaults to 600.
+        parent_max_tokens (int, optional): Parent chunk size with CHUNK_UNIT=tokens. Defaults to PARENT_MAX_TOKENS.
+        child_max_tokens (int, optional): Child chunk size with CHUNK_UNIT=tokens. Defaults to CHILD_MAX_TOKENS.
+
+    Returns:
+        Dict[str, Any]: Counts (pages, parents, children), wall time, per stage the busy time,
+        occupancy and number of items processed, and `chunk_lengths`: the unit (tokens or
+        chars) and the length distribution of the parents and children.
+
+    Raises:
+        ValueError: Unsupported content type (before anything runs).
+        IngestionStageError: A stage failed; whatever was already stored has been deleted.
+    """
+    units = iter_text(content_type, data)
+    pages: asyncio.Queue = asyncio.Queue(INGEST_QUEUE_SIZE)
+    chunks: asyncio.Queue = asyncio.Queue(INGEST_QUEUE_SIZE)
+    batches: asyncio.Queue = asyncio.Queue(INGEST_QUEUE_SIZE)
+    clock = _StageClock()
+    stored_parents: List[str] = []
+    stored_children: List[str] = []
+    totals = {"pages": 0, "parents": 0, "children": 0}
+    lengths: Dict[str, List[int]] = {"parent": [], "child": []}
+    tokenizer = None  # loaded by the chunk stage
+
+    async def extract():
+        while True:
+            with clock.working("extract"):
+                # PDF parsing is CPU-bound: run it off the event loop so the other stages keep going
+                unit = await asyncio.to_thread(next, units, _DONE)
+            if unit is _DONE:
+                break
+            totals["pages"] += 1
+            await pages.put(unit)
+        await pages.put(_DONE)
+
+    async def chunk():
+        nonlocal tokenizer
+        if CHUNK_UNIT == "tokens" or tokenizer_available():
+            tokenizer = await resources.aget("tokenizer")
+        splitter = None
+        while (unit := await pages.get()) is not _DONE:
+            with clock.working("chunk"):
+                splitter = splitter or StreamingParentChildSplitter(
+                    file_name, parent_max_chars, child_max_chars,
+                    tokenizer if CHUNK_UNIT == "tokens" else None, parent_max_tokens, child_max_tokens,
+                )
+                parents, children = splitter.feed(unit)
+            if parents:
+                await chunks.put((parents, children))
+        if splitter is not None:
+            with clock.working("chunk"):
+                parents, children = splitter.flush()
+            if parents:
+                await chunks.put((parents, children))
+        await chunks.put(_DONE)
+
+    async def polish():
+        pending_parents: List[ParentChunk] = []
+        pending_children: List[ChildChunk] = []
+        while (item := await chunks.get()) is not _DONE:
+            parents, children = item
+            with clock.working("polish"):
+                # The child texts are sliced out of the shared buffer here, right before the store
+                for child in children:
+                    child.polished = polish_text(child.text)
+                # Lengths as the LLM and the embedder see them: parents as stored, children as embedded
+                parent_texts, child_texts = [parent.content for parent in parents], [child.text for child in children]
+                if tokenizer is not None:
+                    lengths["parent"].extend(token_lengths(tokenizer, parent_texts))
+                    lengths["child"].extend(token_lengths(tokenizer, child_texts))
+                else:
+                    lengths["parent"].extend(map(len, parent_texts))
+                    lengths["child"].extend(map(len, child_texts))
+                pending_parents.extend(parents)
+                pending_children.extend(children)
+            # Store batches end on a parent boundary, so a batch never holds children without their parent
+            if len(pending_children) >= INGEST_STORE_BATCH:
+                await batches.put((pending_parents, pending_children))
+                pending_parents, pending_children = [], []
+        if pending_parents:
+            await batches.put((pending_parents, pending_children))
+        for _ in range(INGEST_STORE_WORKERS):
+            await batches.put(_DONE)
+
+    async def store():
+        while (item := await batches.get()) is not _DONE:
+            parents, children = item
+            with clock.working("store"):
+                child_ids = await upsert_documents(parent_chunks=parents, child_chunks=children)
+            stored_parents.extend(parent.id for parent in parents)
+            stored_children.extend(child_ids)
+            totals["parents"] += len(parents)
+            totals["children"] += len(children)
+
+    async def run_stage(name, work):
+        with span(f"ingest.{name}") as stage_span:
+            try:
+                await work()
+            except Exception as error:
+                raise IngestionStageError(name, error) from error
+            finally:
+                stage_span.attributes["busy_ms"] = round(clock.busy[name] * 1000, 1)
+                stage_span.attributes["items"] = clock.items[name]
+
+    started = time.perf_counter()
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(run_stage("extract", extract))
+            group.create_task(run_stage("chunk", chunk))
+            group.create_task(run_stage("polish", polish))
+            for _ in range(INGEST_STORE_WORKERS):
+                group.create_task(run_stage("store", store))
+    except ExceptionGroup as errors:
+        error = errors.exceptions[0]
+        print(f"❌ Ingestion of '{file_name}' failed in {error}")
+        if stored_parents or stored_children:
+            await delete_documents(stored_parents, stored_children)
+        raise error
+    finally:
+        try:
+            units.close()
+        except ValueError:
+            pass  # still running in a cancelled worker thread; it is closed when collected
+
+    wall = time.perf_counter() - started
+    stages = {}
+    for name in STAGES:
+        occupancy = clock.busy[name] / wall if wall else 0.0
+        INGEST_STAGE_OCCUPANCY.labels(name).observe(min(occupancy, 1.0))
+        if name != "store":  # the store stage is timed per call as parent_upsert / child_upsert
+            record_stage(name, clock.busy[name])
+        stages[name] = {"busy_ms": round(clock.busy[name] * 1000, 1), "occupancy": round(occupancy, 3), "items": clock.items[name]}
+    occupancies = ", ".join(f"{name} {stages[name]['occupancy']:.0%}" for name in STAGES)
+    print(
+        f"✅ Ingested '{file_name}': {totals['pages']} pages, {totals['parents']} parents, "
+        f"{totals['children']} children in {wall:.2f}s (occupancy: {occupancies})"
+    )
+
+    length_unit = "chars" if tokenizer is None else "tokens"
+    for kind, values in lengths.items():
+        histogram = CHUNK_LENGTH.labels(kind, length_unit)
+        for value in values:
+            histogram.observe(value)
+    chunk_lengths = {"unit": length_unit, "parents": _distribution(lengths["parent"]), "children": _distribution(lengths["child"])}
+    if tokenizer is not None:
+        chunk_lengths["children_over_window"] = sum(value > EMBEDDING_MAX_TOKENS for value in lengths["child"])
+    if lengths["child"]:
+        children, parents = chunk_lengths["children"], chunk_lengths["parents"]
+        print(
+            f"   Chunk lengths ({length_unit}): children p50 {children['p50']} / p95 {children['p95']} / max {children['max']}, "
+            f"parents p50 {parents['p50']} / max {parents['max']}"
+        )
+    if chunk_lengths.get("children_over_window"):
+        print(f"⚠️ {chunk_lengths['children_over_window']} children exceed the {EMBEDDING_MAX_TOKENS}-token embedding window and will be truncated")
+    return {"file_name": file_name, **totals, "seconds": round(wall, 3), "stages": stages, "chunk_lengths": chunk_lengths}
@@ -1,6 +1,8 @@
-from pathlib import Path
-import fitz  # PyMuPDF
-import docx
+import io
+from typing import Iterator
+
+# PyMuPDF and python-docx are imported by the branch that needs them: together they add
+# ~200 ms to every worker start, and query-only workers never extract files
 
 # Supported content types (Currently includes PDF, Word, and plain text)
 SUPPORTED = {
@@ -17,45 +19,67 @@ def extract_text(contentType: str, data: bytes) -> str:
         data (bytes): The raw bytes of the file.
     Return a huge string of all extracted text.
     """
+    # The pages / sections of `iter_text` joined with newlines
+    return "\n".join(iter_text(contentType, data))
+
+
+def iter_text(contentType: str, data: bytes) -> Iterator[str]:
+    """Extract text unit by unit (PDF pages, Word paragraph groups, plain-text slices).
+    Args:
+        contentType (str): The MIME type of the file (e.g., "application/pdf").
+        data (bytes): The raw bytes of the file.
+    Returns an iterator over the text units; joined with newlines they give `extract_text`.
+    Raises ValueError right away (not on the first `next`) for an unsupported content type,
+    so the pipelined ingestion can reject the file before starting.
+    """
     print(f"Extracting text for contentType: {contentType}")
     # If the content type is PDF
     if contentType == "application/pdf":
-        # Write bytes to a temporary file
-        path = Path("/tmp/_tmp.pdf");  # Declare a temp path
-        
-        # Ensure the parent directory exists
-        path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Open the file safely in binary write mode
-        with open(path, "wb") as f:
-            f.write(data)
-
-        # Open the PDF with PyMuPDF
-        document = fitz.open(str(path))
-        try:
-            # get_text() extracts text from each page
-            # get_text() only selects text, ignores images, tables, etc. (Something to take note of for future)
-            # get_text() return string of all text in one page (Loop through all pages so it return all the strings)
-            # .join() combines all page strings into one big string with newlines in between
-            return "\n".join(page.get_text() for page in document) # Return a huge string of all text in the PDF
-        finally:
-            # Ensure the document is closed after extraction
-            document.close()
+        return _iter_pdf_pages(data)
     # If the content type is Word document
     elif contentType in {
         "application/msword",
         "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     }:
-        # Write bytes to a temporary file
-        path = Path("/tmp/_tmp.docx"); # Declare a temp path
-        path.write_bytes(data)
-
-        # Open the Word document with python-docx
-        document = docx.Document(str(path))
-        # Extract and join all paragraph texts
-        return "\n".join(par.text for par in document.paragraphs)
+        return _iter_docx_paragraphs(data)
     # If the content type is plain text
     elif contentType.startswith("text/") or contentType == "text/plain":
-        return data.decode("utf-8", errors="ignore")
+        return _iter_plain_text(data.decode("utf-8", errors="ignore"))
     else:
-        raise ValueError("Unsupported contentType")
\ No newline at end of file
+        raise ValueError("Unsupported contentType")
+
+
+def _iter_pdf_pages(data: bytes) -> Iterator[str]:
+    # Open the PDF with PyMuPDF straight from memory (a shared temp file would be overwritten
+    # by concurrent uploads while this document is still being read page by page)
+    import fitz  # PyMuPDF
+    document = fitz.open(stream=data, filetype="pdf")
+    try:
+        # get_text() extracts text from each page
+        # get_text() only selects text, ignores images, tables, etc. (Something to take note of for future)
+        for page in document:
+            yield page.get_text()
+    finally:
+        # Ensure the document is closed after extraction
+        document.close()
+
+
+def _iter_docx_paragraphs(data: bytes, paragraphs_per_unit: int = 50) -> Iterator[str]:
+    # Open the Word document with python-docx (also from memory)
+    import docx
+    document = docx.Document(io.BytesIO(data))
+    paragraphs = [par.text for par in document.paragraphs]
+    for start in range(0, len(paragraphs), paragraphs_per_unit):
+        yield "\n".join(paragraphs[start:start + paragraphs_per_unit])
+
+
+def _iter_plain_text(text: str, unit_chars: int = 64 * 1024) -> Iterator[str]:
+    # Slices end at a newline, which is dropped: joining the slices with newlines restores the text
+    start = 0
+    while True:
+        end = text.find("\n", start + unit_chars) if len(text) - start > unit_chars else -1
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
@@ -2,11 +2,16 @@ import aiohttp
 import asyncio
 import os
 
+from app.core.metrics import beam_call
+from app.core.tracing import trace_headers, trace_payload
+
 # ============================================================
 # Beam Answer Generator Configuration
 # ============================================================
 BEAM_ANSWER_URL = os.getenv("BEAM_ANSWER_GENERATOR_LLM_URL")  # e.g. https://api.beam.cloud/v1/qwen-1_5b-answer-generator
 BEAM_ANSWER_KEY = os.getenv("BEAM_ANSWER_GENERATOR_LLM_KEY")  # Your Beam API Key
+# Maximum number of questions packed into one batched request to the Beam endpoint
+ANSWER_BATCH_SIZE = int(os.getenv("BEAM_ANSWER_BATCH_SIZE", "8"))
 
 
 HEADERS = {
@@ -18,15 +23,18 @@ HEADERS = {
 # ============================================================
 # Call Beam Answer Generator (Async)
 # ============================================================
-async def generate_answer(rag_contents: list[str], user_query: str) -> str:
+async def generate_answer(rag_contents: list[str], user_query: str, clarify_query: bool = False) -> str:
     """
     Calls the Beam Answer Generator Endpoint with:
     - rag_context (string)
     - user_query (string)
+    - clarify_query (bool, only sent when True)
 
     Args:
         rag_contents: list of text chunks returned by similarity search
         user_query: the user question
+        clarify_query: the query was not refined before retrieval, so the model should
+            interpret it first (see query_pipeline.py)
 
     Returns:
         The final structured answer from Beam LLM.
@@ -43,22 +51,86 @@ async def generate_answer(rag_contents: list[str], user_query: str) -> str:
         "user_query": user_query,
         # "max_new_tokens": 350 (optional, it is defaulted 400 at Beam endpoint)
     }
+    if clarify_query:
+        payload["clarify_query"] = True
 
     # Debug: Print payload
     print("🚀 Sending payload to Beam Answer Generator:")
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.post(BEAM_ANSWER_URL, json=payload, headers=HEADERS, timeout=60) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    raise RuntimeError(f"Beam Answer API Error ({resp.status}): {error_text}")
+    with beam_call("answer") as call:
+        async with aiohttp.ClientSession() as session:
+            try:
+                async with session.post(BEAM_ANSWER_URL, json={**payload, **trace_payload()}, headers={**HEADERS, **trace_headers()}, timeout=60) as resp:
+                    call["status"] = resp.status
+                    if resp.status != 200:
+                        error_text = await resp.text()
+                        raise RuntimeError(f"Beam Answer API Error ({resp.status}): {error_text}")
 
-                data = await resp.json()
-                return data.get("answer", "No answer returned by Beam")
+                    data = await resp.json()
+                    call["timings"] = data.get("timings")
+                    return data.get("answer", "No answer returned by Beam")
+        
+            except asyncio.TimeoutError:
+                raise RuntimeError("Beam Answer Generator timed out.")
         
+            except Exception as e:
+                raise RuntimeError(f"Beam Answer Generator failed: {str(e)}")
+
+
+# ============================================================
+# Call Beam Answer Generator with a batch of questions (Async)
+# ============================================================
+async def generate_answers(rag_contents_list: list[list[str]], user_queries: list[str], clarify_query: bool = False) -> list[str]:
+    """
+    Answers several questions through the Beam Answer Generator's batch mode.
+
+    The questions are packed into requests of at most ANSWER_BATCH_SIZE items
+    (`{"batch": [{"rag_context", "user_query"}, ...]}`) which are sent concurrently
+    over one session, so the endpoint can generate each group in a single padded pass.
+
+    Args:
+        rag_contents_list: for each question, the list of text chunks returned by similarity search
+        user_queries: the user questions, aligned with rag_contents_list
+        clarify_query: ask the model to interpret every (unrefined) query first
+
+    Returns:
+        The answers, in the same order as `user_queries`.
+    """
+
+    if not BEAM_ANSWER_URL or not BEAM_ANSWER_KEY:
+        raise RuntimeError("Beam Answer Generator config missing. Set BEAM_ANSWER_URL and BEAM_ANSWER_KEY.")
+
+    items = [
+        {"rag_context": "\n\n".join(rag_contents), "user_query": user_query}
+        for rag_contents, user_query in zip(rag_contents_list, user_queries)
+    ]
+    if clarify_query:
+        for item in items:
+            item["clarify_query"] = True
+    groups = [items[start:start + ANSWER_BATCH_SIZE] for start in range(0, len(items), ANSWER_BATCH_SIZE)]
+
+    print(f"🚀 Sending {len(items)} questions to Beam Answer Generator in {len(groups)} batch(es):")
+    async with aiohttp.ClientSession() as session:
+
+        async def post_group(group: list[dict]) -> list[str]:
+            with beam_call("answer", len(group)) as call:
+                async with session.post(BEAM_ANSWER_URL, json={"batch": group, **trace_payload()}, headers={**HEADERS, **trace_headers()}, timeout=120) as resp:
+                    call["status"] = resp.status
+                    if resp.status != 200:
+                        error_text = await resp.text()
+                        raise RuntimeError(f"Beam Answer API Error ({resp.status}): {error_text}")
+
+                    data = await resp.json()
+                    call["timings"] = data.get("timings")
+                    answers = data.get("answers", [])
+                    if len(answers) != len(group):
+                        raise RuntimeError(f"Beam returned {len(answers)} answers for a batch of {len(group)}")
+                    return answers
+
+        try:
+            grouped_answers = await asyncio.gather(*(post_group(group) for group in groups))
         except asyncio.TimeoutError:
             raise RuntimeError("Beam Answer Generator timed out.")
-        
         except Exception as e:
             raise RuntimeError(f"Beam Answer Generator failed: {str(e)}")
 
+    return [answer for answers in grouped_answers for answer in answers]
@@ -0,0 +1,77 @@
+import os
+import re
+
+from app.service.rag.retrieval.query_refiner import refine_query, refine_queries
+
+# ============================================================
+# Query Pipeline Modes
+# ============================================================
+# "refine"  – the Query Refiner LLM rewrites the query before retrieval (two LLM round-trips)
+# "raw"     – the raw query is embedded; the answer LLM clarifies it (one LLM round-trip)
+# "rewrite" – a cheap local rewrite is embedded; the answer LLM clarifies it (one LLM round-trip)
+REFINE = "refine"
+RAW = "raw"
+REWRITE = "rewrite"
+PIPELINE_MODES = (REFINE, RAW, REWRITE)
+
+DEFAULT_PIPELINE_MODE = os.getenv("QUERY_PIPELINE_MODE", REFINE).lower()
+# Checked once at import, so a misconfigured server fails at startup instead of answering
+# every query without a `mode` with a 400
+if DEFAULT_PIPELINE_MODE not in PIPELINE_MODES:
+    raise ValueError(f"Unknown QUERY_PIPELINE_MODE '{DEFAULT_PIPELINE_MODE}'. Choose one of {PIPELINE_MODES}.")
+
+
+# Conversational wrappers that carry no search intent
+_FILLER_PATTERNS = [
+    re.compile(r"^(hi|hello|hey)\b[\s,!.]*", re.IGNORECASE),
+    re.compile(r"^(can|could|would|will) you\s+(please\s+)?(tell me|explain|show me|help me understand|let me know)\s*", re.IGNORECASE),
+    re.compile(r"^(i (want|would like|need|wanted) to (know|understand)|do you know|tell me|explain)\s*", re.IGNORECASE),
+    re.compile(r"\b(please|kindly)\b[\s,]*", re.IGNORECASE),
+    re.compile(r"[\s,]*\b(thanks|thank you)\b.*$", re.IGNORECASE),
+]
+
+
+def rewrite_query_locally(query: str) -> str:
+    """
+    Cheap, deterministic stand-in for the Query Refiner LLM.
+
+    Strips greetings, politeness and "can you tell me"-style wrappers and normalizes
+    whitespace, so the embedded text is closer to the content of the question. Falls back
+    to the original query if nothing is left.
+    """
+    rewritten = " ".join(query.split())
+    previous = None
+    while rewritten != previous:
+        previous = rewritten
+        for pattern in _FILLER_PATTERNS:
+            rewritten = pattern.sub("", rewritten).strip()
+    rewritten = rewritten.strip(" ,.!?")
+    return rewritten or query.strip()
+
+
+def validate_pipeline_mode(mode: str | None) -> str:
+    mode = mode or DEFAULT_PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown query pipeline mode '{mode}'. Choose one of {PIPELINE_MODES}.")
+    return mode
+
+
+async def prepare_retrieval_query(query: str, mode: str) -> tuple[str, bool]:
+    """
+    Returns the text to embed for retrieval and whether the answer LLM should clarify
+    the query itself (`clarify_query`), which is the case whenever the refiner is skipped.
+    """
+    if mode == REFINE:
+        return await refine_query(query), False
+    if mode == REWRITE:
+        return rewrite_query_locally(query), True
+    return query, True
+
+
+async def prepare_retrieval_queries(queries: list[str], mode: str) -> tuple[list[str], bool]:
+    """Batch version of `prepare_retrieval_query` (one refiner request in "refine" mode)."""
+    if mode == REFINE:
+        return await refine_queries(queries), False
+    if mode == REWRITE:
+        return [rewrite_query_locally(query) for query in queries], True
+    return list(queries), True
@@ -1,6 +1,9 @@
 import os
 import aiohttp
 
+from app.core.metrics import beam_call
+from app.core.tracing import trace_headers, trace_payload
+
 LLM_URL = os.getenv("BEAM_REFINE_LLM_URL")
 LLM_KEY = os.getenv("BEAM_REFINE_LLM_KEY")
 
@@ -18,13 +21,54 @@ async def refine_query(query: str) -> str:
         "user_query": query
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(LLM_URL, json=payload, headers=HEADERS) as resp:
-            if resp.status != 200:
-                text = await resp.text()
-                raise ValueError(f"LLM request failed ({resp.status}): {text}")
+    with beam_call("refine") as call:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(LLM_URL, json={**payload, **trace_payload()}, headers={**HEADERS, **trace_headers()}) as resp:
+                call["status"] = resp.status
+                if resp.status != 200:
+                    text = await resp.text()
+                    raise ValueError(f"LLM request failed ({resp.status}): {text}")
+
+                data = await resp.json()
+                call["timings"] = data.get("timings")
+                if "tokens_generated" in data:
+                    print(f"🔢 Query Refiner generated {data['tokens_generated']} tokens")
+
+                # Beam returns {"original_query": "...", "refined_query": "...", "tokens_generated": n}
+                return data.get("refined_query", "").strip()
+
+async def refine_queries(queries: list[str]) -> list[str]:
+    """
+    Sends a batch of user queries to the Beam Query Refiner in a single request.
+
+    Args:
+        queries: the raw user questions
+
+    Returns:
+        The refined queries, in the same order as `queries`.
+    """
+
+    payload = {
+        "user_queries": queries
+    }
+
+    with beam_call("refine", len(queries)) as call:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(LLM_URL, json={**payload, **trace_payload()}, headers={**HEADERS, **trace_headers()}) as resp:
+                call["status"] = resp.status
+                if resp.status != 200:
+                    text = await resp.text()
+                    raise ValueError(f"LLM request failed ({resp.status}): {text}")
 
-            data = await resp.json()
+                data = await resp.json()
+                call["timings"] = data.get("timings")
+                if "tokens_generated" in data:
+                    print(f"🔢 Query Refiner generated {sum(data['tokens_generated'])} tokens for {len(queries)} queries")
 
-            # Beam returns {"original_query": "...", "refined_query": "..."}
-            return data.get("refined_query", "").strip()
\ No newline at end of file
+                # Beam returns {"original_queries": [...], "refined_queries": [...], "tokens_generated": [...]}
+                refined_queries = data.get("refined_queries", [])
+                if len(refined_queries) != len(queries):
+                    raise ValueError(
+                        f"LLM returned {len(refined_queries)} refined queries for {len(queries)} inputs"
+                    )
+                return [refined.strip() for refined in refined_queries]
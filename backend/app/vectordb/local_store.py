@@ -0,0 +1,392 @@
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import BaseStore
+from langchain_core.vectorstores import VectorStore
+
+from app.vectordb.quantized_index import QuantizedVectorIndex, INT8, BINARY, SCAN_BLOCK_ROWS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no single-process guard
+    fcntl = None
+
+# Search modes of LocalVectorStore: exact float32 scan, or the two-phase quantized index
+EXACT = "exact"
+LOCAL_INDEX_MODES = (EXACT, INT8, BINARY)
+
+# Lock files held by this process, so reopening a collection in the same process (restarts in tests) is allowed
+_held_locks: Dict[str, Any] = {}
+_held_locks_guard = threading.Lock()
+
+
+def _claim(lock_path: Path) -> None:
+    """
+    Takes an exclusive lock on `lock_path` for the life of the process.
+
+    The local stores keep the collection in memory and append to its files, so a second process
+    (e.g. another gunicorn worker) would serve stale results and interleave writes.
+
+    Raises:
+        RuntimeError: Another process holds the lock.
+    """
+    if fcntl is None:
+        return
+    key = str(lock_path.resolve())
+    with _held_locks_guard:
+        if key in _held_locks:
+            return
+        lock_file = open(lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Local collection '{lock_path.parent}' is already open in another process. "
+                "VECTOR_BACKEND=local supports a single worker: run gunicorn with WEB_CONCURRENCY=1, or use AstraDB."
+            ) from None
+        _held_locks[key] = lock_file
+
+
+# ============================================================
+# Child chunks: in-process vector store
+# ============================================================
+class LocalVectorStore(VectorStore):
+    """
+    In-process replacement for AstraDBVectorStore, persisted to a directory.
+
+    Vectors are kept in a float32 matrix and searched by brute-force dot product (cosine
+    similarity for the unit vectors produced by BeamGemmaEmbeddings), or through a
+    QuantizedVectorIndex scan plus exact rescoring when `index_mode` is "int8"/"binary".
+    In the quantized modes only the codes are in memory: the float32 matrix is a memory map
+    of `vectors.f32` that the index rescores against, and writes update the index in place.
+    Writes are append-only files (`vectors.f32` + `documents.jsonl`), reloaded on start-up,
+    so a restarted worker serves the same collection. The directory is locked to one
+    process (see `_claim`).
+
+    Args:
+        embedding (Embeddings): The embeddings client (BeamGemmaEmbeddings).
+        directory (str | Path): Where the collection is persisted.
+        dimension (int): Vector size (EMBEDDING_DIM).
+        index_mode (str): "exact", "int8" or "binary".
+    """
+
+    def __init__(self, embedding: Embeddings, directory, dimension: int, index_mode: str = EXACT):
+        if index_mode not in LOCAL_INDEX_MODES:
+            raise ValueError(f"Unsupported local index mode '{index_mode}'. Expected one of {', '.join(LOCAL_INDEX_MODES)}.")
+        self.embedding = embedding
+        self.directory = Path(directory)
+        self.dimension = dimension
+        self.index_mode = index_mode
+
+        self._lock = threading.RLock()
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+        self._count = 0
+        self._ids: List[str] = []
+        self._documents: List[Document] = []
+        self._positions: Dict[str, int] = {}
+        self._live: Optional[np.ndarray] = None
+        self._index: Optional[QuantizedVectorIndex] = None
+        if index_mode != EXACT:
+            self._index = QuantizedVectorIndex(dimension, mode=index_mode, float_source=lambda: self._vectors)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    # --- PERSISTENCE ---
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _documents_path(self) -> Path:
+        return self.directory / "documents.jsonl"
+
+    def _load(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _claim(self.directory / "collection.lock")
+        settings_path = self.directory / "collection.json"
+        if settings_path.exists():
+            stored_dimension = json.loads(settings_path.read_text())["dimension"]
+            if stored_dimension != self.dimension:
+                raise ValueError(
+                    f"Local collection '{self.directory}' uses {stored_dimension}-dim vectors "
+                    f"but EMBEDDING_DIM is {self.dimension}."
+                )
+        else:
+            settings_path.write_text(json.dumps({"dimension": self.dimension}))
+
+        if not self._documents_path.exists():
+            return
+        lines = [line for line in self._documents_path.read_text(encoding="utf-8").splitlines() if line]
+        row_bytes = 4 * self.dimension
+        vector_bytes = self._vectors_path.stat().st_size if self._vectors_path.exists() else 0
+        # A crash between the two appends leaves an unmatched tail; cut both files back to the
+        # complete rows, or later appends would be misaligned
+        count = min(len(lines), vector_bytes // row_bytes)
+        if count != len(lines) or vector_bytes != count * row_bytes:
+            if vector_bytes:
+                os.truncate(self._vectors_path, count * row_bytes)
+            self._documents_path.write_text("".join(line + "\n" for line in lines[:count]), encoding="utf-8")
+            print(f"⚠️ Dropped an incomplete write from local collection '{self.directory}'.")
+        if not count:
+            return
+
+        vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dimension))
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            records = [json.loads(line) for line in lines[start:start + SCAN_BLOCK_ROWS]]
+            self._append_rows(
+                [record["id"] for record in records],
+                [Document(page_content=record["text"], metadata=record["metadata"]) for record in records],
+                vectors[start:start + len(records)],
+            )
+        print(f"✅ Loaded {len(self)} vectors from local collection '{self.directory}'.")
+
+    def _persist(self, ids: List[str], documents: List[Document], vectors: np.ndarray) -> None:
+        with open(self._vectors_path, "ab") as vector_file:
+            vector_file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self._documents_path, "a", encoding="utf-8") as document_file:
+            for row_id, document in zip(ids, documents):
+                document_file.write(json.dumps({"id": row_id, "text": document.page_content, "metadata": document.metadata}, default=str) + "\n")
+
+    def _mapped_vectors(self, count: int) -> np.ndarray:
+        """The first `count` rows of vectors.f32, memory-mapped (quantized modes)."""
+        if not count:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, self.dimension))
+
+    # --- WRITES ---
+
+    def _append_rows(self, ids: List[str], documents: List[Document], vectors: np.ndarray) -> None:
+        """
+        Appends rows in memory once they are in the files (caller holds the lock or is the
+        constructor). Re-added ids replace the old row.
+        """
+        needed = self._count + len(ids)
+        if self._index is not None:
+            # The rows are already in vectors.f32: remap it, then quantize only the new rows
+            self._vectors = self._mapped_vectors(needed)
+            self._index.add([str(row) for row in range(self._count, needed)], vectors)
+        else:
+            if needed > self._vectors.shape[0]:
+                grown = np.empty((max(needed, 2 * self._vectors.shape[0], 1024), self.dimension), dtype=np.float32)
+                grown[:self._count] = self._vectors[:self._count]
+                self._vectors = grown
+            self._vectors[self._count:needed] = vectors
+        for offset, (row_id, document) in enumerate(zip(ids, documents)):
+            self._positions[row_id] = self._count + offset
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        self._count = needed
+        self._live = None
+
+    def add_vectors(self, vectors, documents: List[Document], ids: Optional[List[str]] = None) -> List[str]:
+        """Stores pre-computed embeddings with their documents; returns the row ids."""
+        if not documents:
+            return []
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape != (len(documents), self.dimension):
+            raise ValueError(f"Expected {len(documents)} vectors of {self.dimension} dims, got shape {matrix.shape}")
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in documents]
+        with self._lock:
+            self._persist(ids, documents, matrix)
+            self._append_rows(ids, documents, matrix)
+        return ids
+
+    def _documents_for(self, texts: Sequence[str], metadatas: Optional[List[dict]]) -> List[Document]:
+        metadatas = metadatas or [{} for _ in texts]
+        return [Document(page_content=text, metadata=dict(metadata)) for text, metadata in zip(texts, metadatas)]
+
+    @staticmethod
+    def _check_embeddings(vectors: List[List[float]], count: int) -> None:
+        # BeamGemmaEmbeddings returns empty vectors when the endpoint call fails
+        if len(vectors) != count or any(not vector for vector in vectors):
+            raise RuntimeError("Embedding service returned no vector for some texts.")
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        self._check_embeddings(vectors, len(texts))
+        return self.add_vectors(vectors, self._documents_for(texts, metadatas), ids)
+
+    async def aadd_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, *, ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        vectors = await self.embedding.aembed_documents(texts)
+        self._check_embeddings(vectors, len(texts))
+        return self.add_vectors(vectors, self._documents_for(texts, metadatas), ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Removes rows by id and rewrites the collection files (deletes are rare: rollbacks, re-ingestion)."""
+        if not ids:
+            return False
+        with self._lock:
+            removed = set(ids) & self._positions.keys()
+            if not removed:
+                return False
+            keep = np.asarray(sorted(position for row_id, position in self._positions.items() if row_id not in removed), dtype=np.int64)
+            kept_ids = [self._ids[position] for position in keep]
+            kept_documents = [self._documents[position] for position in keep]
+
+            # Rewritten block by block; an open memory map keeps reading the unlinked file
+            self._vectors_path.unlink(missing_ok=True)
+            self._documents_path.unlink(missing_ok=True)
+            for start in range(0, len(keep), SCAN_BLOCK_ROWS):
+                rows = keep[start:start + SCAN_BLOCK_ROWS]
+                self._persist(kept_ids[start:start + len(rows)], kept_documents[start:start + len(rows)], self._vectors[rows])
+
+            if self._index is not None:
+                self._index.keep_rows(keep, [str(row) for row in range(len(keep))])
+                self._vectors = self._mapped_vectors(len(keep))
+            else:
+                self._vectors = self._vectors[keep]
+            self._ids, self._documents, self._count = kept_ids, kept_documents, len(keep)
+            self._positions = {row_id: row for row, row_id in enumerate(kept_ids)}
+            self._live = None
+        return True
+
+    async def adelete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        return self.delete(ids, **kwargs)
+
+    # --- SEARCH ---
+
+    def _live_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """A consistent snapshot: the matrix and the live row of each id (replaced rows are skipped)."""
+        with self._lock:
+            if self._live is None:
+                self._live = np.fromiter(sorted(self._positions.values()), dtype=np.int64, count=len(self._positions))
+            return self._vectors[:self._count], self._live
+
+    def _quantized_search(self, query: np.ndarray, k: int) -> List[Tuple[Document, float]]:
+        """Searches the quantized index; rows replaced by a re-add are over-fetched, then skipped."""
+        with self._lock:
+            replaced = self._count - len(self._positions)
+            results = []
+            for row_id, score in self._index.search(query, k + replaced):
+                row = int(row_id)
+                if self._positions.get(self._ids[row]) == row:
+                    results.append((self._documents[row], score))
+            return results[:k]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """The `k` closest documents with their cosine similarity, best first. `filter` matches metadata by equality."""
+        if not self._positions:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape != (self.dimension,):
+            raise ValueError(f"Expected a {self.dimension}-dim query vector, got shape {query.shape}")
+
+        if self._index is not None and not filter:
+            return self._quantized_search(query, k)
+
+        vectors, rows = self._live_rows()
+        if filter:
+            rows = np.asarray([
+                row for row in rows
+                if all(self._documents[row].metadata.get(key) == value for key, value in filter.items())
+            ], dtype=np.int64)
+            if not len(rows):
+                return []
+        scores = vectors[rows] @ query
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k] if len(rows) > k else np.arange(len(rows))
+        top = top[np.argsort(-scores[top])]
+        return [(self._documents[int(rows[i])], float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(embedding, k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        embedding = await self.embedding.aembed_query(query)
+        if not embedding:
+            raise RuntimeError("Embedding service returned no vector for the query.")
+        return self.similarity_search_by_vector(embedding, k, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, *, directory=None, dimension: Optional[int] = None, **kwargs: Any) -> "LocalVectorStore":
+        if directory is None or dimension is None:
+            raise ValueError("LocalVectorStore.from_texts needs `directory` and `dimension`.")
+        store = cls(embedding, directory, dimension, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
+
+
+# ============================================================
+# Parent documents: in-process key-value store
+# ============================================================
+class LocalDocumentStore(BaseStore[str, Any]):
+    """
+    In-process replacement for AstraDBStore: JSON values by key, persisted as an append-only
+    JSON-lines log (the last write of a key wins; deletes are tombstones).
+
+    Args:
+        path (str | Path): The log file.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        _claim(self.path.with_name(self.path.name + ".lock"))
+        self._lock = threading.Lock()
+        self._values: Dict[str, Any] = {}
+        if self.path.exists():
+            for line in self.path.read_text(encoding="utf-8").splitlines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if record.get("deleted"):
+                    self._values.pop(record["key"], None)
+                else:
+                    self._values[record["key"]] = record["value"]
+            print(f"✅ Loaded {len(self._values)} documents from local store '{self.path}'.")
+
+    def _append(self, records: List[dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as log_file:
+            for record in records:
+                log_file.write(json.dumps(record, default=str) + "\n")
+
+    def mget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        return [self._values.get(key) for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, Any]]) -> None:
+        with self._lock:
+            self._append([{"key": key, "value": value} for key, value in key_value_pairs])
+            self._values.update(key_value_pairs)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            self._append([{"key": key, "deleted": True} for key in keys])
+            for key in keys:
+                self._values.pop(key, None)
+
+    def yield_keys(self, *, prefix: Optional[str] = None) -> Iterator[str]:
+        for key in list(self._values):
+            if prefix is None or key.startswith(prefix):
+                yield key
+
+    # The values are already in memory, so the async API needs no executor hop
+    async def amget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        return self.mget(keys)
+
+    async def amset(self, key_value_pairs: Sequence[Tuple[str, Any]]) -> None:
+        self.mset(key_value_pairs)
+
+    async def amdelete(self, keys: Sequence[str]) -> None:
+        self.mdelete(keys)
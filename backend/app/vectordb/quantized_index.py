@@ -0,0 +1,292 @@
+import json
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Quantization modes for the in-memory codes
+INT8 = "int8"      # 1 byte per dimension (4x smaller than float32)
+BINARY = "binary"  # 1 bit per dimension (32x smaller than float32)
+
+# Rows scanned per block, so the temporary float scores never need the whole matrix at once
+SCAN_BLOCK_ROWS = 65536
+
+# Number of set bits for every byte value, used for Hamming distances
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+class QuantizedVectorIndex:
+    """
+    Local child-embedding index with quantized codes in memory and float32 vectors on disk.
+
+    Search runs in two phases:
+        1. A scan over the compact codes of every vector (int8 dot products, or Hamming
+           distance on sign bits) picks the `rescore_candidates` best candidates.
+        2. Only those candidates are read back as float32 and rescored exactly.
+
+    The float32 vectors live in a memory-mapped file when `float_store_path` is given, so
+    resident memory is dominated by the codes (1 byte or 1 bit per dimension). An owner that
+    already stores the float vectors (LocalVectorStore) passes `float_source` instead: the
+    index then keeps only the codes and rescores against the owner's rows.
+
+    Args:
+        dimension (int): Vector size (must match the embeddings, see EMBEDDING_DIM).
+        mode (str): "int8" or "binary".
+        rescore_candidates (int): How many phase-1 candidates are rescored with float vectors.
+        float_store_path (str | Path, optional): File for the float32 vectors. Kept in memory if omitted.
+        float_source (Callable[[], np.ndarray], optional): Returns the float32 vectors, row i being the
+            i-th vector added; `add` then stores no float copy.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        mode: str = INT8,
+        rescore_candidates: int = 200,
+        float_store_path: Optional[str] = None,
+        float_source: Optional[Callable[[], np.ndarray]] = None,
+    ):
+        if mode not in (INT8, BINARY):
+            raise ValueError(f"Unsupported quantization mode '{mode}'; use '{INT8}' or '{BINARY}'.")
+        self.dimension = dimension
+        self.mode = mode
+        self.rescore_candidates = rescore_candidates
+        self.float_store_path = Path(float_store_path) if float_store_path else None
+        self.float_source = float_source
+
+        self.ids: List[str] = []
+        # int8 mode: per-dimension scale, the running absolute maximum it is recalibrated from,
+        # and the row count at the last calibration
+        self.scale: Optional[np.ndarray] = None
+        self._absmax: Optional[np.ndarray] = None
+        self._calibrated_rows = 0
+        # Codes of all vectors in the first len(ids) rows of a buffer grown by doubling, so adds are amortized O(batch)
+        self._code_buffer = np.empty((0, self._code_width), dtype=self._code_dtype)
+        self._float_blocks: List[np.ndarray] = []
+        self._floats: Optional[np.ndarray] = None
+
+        if self.float_store_path:
+            self.float_store_path.parent.mkdir(parents=True, exist_ok=True)
+            self.float_store_path.write_bytes(b"")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def _code_width(self) -> int:
+        return self.dimension if self.mode == INT8 else (self.dimension + 7) // 8
+
+    @property
+    def _code_dtype(self):
+        return np.int8 if self.mode == INT8 else np.uint8
+
+    # --- BUILDING ---
+
+    def add(self, ids: List[str], vectors) -> None:
+        """Quantizes and appends vectors (expected unit length, as produced by the embedder)."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dimension or matrix.shape[0] != len(ids):
+            raise ValueError(f"Expected {len(ids)} vectors of {self.dimension} dims, got shape {matrix.shape}")
+        if not len(ids):
+            return
+
+        # Quantizing may requantize the stored vectors, so it runs before the new rows are added
+        codes = self._quantize(matrix)
+        count, needed = len(self.ids), len(self.ids) + len(ids)
+        if needed > self._code_buffer.shape[0]:
+            grown = np.empty((max(needed, 2 * self._code_buffer.shape[0], 1024), self._code_width), dtype=self._code_dtype)
+            grown[:count] = self._code_buffer[:count]
+            self._code_buffer = grown
+        self._code_buffer[count:needed] = codes
+
+        if self.float_source is not None:
+            pass  # the owner stores the float vectors
+        elif self.float_store_path:
+            with open(self.float_store_path, "ab") as float_file:
+                float_file.write(np.ascontiguousarray(matrix).tobytes())
+            self._floats = None
+        else:
+            self._float_blocks.append(matrix)
+            self._floats = None
+
+        self.ids.extend(ids)
+
+    @classmethod
+    async def from_documents(
+        cls,
+        ids: List[str],
+        texts: List[str],
+        embeddings: Embeddings,
+        dimension: int,
+        mode: str = INT8,
+        batch_size: int = 64,
+        **kwargs,
+    ) -> "QuantizedVectorIndex":
+        """Builds an index by embedding `texts` (e.g. polished child chunks) with BeamGemmaEmbeddings."""
+        index = cls(dimension=dimension, mode=mode, **kwargs)
+        for start in range(0, len(texts), batch_size):
+            vectors = await embeddings.aembed_documents(texts[start:start + batch_size])
+            if any(not vector for vector in vectors):
+                raise RuntimeError("Embedding service returned an empty vector while building the index.")
+            index.add(ids[start:start + batch_size], vectors)
+        return index
+
+    def _quantize(self, matrix: np.ndarray) -> np.ndarray:
+        if self.mode == BINARY:
+            return np.packbits(matrix > 0, axis=1)
+
+        # Symmetric per-dimension scale. Values outside it are clipped (rescoring is exact) until
+        # the index has doubled since the last calibration, so all rows are requantized O(log N) times
+        batch_absmax = np.abs(matrix).max(axis=0)
+        self._absmax = batch_absmax if self._absmax is None else np.maximum(self._absmax, batch_absmax)
+        outgrown = self.scale is not None and np.any(batch_absmax > self.scale * 127.0 * (1 + 1e-6))
+        if self.scale is None or (outgrown and len(self.ids) + matrix.shape[0] >= 2 * self._calibrated_rows):
+            self._calibrate(len(self.ids) + matrix.shape[0])
+        return np.clip(np.rint(matrix / self.scale), -127, 127).astype(np.int8)
+
+    def _calibrate(self, rows: int) -> None:
+        """
+        Sets the int8 scale from the running maximum (so it covers every vector, `rows` once the
+        current batch is added) and requantizes the stored vectors from their float32 copies.
+        """
+        self.scale = (np.where(self._absmax == 0, 1.0, self._absmax) / 127.0).astype(np.float32)
+        self._calibrated_rows = rows
+        floats = self.floats
+        for start in range(0, len(self.ids), SCAN_BLOCK_ROWS):
+            block = floats[start:start + SCAN_BLOCK_ROWS]
+            self._code_buffer[start:start + block.shape[0]] = np.clip(np.rint(block / self.scale), -127, 127)
+
+    def keep_rows(self, rows, ids: List[str]) -> None:
+        """
+        Keeps only the given rows, in that order, under new `ids` (the owner compacted its
+        vectors the same way). Codes are copied, not requantized.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) != len(ids):
+            raise ValueError(f"Expected one id per kept row, got {len(ids)} ids for {len(rows)} rows")
+        self._code_buffer = self.codes[rows].copy()
+        self.ids = list(ids)
+        self._calibrated_rows = min(self._calibrated_rows, len(ids))
+        self._floats = None
+        if self.float_source is None and not self.float_store_path:
+            self._float_blocks = [self.floats[rows].copy()] if len(rows) else []
+            self._floats = None
+
+    # --- STORAGE ACCESS ---
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._code_buffer[:len(self.ids)]
+
+    @property
+    def floats(self) -> np.ndarray:
+        if self.float_source is not None:
+            return self.float_source()[:len(self.ids)]
+        if self._floats is None:
+            if self.float_store_path:
+                if not len(self.ids):
+                    return np.empty((0, self.dimension), dtype=np.float32)
+                self._floats = np.memmap(self.float_store_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dimension))
+            else:
+                self._floats = np.concatenate(self._float_blocks) if self._float_blocks else np.empty((0, self.dimension), dtype=np.float32)
+                self._float_blocks = [self._floats]
+        return self._floats
+
+    # --- SEARCH ---
+
+    def search(self, query, k: int = 10, rescore_candidates: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Returns the `k` best (id, score) pairs for one query vector, best first.
+
+        Scores are exact float32 dot products (cosine similarity for unit vectors).
+        """
+        if not self.ids:
+            return []
+        query_vector = np.asarray(query, dtype=np.float32)
+        depth = min(max(rescore_candidates or self.rescore_candidates, k), len(self.ids))
+
+        candidates = self._scan(query_vector, depth)
+
+        # Phase 2: exact rescoring of the candidates only (sorted reads are friendlier to the memmap)
+        candidates.sort()
+        exact_scores = self.floats[candidates] @ query_vector
+        order = np.argsort(-exact_scores)[:k]
+        return [(self.ids[candidates[i]], float(exact_scores[i])) for i in order]
+
+    def _scan(self, query_vector: np.ndarray, depth: int) -> np.ndarray:
+        """Phase 1: approximate scores over all codes, block by block; returns the best `depth` rows."""
+        codes = self.codes
+        if self.mode == INT8:
+            scaled_query = query_vector * self.scale
+        else:
+            query_bits = np.packbits(query_vector > 0)
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, codes.shape[0], SCAN_BLOCK_ROWS):
+            block = codes[start:start + SCAN_BLOCK_ROWS]
+            if self.mode == INT8:
+                block_scores = block.astype(np.float32) @ scaled_query
+            else:
+                # Fewer differing sign bits = more similar, so negate the Hamming distance
+                block_scores = -_POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1).astype(np.float32)
+
+            rows = np.arange(start, start + block.shape[0])
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, block_scores])
+            if best_rows.shape[0] > depth:
+                keep = np.argpartition(-best_scores, depth - 1)[:depth]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        return best_rows
+
+    # --- REPORTING & PERSISTENCE ---
+
+    def memory_usage(self) -> Dict[str, float]:
+        """Bytes held in memory by the codes versus what float32 storage would need."""
+        code_bytes = int(self.codes.nbytes)
+        float32_bytes = len(self.ids) * self.dimension * 4
+        return {
+            "vectors": len(self.ids),
+            "mode": self.mode,
+            "code_bytes": code_bytes,
+            "float32_bytes": float32_bytes,
+            "float_bytes_in_memory": 0 if self.float_store_path or self.float_source is not None else float32_bytes,
+            "compression_ratio": round(float32_bytes / code_bytes, 2) if code_bytes else 0.0,
+        }
+
+    def save(self, directory: str) -> None:
+        """Writes the codes, ids and settings next to the float store so the index can be reopened."""
+        target = Path(directory)
+        target.mkdir(parents=True, exist_ok=True)
+        np.save(target / "codes.npy", self.codes)
+        if self.scale is not None:
+            np.save(target / "scale.npy", self.scale)
+        if not self.float_store_path:
+            np.save(target / "vectors.npy", self.floats)
+        (target / "index.json").write_text(json.dumps({
+            "dimension": self.dimension,
+            "mode": self.mode,
+            "rescore_candidates": self.rescore_candidates,
+            "float_store_path": str(self.float_store_path) if self.float_store_path else None,
+            "ids": self.ids,
+        }))
+
+    @classmethod
+    def load(cls, directory: str) -> "QuantizedVectorIndex":
+        source = Path(directory)
+        settings = json.loads((source / "index.json").read_text())
+        index = cls.__new__(cls)
+        index.dimension = settings["dimension"]
+        index.mode = settings["mode"]
+        index.rescore_candidates = settings["rescore_candidates"]
+        index.float_store_path = Path(settings["float_store_path"]) if settings["float_store_path"] else None
+        index.float_source = None
+        index.ids = settings["ids"]
+        index.scale = np.load(source / "scale.npy") if (source / "scale.npy").exists() else None
+        index._absmax = None if index.scale is None else index.scale * 127.0
+        index._calibrated_rows = len(index.ids)
+        index._code_buffer = np.load(source / "codes.npy")
+        index._floats = None
+        index._float_blocks = [] if index.float_store_path else [np.load(source / "vectors.npy")]
+        return index
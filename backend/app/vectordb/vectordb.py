@@ -1,100 +1,179 @@
-from typing import List, Dict, Any, Tuple
-from langchain_core.documents import Document
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Dict, Any, Tuple
+from uuid import uuid4
 
-# Import the initialization function which runs once at module load
-from .vectordb_init import init_vector_db
+from app.core.resources import resources
+from app.service.rag.ingestion.chunker import ChildChunk, ParentChunk
+from app.core.metrics import BATCH_SIZE, record_cache
+from app.core.timing import stage
 
-# Initialize stores once on module load
-# These variables hold the ready-to-use, globally accessible LangChain AstraDB objects.
-RAG_STORES = init_vector_db()
-VECTOR_STORE = RAG_STORES['vector_store'] # LangChain AstraDBVectorStore for Child Chunks
-PARENT_STORE = RAG_STORES['parent_store'] # LangChain AstraDBStore for Parent Documents
+# The LangChain stores are created on first use (or at startup by the FastAPI lifespan),
+# once per worker, and shared through app/core/resources.py. VECTOR_BACKEND picks them:
+#   - "vector_store": AstraDBVectorStore (or LocalVectorStore) for Child Chunks
+#   - "parent_store": AstraDBStore (or LocalDocumentStore) for Parent Documents
+
+# Ingestion writes: documents per insert (AstraDB's insertMany accepts at most 100) and
+# batches in flight per store
+ASTRA_INSERT_MANY_LIMIT = 100
+UPSERT_BATCH_SIZE = min(int(os.getenv("UPSERT_BATCH_SIZE", str(ASTRA_INSERT_MANY_LIMIT))), ASTRA_INSERT_MANY_LIMIT)
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
 
 
 # --- INGESTION/UPSERTION OPERATIONS ---
 
-async def upsert_documents(parent_chunks: List[Dict[str, Any]], child_chunks: List[Dict[str, Any]]) -> None:
+async def upsert_documents(parent_chunks: List[ParentChunk], child_chunks: List[ChildChunk]) -> List[str]:
     """
     Inserts Parent (Context) documents and Child (Vector) chunks into the respective AstraDB stores.
 
-    This function orchestrates the persistence phase of the Parent-Child RAG pipeline. It converts 
-    the input dictionaries (which originated from Pydantic models) into LangChain Document objects, 
-    ensuring that the Parent-Child relationship (`parent_id`) is maintained. Crucially, calling 
-    `VECTOR_STORE.add_documents()` triggers the automatic, asynchronous embedding of the Child 
+    This function orchestrates the persistence phase of the Parent-Child RAG pipeline. It is the
+    one place where the chunker's records are converted to what the stores expect: parents to
+    the JSON form of a LangChain Document, children to text + metadata for the vector store,
+    keeping the Parent-Child relationship (`parent_id`). Crucially, calling
+    `vector_store.aadd_texts()` triggers the automatic, asynchronous embedding of the Child
     Chunks using the configured Beam Embeddings service.
 
+    Parents and children are written concurrently, each in batches of at most UPSERT_BATCH_SIZE
+    documents (AstraDB's insertMany limit) with at most UPSERT_CONCURRENCY batches in flight, so
+    child embedding overlaps with the parent writes. If a batch fails, neither side starts another
+    one, but batches already in flight are allowed to finish (a cancelled insert may still be
+    applied by AstraDB after the rollback). Once every write has finished, everything written for
+    this document is deleted again (children first, so no child is left pointing at a missing
+    parent) and the first error is re-raised.
+
     Args:
-        parent_chunks (List[Dict[str, Any]]): List of large parent document dictionaries. Must 
-                                              contain the AstraDB primary key '_id' (from the 
-                                              Pydantic alias) and 'content'.
-        child_chunks (List[Dict[str, Any]]): List of polished child chunk dictionaries. Must 
-                                             contain the text ('text') and the foreign key 
-                                             ('parent_id') linking back to the parent.
+        parent_chunks (List[ParentChunk]): The large parent chunks; `id` is the AstraDB primary key.
+        child_chunks (List[ChildChunk]): The polished child chunks; `parent_id` links each one
+                                         back to its parent.
 
     Returns:
-        None: The function handles persistence internally and does not return data.
+        List[str]: The ids of the stored child chunks (for `delete_documents`).
 
     Example:
-        >>> # Assume parent_list and child_list are valid List[Dict] objects
+        >>> # Assume parent_list and child_list come from split_parent_child_chunks
         >>> upsert_documents(parent_list, child_list)
         ✅ Stored X Parent Documents in Document Store.
         ✅ Stored Y Child Documents in Vector Store.
 
     Notes:
-        - The `parent_doc_map` uses the tuple (UUID, Document) format required by LangChain's 
-          `PARENT_STORE.mset()` method.
-        - The `VECTOR_STORE` handles all network I/O for embedding the child documents.
+        - The `parent_doc_map` uses the tuple (UUID, Document JSON) format required by LangChain's 
+          `parent_store.amset()` method.
+        - The vector store handles all network I/O for embedding the child documents.
+        - Children get explicit ids so a failed ingestion can delete exactly what it wrote.
     """
-    
+    vector_store, parent_store = await resources.aget("vector_store"), await resources.aget("parent_store")
+
     # 1. Prepare Parent Documents (for key-value storage)
-    parent_doc_map: List[Tuple[str, Document]] = []
-    for parent_dict in parent_chunks:
-
-        # Extract metadata keys, excluding 'content' and the primary key '_id'
-        parent_metadata = {
-            metadata_key: metadata_value 
-            for metadata_key, metadata_value in parent_dict.items() 
-            if metadata_key not in ["content", "_id"]
-        }
-        
-        parent_doc = Document(
-            page_content=parent_dict["content"],
-            metadata=parent_metadata
-        )
-        # Convert to JSON-serializable dict for AstraDBStore
-        json_serializable_doc = parent_doc.dict()
-        # Store as a tuple (key, Document object)
-        parent_doc_map.append((parent_dict["_id"], json_serializable_doc))
-        
-    # 2. Prepare Child Documents (for vector storage)
-    child_docs: List[Document] = []
-    for child_chunk_dict in child_chunks:
-        # Construct the Document object from the polished child dictionary
-        child_doc = Document(
-            page_content=child_chunk_dict["text"],
-            metadata={
-                "parent_id": child_chunk_dict["parent_id"],
-                "document_name": child_chunk_dict["file_name"], 
-                "chunk_number": child_chunk_dict["index"], 
-            }
-        )
-        child_docs.append(child_doc)
+    parent_doc_map: List[Tuple[str, Dict[str, Any]]] = [(parent.id, parent_document(parent)) for parent in parent_chunks]
+
+    # 2. Prepare Child Documents (for vector storage): (id, text, metadata) rows
+    child_rows = [(uuid4().hex, child.text, child_metadata(child)) for child in child_chunks]
+    child_ids = [child_id for child_id, _, _ in child_rows]
+
+    # Failed writes of either side, in the order they failed; the first one stops new batches
+    errors: List[BaseException] = []
 
     # 3. Store Parent Documents (Document Store)
+    async def store_parents():
+        with stage("parent_upsert"):
+            await _run_bounded(parent_store.amset, _batches(parent_doc_map, UPSERT_BATCH_SIZE), errors)
+        if not errors:
+            print(f"✅ Stored {len(parent_doc_map)} Parent Documents in Document Store.")
+
+    # 4. Store Child Documents (Vector Store - automatically embeds)
+    async def store_children():
+        BATCH_SIZE.labels("child_upsert").observe(len(child_rows))
+        with stage("child_upsert"):
+            await _run_bounded(
+                lambda batch: vector_store.aadd_texts(
+                    [text for _, text, _ in batch], [metadata for _, _, metadata in batch], ids=[child_id for child_id, _, _ in batch],
+                ),
+                _batches(child_rows, UPSERT_BATCH_SIZE),
+                errors,
+            )
+        if not errors:
+            print(f"✅ Stored {len(child_rows)} Child Documents in Vector Store.")
+
+    writes = asyncio.gather(store_parents(), store_children())
     try:
-        await PARENT_STORE.amset(parent_doc_map)
-        print(f"✅ Stored {len(parent_doc_map)} Parent Documents in Document Store.")
-    except Exception as error:
-        print(f"❌ Failed to store Parent Documents: {error}")
+        # Shielded, so a cancellation (e.g. another ingestion stage failed) does not cancel inserts in flight
+        await asyncio.shield(writes)
+        if errors:
+            raise errors[0]
+    except BaseException as error:
+        errors.append(error)
+        if not writes.done():
+            await asyncio.wait([writes])
+        print(f"❌ Failed to store Parent/Child Documents, rolling back: {error}")
+        await delete_documents([key for key, _ in parent_doc_map], child_ids)
         raise
+    return child_ids
 
-    # 4. Store Child Documents (Vector Store - automatically embeds)
+
+def parent_document(parent: ParentChunk) -> Dict[str, Any]:
+    """
+    A parent chunk as stored in the Document Store: the JSON form of a LangChain Document.
+    start_index / end_index locate it in the extracted document text (for source highlighting).
+    """
+    metadata = {"document_name": parent.document_name, "start_index": parent.start, "end_index": parent.end}
+    return {"id": None, "metadata": metadata, "page_content": parent.content, "type": "Document"}
+
+
+def child_metadata(child: ChildChunk) -> Dict[str, Any]:
+    """The metadata stored with a child chunk's vector (parent_id is how search finds the parent)."""
+    return {
+        "parent_id": child.parent_id,
+        "document_name": child.file_name,
+        "chunk_number": child.index,
+        "start_index": child.start,
+        "end_index": child.end,
+    }
+
+
+def _batches(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+async def _run_bounded(write: Callable[[List[Any]], Awaitable[Any]], batches: List[List[Any]], errors: List[BaseException]) -> None:
+    """
+    Calls `write` on every batch with at most UPSERT_CONCURRENCY calls in flight, until `errors`
+    (shared with the other writers) is non-empty. Failures are appended to `errors`, not raised,
+    so the calls already in flight always finish.
+    """
+    semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+
+    async def run(batch):
+        async with semaphore:
+            if errors:
+                return
+            try:
+                await write(batch)
+            except Exception as error:
+                errors.append(error)
+
+    await asyncio.gather(*(run(batch) for batch in batches))
+
+
+async def delete_documents(parent_keys: List[str], child_ids: List[str]) -> None:
+    """
+    Compensation for a failed ingestion: deletes its children, then its parents.
+    Deleting ids that were never written is a no-op in both stores; cleanup errors are logged
+    (with the ids left behind) so they do not hide the original failure.
+    """
+    vector_store, parent_store = await resources.aget("vector_store"), await resources.aget("parent_store")
     try:
-        await VECTOR_STORE.aadd_documents(child_docs)
-        print(f"✅ Stored {len(child_docs)} Child Documents in Vector Store.")
+        for batch in _batches(child_ids, UPSERT_BATCH_SIZE):
+            await vector_store.adelete(batch)
     except Exception as error:
-        print(f"❌ Failed to store Child Documents: {error}")
-        raise
+        print(f"❌ Rollback could not delete child chunks {child_ids}: {error}")
+        return  # keep the parents: children that are left behind still resolve to them
+    try:
+        for batch in _batches(parent_keys, UPSERT_BATCH_SIZE):
+            await parent_store.amdelete(batch)
+    except Exception as error:
+        print(f"❌ Rollback could not delete parent documents {parent_keys}: {error}")
+        return
+    print(f"↩️ Rolled back {len(child_ids)} child chunks and {len(parent_keys)} parent documents.")
 
 # --- QUERY/RETRIEVAL OPERATIONS ---
 
@@ -113,11 +192,17 @@ async def search_and_retrieve_context(query: str, top_k: int = 10) -> List[str]:
         List[str]: A list of unique string contents from the relevant parent documents.
     """
     print(f"🔍 Searching Vector Store (Child Chunks) for '{query}' (top_k={top_k})...")
+    vector_store, parent_store = await resources.aget("vector_store"), await resources.aget("parent_store")
     
-    # 1. Search the Vector Store (Child Chunks)
-    # The LangChain VectorStore handles embedding the query using the configured BeamGemmaEmbeddings.
+    # 1. Embed the query, then search the Vector Store (Child Chunks)
+    # (two steps instead of asimilarity_search so each is timed separately)
     try:
-        child_documents = await VECTOR_STORE.asimilarity_search(query, k=top_k)
+        with stage("embed"):
+            query_embedding = await vector_store.embeddings.aembed_query(query)
+        if not query_embedding:
+            raise RuntimeError("embedding service returned no vector for the query")
+        with stage("search"):
+            child_documents = await vector_store.asimilarity_search_by_vector(query_embedding, k=top_k)
         print(f"✅ Found {len(child_documents)} relevant child chunks.")
     except Exception as e:
         print(f"❌ Vector Store search failed: {e}")
@@ -136,7 +221,8 @@ async def search_and_retrieve_context(query: str, top_k: int = 10) -> List[str]:
     try:
         # amget requires a list of keys (parent_ids) and returns a list of Document objects 
         # (which are stored as dictionaries in AstraDBStore)
-        parent_documents_dict = await PARENT_STORE.amget(parent_ids)
+        with stage("parent_fetch"):
+            parent_documents_dict = await parent_store.amget(parent_ids)
         
         # The result of amget is a list of Document objects that were serialized to JSON dicts.
         # We need to extract the actual content ('page_content').
@@ -150,4 +236,82 @@ async def search_and_retrieve_context(query: str, top_k: int = 10) -> List[str]:
 
     except Exception as error:
         print(f"❌ Parent Document retrieval failed: {error}")
-        raise RuntimeError(f"Parent Document retrieval failed: {error}")
\ No newline at end of file
+        raise RuntimeError(f"Parent Document retrieval failed: {error}")
+
+
+async def search_and_retrieve_contexts(queries: List[str], top_k: int = 10) -> List[List[str]]:
+    """
+    Batched version of `search_and_retrieve_context` for many queries at once.
+
+    All queries are embedded with a single embedding request, the vector searches run
+    concurrently, and the parent documents referenced by any query are fetched once
+    with a single de-duplicated `amget`.
+
+    Args:
+        queries (List[str]): The search queries (expected to be the refined queries).
+        top_k (int): The number of top relevant child chunks to search for, per query.
+
+    Returns:
+        List[List[str]]: For each query (same order), the unique parent contents to use as RAG context.
+    """
+    print(f"🔍 Batch searching Vector Store (Child Chunks) for {len(queries)} queries (top_k={top_k})...")
+    vector_store, parent_store = await resources.aget("vector_store"), await resources.aget("parent_store")
+
+    # 1. Embed every query in one round-trip to the embedding service
+    try:
+        with stage("embed"):
+            query_embeddings = await vector_store.embeddings.aembed_documents(queries)
+    except Exception as e:
+        print(f"❌ Batch query embedding failed: {e}")
+        raise RuntimeError(f"Vector search failed: {e}")
+
+    if len(query_embeddings) != len(queries) or any(not embedding for embedding in query_embeddings):
+        raise RuntimeError("Vector search failed: embedding service returned no vector for some queries")
+
+    # 2. Search the Vector Store (Child Chunks) concurrently, one search per query
+    try:
+        with stage("search"):
+            child_documents_per_query = await asyncio.gather(*(
+                vector_store.asimilarity_search_by_vector(embedding, k=top_k)
+                for embedding in query_embeddings
+            ))
+        print(f"✅ Found {sum(len(docs) for docs in child_documents_per_query)} relevant child chunks across the batch.")
+    except Exception as e:
+        print(f"❌ Vector Store search failed: {e}")
+        raise RuntimeError(f"Vector search failed: {e}")
+
+    # 3. Extract the unique Parent IDs per query, and across the whole batch
+    parent_ids_per_query: List[List[str]] = []
+    for child_documents in child_documents_per_query:
+        parent_ids_per_query.append(list(dict.fromkeys(
+            doc.metadata["parent_id"] for doc in child_documents if "parent_id" in doc.metadata
+        )))
+    unique_parent_ids = list(dict.fromkeys(
+        parent_id for parent_ids in parent_ids_per_query for parent_id in parent_ids
+    ))
+    if not unique_parent_ids:
+        return [[] for _ in queries]
+    # Parents referenced by several queries are fetched once: count the repeats as cache hits
+    references = sum(len(ids) for ids in parent_ids_per_query)
+    record_cache("batch_parent_fetch", hits=references - len(unique_parent_ids), misses=len(unique_parent_ids))
+
+    print(f"🔗 Retrieving content for {len(unique_parent_ids)} unique parent documents "
+          f"({references} references in the batch).")
+
+    # 4. Retrieve each Parent Document once and hand the contents back per query
+    try:
+        with stage("parent_fetch"):
+            parent_documents_dict = await parent_store.amget(unique_parent_ids)
+    except Exception as error:
+        print(f"❌ Parent Document retrieval failed: {error}")
+        raise RuntimeError(f"Parent Document retrieval failed: {error}")
+
+    parent_contents_by_id = {
+        parent_id: doc["page_content"]
+        for parent_id, doc in zip(unique_parent_ids, parent_documents_dict)
+        if doc and "page_content" in doc
+    }
+    return [
+        [parent_contents_by_id[parent_id] for parent_id in parent_ids if parent_id in parent_contents_by_id]
+        for parent_ids in parent_ids_per_query
+    ]
@@ -1,50 +1,113 @@
 import os
-from typing import Dict, Any
-from langchain_astradb import AstraDBVectorStore, AstraDBStore
-from app.embedding.embedding_client import BeamGemmaEmbeddings
+from pathlib import Path
+from typing import Dict, Any, Optional
+from langchain_core.stores import BaseStore
+from langchain_core.vectorstores import VectorStore
+from app.embedding.embedding_client import BeamGemmaEmbeddings, EMBEDDING_DIM, FULL_EMBEDDING_DIM
 
-try:
-    BEAM_EMBEDDINGS_INSTANCE = BeamGemmaEmbeddings()
-except ValueError as error:
-    # to the init_vector_db check, which will raise a final error if needed.
-    print(f"Configuration Warning: {error}. Attempting database initialization.")
+# Storage backend for both stores:
+#   - "astradb": AstraDBVectorStore + AstraDBStore (needs ASTRA_DB_URL / ASTRA_DB_TOKEN)
+#   - "local": LocalVectorStore + LocalDocumentStore, in-process and persisted under LOCAL_VECTOR_DB_DIR
+ASTRADB_BACKEND = "astradb"
+LOCAL_BACKEND = "local"
+VECTOR_BACKENDS = (ASTRADB_BACKEND, LOCAL_BACKEND)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", ASTRADB_BACKEND).lower()
+LOCAL_VECTOR_DB_DIR = Path(os.getenv("LOCAL_VECTOR_DB_DIR", str(Path(__file__).resolve().parents[2] / "_local_vectordb")))
+# Local search: "exact" float32 scan, or "int8"/"binary" QuantizedVectorIndex scan + exact rescoring
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "exact").lower()
 
 # Load Astra credentials from .env files
 ASTRA_DB_URL = os.getenv("ASTRA_DB_URL")
 ASTRA_DB_TOKEN = os.getenv("ASTRA_DB_TOKEN")
 
 # Collection names
-VECTOR_COLLECTION_NAME = "rag_child_vectors" # Child Chunks that have embeddings
+# A collection's vector dimension is fixed at creation, so reduced-dimension embeddings get their own collection
+VECTOR_COLLECTION_NAME = (
+    "rag_child_vectors" if EMBEDDING_DIM == FULL_EMBEDDING_DIM
+    else f"rag_child_vectors_{EMBEDDING_DIM}"
+) # Child Chunks that have embeddings
 PARENT_COLLECTION_NAME = "rag_parent_documents" # Parent Documents 
 
 
-def init_vector_db():
+def _check_credentials():
     if not ASTRA_DB_URL or not ASTRA_DB_TOKEN:
         raise ValueError("ERROR:Missing Astra DB credentials in .env file")
-        
-    # Initialize a collections to hold the LangChain store objects
-    collections: Dict[str, Any] = {}
-    
+
+
+def _backend() -> str:
+    if VECTOR_BACKEND not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown VECTOR_BACKEND '{VECTOR_BACKEND}'. Expected one of {', '.join(VECTOR_BACKENDS)}.")
+    return VECTOR_BACKEND
+
+
+def init_vector_store(embeddings: Optional[BeamGemmaEmbeddings] = None) -> VectorStore:
+    """Opens the child chunk vector collection of the configured VECTOR_BACKEND."""
+    if _backend() == LOCAL_BACKEND:
+        from app.vectordb.local_store import LocalVectorStore
+
+        directory = LOCAL_VECTOR_DB_DIR / VECTOR_COLLECTION_NAME
+        vector_store = LocalVectorStore(embeddings or BeamGemmaEmbeddings(), directory, EMBEDDING_DIM, index_mode=LOCAL_INDEX_MODE)
+        print(f"✅ Local vector store ready at '{directory}' ({len(vector_store)} vectors, {LOCAL_INDEX_MODE} search).")
+        return vector_store
+    return _init_astra_vector_store(embeddings)
+
+
+def init_parent_store() -> BaseStore:
+    """Opens the parent document store of the configured VECTOR_BACKEND."""
+    if _backend() == LOCAL_BACKEND:
+        from app.vectordb.local_store import LocalDocumentStore
+
+        path = LOCAL_VECTOR_DB_DIR / f"{PARENT_COLLECTION_NAME}.jsonl"
+        parent_store = LocalDocumentStore(path)
+        print(f"✅ Local document store ready at '{path}'.")
+        return parent_store
+    return _init_astra_parent_store()
+
+
+def _init_astra_vector_store(embeddings: Optional[BeamGemmaEmbeddings] = None):
+    """Connects to (creating if needed) the child chunk vector collection."""
+    _check_credentials()
+    from langchain_astradb import AstraDBVectorStore
+
     # 💡 1. Initialize Vector Store (Child Chunks) using AstraDBVectorStore
     print(f"Initializing vector store collection '{VECTOR_COLLECTION_NAME}' with LangChain...")
-    
+
     try:
         # Instantiating the LangChain class ensures the collection exists with vector configuration.
         vector_store = AstraDBVectorStore(
-            embedding=BEAM_EMBEDDINGS_INSTANCE, # Mocked only for setup/connection
+            embedding=embeddings or BeamGemmaEmbeddings(),
             collection_name=VECTOR_COLLECTION_NAME,
             token=ASTRA_DB_TOKEN,
             api_endpoint=ASTRA_DB_URL,
         )
-        collections['vector_store'] = vector_store
-        print(f"✅ LangChain AstraDBVectorStore initialized for '{VECTOR_COLLECTION_NAME}'.")
+        # An existing collection keeps the dimension it was created with; read it back from the Data API
+        collection_dimension = _collection_dimension(vector_store)
+        if collection_dimension not in (None, EMBEDDING_DIM):
+            raise ValueError(
+                f"Collection '{VECTOR_COLLECTION_NAME}' uses {collection_dimension}-dim vectors "
+                f"but EMBEDDING_DIM is {EMBEDDING_DIM}."
+            )
+        print(f"✅ LangChain AstraDBVectorStore initialized for '{VECTOR_COLLECTION_NAME}' ({EMBEDDING_DIM} dims).")
+        return vector_store
     except Exception as e:
         print(f"❌ Failed to initialize AstraDBVectorStore: {e}")
         raise
 
+
+def _collection_dimension(vector_store) -> Optional[int]:
+    """The vector dimension stored in the AstraDB collection's options (None if it has no vector settings)."""
+    vector_options = vector_store.astra_env.collection.options().vector
+    return vector_options.dimension if vector_options else None
+
+
+def _init_astra_parent_store():
+    """Connects to (creating if needed) the parent document collection."""
+    _check_credentials()
+    from langchain_astradb import AstraDBStore
+
     # 💡 2. Initialize Document Store (Parent Documents) using AstraDBStore
     print(f"Initializing document store collection '{PARENT_COLLECTION_NAME}' with LangChain...")
-    
+
     try:
         # AstraDBStore is used for non-vector document persistence.
         parent_store = AstraDBStore(
@@ -52,11 +115,22 @@ def init_vector_db():
             token=ASTRA_DB_TOKEN,
             api_endpoint=ASTRA_DB_URL,
         )
-        collections['parent_store'] = parent_store
         print(f"✅ LangChain AstraDBStore initialized for '{PARENT_COLLECTION_NAME}'.")
+        return parent_store
     except Exception as e:
         print(f"❌ Failed to initialize AstraDBStore: {e}")
         raise
 
+
+def init_vector_db(embeddings: Optional[BeamGemmaEmbeddings] = None) -> Dict[str, Any]:
+    """
+    Initializes both stores (one after the other).
+
+    The API server does not call this: app/core/resources.py creates each store lazily and
+    warms them up in parallel at startup. Kept for scripts that want both stores at once.
+    """
     # Return the instantiated LangChain store objects.
-    return collections
\ No newline at end of file
+    return {
+        'vector_store': init_vector_store(embeddings),
+        'parent_store': init_parent_store(),
+    }
@@ -0,0 +1,377 @@
+"""
+Local stand-ins for the Beam model endpoints (embedding, query refiner, answer generator)
+
+One aiohttp server answers the same JSON contracts as the GPU endpoints, so the backend and
+its benchmarks run on a single machine with no Beam credentials:
+    POST /embed   {"input": [...], "dimensions": d}          -> {"embeddings": [[...]]}
+    POST /refine  {"user_query"} | {"user_queries": [...]}   -> {"refined_query", ...} | {"refined_queries": [...], ...}
+    POST /answer  {"rag_context", "user_query"} | {"batch"}  -> {"answer", ...} | {"answers": [...]}
+    (every response also carries "timings": {"queue_ms", "compute_ms"} like the model endpoints)
+    GET  /stats   request / error counts and latency percentiles per route; GET /health
+
+Behaviour:
+  - embeddings are deterministic: a signed hashed bag-of-words over 768 dimensions, truncated
+    to `dimensions` and renormalized like the real Matryoshka output, so texts sharing words
+    are close and retrieval quality can be measured;
+  - the refiner drops conversational filler and stopwords, the answerer returns the context
+    sentence sharing the most words with the question;
+  - every call sleeps for a sampled latency (fixed, uniform or log-normal) plus a per-item cost
+    for each text / batch entry, with optional latency spikes and injected HTTP errors.
+
+Usage (from backend/):
+    python benchmarks/beam_stubs.py --port 9100                      # stubs only, prints the env vars
+    python benchmarks/beam_stubs.py --backend --backend-port 8000    # stubs + uvicorn app.main:app (local vector backend)
+    python benchmarks/beam_stubs.py --answer-latency lognormal:900:0.3 --answer-per-item-ms 120 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import os
+import re
+import signal
+import sys
+import tempfile
+import time
+import urllib.request
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from aiohttp import web
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+FULL_EMBEDDING_DIM = 768
+STOPWORDS = {
+    "the", "of", "is", "are", "was", "what", "which", "who", "how", "a", "an", "for", "to", "me", "you",
+    "i", "do", "does", "on", "about", "in", "and", "or", "it", "be", "can", "there", "this", "that",
+}
+FILLER = {"hey", "hi", "could", "would", "please", "tell", "thanks", "thank", "so", "actually", "quick", "question", "know"}
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def fake_embedding(text: str, dimension: int = FULL_EMBEDDING_DIM) -> List[float]:
+    """Deterministic unit vector: signed hashed bag-of-words, Matryoshka-truncated to `dimension`."""
+    vector = np.zeros(FULL_EMBEDDING_DIM, dtype=np.float32)
+    for token in tokenize(text) or [text]:
+        digest = zlib.crc32(token.encode())
+        vector[digest % FULL_EMBEDDING_DIM] += 1.0 if (digest >> 16) & 1 else -1.0
+    vector = vector[:dimension]
+    norm = float(np.linalg.norm(vector))
+    return (vector / norm if norm else vector).tolist()
+
+
+def refine(query: str) -> str:
+    return " ".join(word for word in tokenize(query) if word not in STOPWORDS and word not in FILLER)
+
+
+def answer(rag_context: str, user_query: str) -> str:
+    query_words = set(tokenize(user_query)) - STOPWORDS - FILLER
+    sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", rag_context) if sentence.strip()]
+    best = max(sentences, key=lambda sentence: len(query_words & set(tokenize(sentence))), default="")
+    if not best or not query_words & set(tokenize(best)):
+        return "No answer found in the provided context."
+    return best
+
+
+# ============================================================
+# Latency and error model
+# ============================================================
+class LatencyModel:
+    """
+    Samples a call latency in seconds.
+
+    Spec strings: "fixed:MS", "uniform:LOW_MS:HIGH_MS" or "lognormal:MEDIAN_MS[:SIGMA]" (sigma
+    defaults to 0.25). `per_item_ms` is added for every text / batch entry after the first,
+    and with probability `spike_rate` the latency is multiplied by `spike_factor` (tail events).
+    """
+
+    def __init__(self, spec: str = "fixed:0", per_item_ms: float = 0.0, spike_rate: float = 0.0, spike_factor: float = 10.0):
+        kind, *values = spec.split(":")
+        if kind not in ("fixed", "uniform", "lognormal") or not values:
+            raise ValueError(f"Invalid latency spec '{spec}'. Use fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN[:SIGMA].")
+        self.spec = spec
+        self.kind = kind
+        self.values = [float(value) for value in values]
+        self.per_item_ms = per_item_ms
+        self.spike_rate = spike_rate
+        self.spike_factor = spike_factor
+
+    def sample(self, rng: np.random.Generator, items: int = 1) -> float:
+        if self.kind == "fixed":
+            base_ms = self.values[0]
+        elif self.kind == "uniform":
+            base_ms = rng.uniform(self.values[0], self.values[1])
+        else:
+            sigma = self.values[1] if len(self.values) > 1 else 0.25
+            base_ms = rng.lognormal(np.log(max(self.values[0], 1e-3)), sigma)
+        total_ms = base_ms + self.per_item_ms * max(items - 1, 0)
+        if self.spike_rate and rng.random() < self.spike_rate:
+            total_ms *= self.spike_factor
+        return total_ms / 1000
+
+
+class StubService:
+    """Latency, error injection and counters of one stubbed endpoint.
+
+    With `record=True` every served request body is kept in `recorded` (the benchmarks use the
+    answer endpoint's log to see which context the pipeline retrieved for each question).
+    """
+
+    def __init__(self, latency: LatencyModel, error_rate: float = 0.0, error_status: int = 500, record: bool = False):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.record = record
+        self.reset()
+
+    def reset(self) -> None:
+        self.requests = 0
+        self.items = 0
+        self.errors = 0
+        self.latencies_ms: List[float] = []
+        self.recorded: List[dict] = []
+
+    def stats(self) -> Dict[str, float]:
+        latencies = np.asarray(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "items": self.items,
+            "errors": self.errors,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 1),
+        }
+
+
+ROUTES = ("embed", "refine", "answer")
+SERVICES = web.AppKey("services", dict)
+RNG = web.AppKey("rng", np.random.Generator)
+API_KEY = web.AppKey("api_key", str)
+# Set by _simulate for the handler to report
+TIMINGS = web.RequestKey("timings", dict)
+
+
+async def _simulate(request: web.Request, route: str, items: int, body: dict) -> Optional[web.Response]:
+    """Sleeps for the sampled latency; returns an error response when one is injected."""
+    if request.app[API_KEY] and request.headers.get("Authorization") != f"Bearer {request.app[API_KEY]}":
+        return web.json_response({"detail": "Unauthorized"}, status=401)
+    service = request.app[SERVICES][route]
+    rng = request.app[RNG]
+    delay = service.latency.sample(rng, items)
+    failed = service.error_rate and rng.random() < service.error_rate
+
+    await asyncio.sleep(delay)
+    # Reported like the model endpoints do: the whole simulated latency counts as compute
+    request[TIMINGS] = {"queue_ms": 0.0, "compute_ms": round(delay * 1000, 1)}
+    service.requests += 1
+    service.items += items
+    service.latencies_ms.append(delay * 1000)
+    if failed:
+        service.errors += 1
+        return web.json_response({"detail": f"Injected {route} failure"}, status=service.error_status)
+    if service.record:
+        service.recorded.append(body)
+    return None
+
+
+async def _embed_handler(request):
+    body = await request.json()
+    texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+    error = await _simulate(request, "embed", len(texts), body)
+    if error:
+        return error
+    dimension = int(body.get("dimensions") or FULL_EMBEDDING_DIM)
+    return web.json_response({"embeddings": [fake_embedding(text, dimension) for text in texts], "timings": request[TIMINGS]})
+
+
+async def _refine_handler(request):
+    body = await request.json()
+    queries = body.get("user_queries")
+    error = await _simulate(request, "refine", len(queries) if queries is not None else 1, body)
+    if error:
+        return error
+    if queries is not None:
+        refined = [refine(query) for query in queries]
+        return web.json_response({
+            "original_queries": queries, "refined_queries": refined,
+            "tokens_generated": [len(text.split()) + 1 for text in refined], "timings": request[TIMINGS],
+        })
+    refined = refine(body.get("user_query", ""))
+    return web.json_response({
+        "original_query": body.get("user_query", ""), "refined_query": refined,
+        "tokens_generated": len(refined.split()) + 1, "timings": request[TIMINGS],
+    })
+
+
+async def _answer_handler(request):
+    body = await request.json()
+    batch = body.get("batch")
+    error = await _simulate(request, "answer", len(batch) if batch is not None else 1, body)
+    if error:
+        return error
+    if batch is not None:
+        return web.json_response({
+            "answers": [answer(item.get("rag_context", ""), item.get("user_query", "")) for item in batch], "timings": request[TIMINGS],
+        })
+    return web.json_response({
+        "user_query": body.get("user_query", ""), "answer": answer(body.get("rag_context", ""), body.get("user_query", "")),
+        "timings": request[TIMINGS],
+    })
+
+
+async def _stats_handler(request):
+    return web.json_response({route: service.stats() for route, service in request.app[SERVICES].items()})
+
+
+async def _reset_handler(request):
+    for service in request.app[SERVICES].values():
+        service.reset()
+    return web.json_response({"status": "reset"})
+
+
+async def _health_handler(request):
+    return web.json_response({"status": "ok", "routes": {route: service.latency.spec for route, service in request.app[SERVICES].items()}})
+
+
+def build_stub_app(services: Dict[str, StubService], seed: int = 0, api_key: str = "") -> web.Application:
+    """The aiohttp application serving every stubbed endpoint (see the module docstring)."""
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app[SERVICES] = services
+    app[RNG] = np.random.default_rng(seed)
+    app[API_KEY] = api_key
+    app.router.add_post("/embed", _embed_handler)
+    app.router.add_post("/refine", _refine_handler)
+    app.router.add_post("/answer", _answer_handler)
+    app.router.add_get("/stats", _stats_handler)
+    app.router.add_post("/stats/reset", _reset_handler)
+    app.router.add_get("/health", _health_handler)
+    return app
+
+
+async def start_stub_server(services: Dict[str, StubService], host: str = "127.0.0.1", port: int = 0, seed: int = 0, api_key: str = ""):
+    """Starts the stubs in the running event loop; returns (runner, base_url). Call `runner.cleanup()` to stop."""
+    runner = web.AppRunner(build_stub_app(services, seed, api_key), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+def stub_environment(base_url: str, api_key: str = "stub-key") -> Dict[str, str]:
+    """Backend environment variables pointing every Beam client at the stubs."""
+    return {
+        "BEAM_EMBEDDING_URL": f"{base_url}/embed",
+        "BEAM_EMBEDDINGS_KEY": api_key,
+        "BEAM_REFINE_LLM_URL": f"{base_url}/refine",
+        "BEAM_REFINE_LLM_KEY": api_key,
+        "BEAM_ANSWER_GENERATOR_LLM_URL": f"{base_url}/answer",
+        "BEAM_ANSWER_GENERATOR_LLM_KEY": api_key,
+    }
+
+
+# ============================================================
+# Launcher
+# ============================================================
+def services_from_args(args, record: bool = False) -> Dict[str, StubService]:
+    return {
+        route: StubService(
+            LatencyModel(getattr(args, f"{route}_latency"), getattr(args, f"{route}_per_item_ms"), args.spike_rate, args.spike_factor),
+            error_rate=getattr(args, f"{route}_error_rate") if getattr(args, f"{route}_error_rate") is not None else args.error_rate,
+            error_status=args.error_status,
+            record=record,
+        )
+        for route in ROUTES
+    }
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    """Latency / error flags shared by the launcher and the benchmark suite."""
+    defaults = {"embed": ("lognormal:40:0.25", 1.0), "refine": ("lognormal:350:0.25", 40.0), "answer": ("lognormal:900:0.25", 150.0)}
+    for route, (latency, per_item_ms) in defaults.items():
+        parser.add_argument(f"--{route}-latency", default=latency, help=f"{route} latency spec (default {latency})")
+        parser.add_argument(f"--{route}-per-item-ms", type=float, default=per_item_ms, help=f"Extra ms per additional {route} item")
+        parser.add_argument(f"--{route}-error-rate", type=float, help=f"{route} error probability (default --error-rate)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability that a call returns --error-status")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--spike-rate", type=float, default=0.0, help="Probability of a latency spike")
+    parser.add_argument("--spike-factor", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def _wait_for_http(url: str, timeout: float = 60.0) -> None:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout} s")
+
+
+async def spawn_backend(environment: Dict[str, str], host: str, port: int, workers: int = 1, data_dir: Optional[str] = None,
+                        extra_env: Optional[Dict[str, str]] = None, quiet: bool = False):
+    """Starts `uvicorn app.main:app` wired to the stubs on the local vector backend; returns (process, data_dir).
+
+    `quiet` discards the backend's per-request prints (stdout); warnings and errors still show.
+    """
+    data_dir = data_dir or tempfile.mkdtemp(prefix="rag_local_vectordb_")
+    backend_env = dict(os.environ, **environment, VECTOR_BACKEND="local", LOCAL_VECTOR_DB_DIR=data_dir, **(extra_env or {}))
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", host, "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", cwd=BACKEND_DIR, env=backend_env,
+        stdout=asyncio.subprocess.DEVNULL if quiet else None,
+    )
+    try:
+        await asyncio.to_thread(_wait_for_http, f"http://{host}:{port}/health")
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process, data_dir
+
+
+async def serve(args) -> None:
+    runner, base_url = await start_stub_server(services_from_args(args), args.host, args.port, args.seed, args.api_key)
+    environment = stub_environment(base_url, args.api_key or "stub-key")
+    print(f"✅ Beam stubs listening on {base_url} (routes: /embed, /refine, /answer, /stats)")
+    for name, value in environment.items():
+        print(f"export {name}={value}")
+
+    backend = None
+    if args.backend:
+        backend, data_dir = await spawn_backend(environment, args.host, args.backend_port, args.workers, args.data_dir)
+        print(f"✅ Backend on http://{args.host}:{args.backend_port} (VECTOR_BACKEND=local, data in {data_dir})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    print("Press Ctrl+C to stop.")
+    await stop.wait()
+
+    if backend is not None:
+        backend.terminate()
+        await backend.wait()
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--api-key", default="", help="Require this bearer token (default: accept any)")
+    parser.add_argument("--backend", action="store_true", help="Also start uvicorn app.main:app wired to the stubs")
+    parser.add_argument("--backend-port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="Backend worker processes")
+    parser.add_argument("--data-dir", help="LOCAL_VECTOR_DB_DIR for the backend (default: a new temp dir)")
+    add_stub_arguments(parser)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
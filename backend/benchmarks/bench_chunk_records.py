@@ -0,0 +1,192 @@
+"""
+Benchmark: chunk representation between the chunker and the stores
+
+Compares, on the chunks of one large synthetic document, the work done per chunk after
+splitting:
+    - pydantic: the previous path. ParentChunkModel / ChildChunkModel per chunk (and the
+      LangChain Document the child splitter built for each child), model_dump to dicts,
+      polish_chunks on the dicts, then a LangChain Document per parent (`.dict()` for the
+      Document Store) and per child (for the Vector Store);
+    - records: ParentChunk / ChildChunk slotted dataclasses, polish_text on the record, and one
+      conversion at the persistence boundary (vectordb.parent_document / child_metadata).
+The split itself (RecursiveSpanSplitter) is the same for both and is not timed.
+
+For each path it reports the best wall time over --runs, the allocation peak while converting
+and the memory still held by the result (both from tracemalloc, in a separate run). It also
+reports the memory held by the chunks of the split itself: spans over the document text, as
+the chunker returns them, versus the same chunks as separate substrings (parents plus the
+overlapping children, as the chunker held them before).
+
+Usage (from backend/):
+    python benchmarks/bench_chunk_records.py --mb 20 --runs 5
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from uuid import uuid4
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from langchain_core.documents import Document
+from pydantic import BaseModel, Field
+
+from app.service.rag.ingestion.chunk_polisher import polish_chunks, polish_text
+from app.service.rag.ingestion.chunker import ChildChunk, ParentChunk, split_parent_child_chunks
+from app.vectordb.vectordb import child_metadata, parent_document
+
+# The baseline uses the Pydantic v1-style API (class Config, Document.dict()) it used before
+warnings.simplefilter("ignore", DeprecationWarning)
+
+WORDS = "data model vector store chunk parent child query answer index search embedding page text".split()
+
+
+# The schema the chunker used to return, kept here as the baseline
+class ParentChunkModel(BaseModel):
+    db_id: str = Field(..., alias="_id")
+    content: str
+    document_name: str
+
+    class Config:
+        populate_by_name = True
+
+
+class ChildChunkModel(BaseModel):
+    index: int
+    text: str
+    parent_id: str
+    file_name: str
+
+
+def synthetic_text(megabytes: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    paragraphs, size = [], 0
+    while size < megabytes * 1_000_000:
+        sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "." for _ in range(rng.randint(2, 8))]
+        paragraphs.append(" ".join(sentences))
+        size += len(paragraphs[-1]) + 2
+    return "\n\n".join(paragraphs)
+
+
+def split_once(text: str, file_name: str):
+    """
+    (parent text, [child texts]) per parent, from the current chunker, and the memory held by
+    its chunks as spans and as substrings.
+    """
+    split_parent_child_chunks("warm-up", file_name)  # first-call allocations outside the measurement
+    gc.collect()
+    tracemalloc.start()
+    parents, children = split_parent_child_chunks(text, file_name)
+    spans, _ = tracemalloc.get_traced_memory()
+    parent_texts = [parent.content for parent in parents]
+    child_texts = [child.text for child in children]
+    substrings, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    memory = {"document_mb": round(len(text) / 1e6, 1), "spans_mb": round(spans / 1e6, 1), "substrings_mb": round(substrings / 1e6, 1)}
+
+    by_parent = {parent.id: [] for parent in parents}
+    for child, child_text in zip(children, child_texts):
+        by_parent[child.parent_id].append(child_text)
+    return [(parent_text, by_parent[parent.id]) for parent, parent_text in zip(parents, parent_texts)], memory
+
+
+def pydantic_path(split, file_name):
+    parent_models, child_models = [], []
+    index = 0
+    for parent_text, child_texts in split:
+        parent_id = str(uuid4())
+        parent_models.append(ParentChunkModel(db_id=parent_id, content=parent_text, document_name=file_name))
+        for child_text in child_texts:
+            child_doc = Document(page_content=child_text, metadata={"document_name": file_name})
+            child_models.append(ChildChunkModel(index=index, text=child_doc.page_content, parent_id=parent_id, file_name=file_name))
+            index += 1
+    parent_dicts = [parent.model_dump(by_alias=True) for parent in parent_models]
+    child_dicts = polish_chunks([child.model_dump(by_alias=False) for child in child_models])
+    parent_doc_map = [
+        (parent["_id"], Document(page_content=parent["content"], metadata={key: value for key, value in parent.items() if key not in ["content", "_id"]}).dict())
+        for parent in parent_dicts
+    ]
+    child_docs = [
+        Document(page_content=child["text"], metadata={"parent_id": child["parent_id"], "document_name": child["file_name"], "chunk_number": child["index"]})
+        for child in child_dicts
+    ]
+    return parent_doc_map, child_docs
+
+
+def records_path(split, file_name):
+    parents, children = [], []
+    index = 0
+    for parent_text, child_texts in split:
+        parent_id = str(uuid4())
+        parents.append(ParentChunk(parent_id, parent_text, file_name))
+        for child_text in child_texts:
+            children.append(ChildChunk(index, child_text, parent_id, file_name))
+            index += 1
+    for child in children:
+        child.polished = polish_text(child.text)
+    parent_doc_map = [(parent.id, parent_document(parent)) for parent in parents]
+    child_rows = [(uuid4().hex, child.text, child_metadata(child)) for child in children]
+    return parent_doc_map, child_rows
+
+
+def measure(path, split, file_name, runs):
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        started = time.perf_counter()
+        path(split, file_name)
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    result = path(split, file_name)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"best_ms": round(min(times) * 1000, 1), "peak_mb": round(peak / 1e6, 1), "retained_mb": round(retained / 1e6, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=20.0, help="Size of the synthetic document")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    file_name = "large.txt"
+    split, memory = split_once(synthetic_text(args.mb), file_name)
+    results = {
+        "parents": len(split),
+        "children": sum(len(children) for _, children in split),
+        "split_memory": memory,
+        "pydantic": measure(pydantic_path, split, file_name, args.runs),
+        "records": measure(records_path, split, file_name, args.runs),
+    }
+
+    print(f"{args.mb:g} MB document: {results['parents']} parents, {results['children']} children")
+    print(
+        f"Held by the chunks of the split: {memory['spans_mb']} MB as spans, "
+        f"{memory['substrings_mb']} MB as substrings ({memory['document_mb']} MB of text)"
+    )
+    print(" | ".join(f"{column:>12}" for column in ["path", "best_ms", "peak_mb", "retained_mb"]))
+    for name in ("pydantic", "records"):
+        print(" | ".join(f"{str(value):>12}" for value in [name, *results[name].values()]))
+    before, after = results["pydantic"], results["records"]
+    print(
+        f"records: {before['best_ms'] / after['best_ms']:.1f}x faster, "
+        f"{before['peak_mb'] / after['peak_mb']:.1f}x lower allocation peak"
+    )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
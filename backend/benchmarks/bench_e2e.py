@@ -0,0 +1,261 @@
+"""
+Benchmark: end-to-end RAG pipeline over HTTP (latency, throughput, recall)
+
+Starts the Beam stand-ins (benchmarks/beam_stubs.py) in-process and a real `uvicorn app.main:app`
+on the local vector backend, then:
+  1. ingest: POSTs synthetic multi-page PDFs to /ingest/webhook (--ingest-concurrency at a time)
+     and reports pages/sec plus per-document latency;
+  2. query:  POSTs labeled questions to /api/query with --concurrency requests in flight and
+     reports queries/sec and end-to-end p50/p95/p99;
+  3. stages: p50/p95/p99 of every stage the backend reports in its Server-Timing header
+     (ingest: extract, chunk, polish, parent_upsert, child_upsert;
+      query:  refine, embed, search, parent_fetch, generate);
+  4. quality: recall@k (the question's fact is in the context the answer generator received,
+     read from the answer stub's request log) and answer accuracy.
+
+The corpus is synthetic: each PDF page holds "The <attribute> of project <name> is <value>."
+facts mixed with filler sentences, and every question asks for one fact.
+
+Results are written as JSON (--output); --compare prints the change of each headline number
+against a previous results file, so regressions show up run to run.
+
+Usage (from backend/):
+    python benchmarks/bench_e2e.py --documents 20 --queries 200 --concurrency 16 --output e2e.json
+    python benchmarks/bench_e2e.py --answer-latency lognormal:900:0.3 --error-rate 0.01 --compare e2e.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import socket
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from beam_stubs import add_stub_arguments, services_from_args, spawn_backend, start_stub_server, stub_environment
+from bench_pipeline_modes import ATTRIBUTES, QUERY_TEMPLATES, VALUES
+from app.core.timing import parse_server_timing
+
+FILLER_SENTENCES = [
+    "Minutes of the weekly review were filed with the programme office.",
+    "The steering group will revisit the open risks next quarter.",
+    "Stakeholders asked for a shorter reporting cycle and clearer owners.",
+    "All figures in this section are provisional until the audit closes.",
+    "Dependencies on other teams are tracked in the shared planning board.",
+    "The retrospective highlighted onboarding and tooling as focus areas.",
+]
+QUERY_STAGES = ["refine", "embed", "search", "parent_fetch", "generate"]
+INGEST_STAGES = ["extract", "chunk", "polish", "parent_upsert", "child_upsert"]
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    array = np.asarray(values, dtype=np.float64)
+    return {name: round(float(np.percentile(array, q)), 1) for name, q in (("p50", 50), ("p95", 95), ("p99", 99))}
+
+
+def build_documents(documents: int, pages: int, facts_per_page: int, seed: int):
+    """Base64 /ingest/webhook payloads (one multi-page PDF each) and the labeled facts they contain."""
+    import fitz  # PyMuPDF
+
+    rng = np.random.default_rng(seed)
+    names = [f"p{number:04d}" for number in rng.choice(10_000, size=documents * pages * facts_per_page, replace=False)]
+    files, facts = [], []
+    for doc_index in range(documents):
+        pdf = fitz.open()
+        for page_index in range(pages):
+            sentences = []
+            for fact_index in range(facts_per_page):
+                name = names[(doc_index * pages + page_index) * facts_per_page + fact_index]
+                attribute = ATTRIBUTES[rng.integers(len(ATTRIBUTES))]
+                value = VALUES[rng.integers(len(VALUES))]
+                sentences.append(f"The {attribute} of project {name} is {value}.")
+                sentences.extend(rng.choice(FILLER_SENTENCES, size=2, replace=False))
+                facts.append({"name": name, "attribute": attribute, "value": value, "sentence": sentences[-3]})
+            page = pdf.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), " ".join(sentences), fontsize=9)
+        files.append({"fileName": f"bench_{doc_index:03d}.pdf", "contentType": "application/pdf", "data": base64.b64encode(pdf.tobytes()).decode()})
+        pdf.close()
+    return files, facts
+
+
+async def timed_post(session, url, payload):
+    started = time.perf_counter()
+    async with session.post(url, json=payload) as response:
+        body = await response.json(content_type=None)
+        return {
+            "status": response.status,
+            "body": body,
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "stages": parse_server_timing(response.headers.get("Server-Timing", "")),
+        }
+
+
+async def run_load(session, url, payloads, concurrency: int):
+    """POSTs every payload with at most `concurrency` in flight; returns (results, wall seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(payload):
+        async with semaphore:
+            try:
+                return await timed_post(session, url, payload)
+            except aiohttp.ClientError as error:
+                return {"status": 0, "body": str(error), "latency_ms": 0.0, "stages": {}}
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(payload) for payload in payloads))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, seconds: float, stages, unit_count: int):
+    ok = [result for result in results if result["status"] == 200]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": round(seconds, 3),
+        "per_sec": round(unit_count / seconds, 2) if seconds else None,
+        "latency_ms": percentiles([result["latency_ms"] for result in ok]),
+        "stages_ms": {name: percentiles([result["stages"][name] for result in ok if name in result["stages"]]) for name in stages},
+    }
+
+
+def quality(questions, answer_log, answers):
+    """recall@k from the contexts the answer stub received, accuracy from the returned answers."""
+    contexts = {}
+    for body in answer_log:
+        for item in body.get("batch", [body]):
+            contexts[item["user_query"]] = " ".join(item["rag_context"].split())
+    hits = [question["sentence"] in contexts.get(question["query"], "") for question in questions]
+    correct = [
+        answer is not None and question["name"] in answer and question["value"] in answer
+        for question, answer in zip(questions, answers)
+    ]
+    return {"recall@k": round(float(np.mean(hits)), 3), "answer_accuracy": round(float(np.mean(correct)), 3)}
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+COMPARED_SECTIONS = ("ingest", "query", "quality")
+SETTINGS = ("requests", "pages", "concurrency", "k")
+
+
+def print_comparison(results, baseline_path):
+    previous = json.loads(Path(baseline_path).read_text())
+    baseline, current = (
+        {metric: value for metric, value in flatten({key: run[key] for key in COMPARED_SECTIONS if key in run}).items()
+         if metric.rsplit(".", 1)[-1] not in SETTINGS}
+        for run in (previous, results)
+    )
+    print(f"\nCompared with {baseline_path}:")
+    print(" | ".join(f"{column:>36}" for column in ["metric", "baseline", "current", "change"]))
+    for metric, value in current.items():
+        if metric in baseline and baseline[metric]:
+            change = f"{(value - baseline[metric]) / baseline[metric] * 100:+.1f}%"
+            print(" | ".join(f"{str(cell):>36}" for cell in [metric, baseline[metric], value, change]))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main_async(args):
+    files, facts = build_documents(args.documents, args.pages, args.facts_per_page, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    picked = rng.choice(len(facts), size=min(args.queries, len(facts)), replace=False)
+    questions = [
+        dict(facts[index], query=QUERY_TEMPLATES[position % len(QUERY_TEMPLATES)].format(**facts[index]))
+        for position, index in enumerate(picked)
+    ]
+
+    services = services_from_args(args, record=True)
+    runner, base_url = await start_stub_server(services, seed=args.seed)
+    port = _free_port()
+    backend, data_dir = await spawn_backend(
+        stub_environment(base_url), "127.0.0.1", port, args.workers,
+        extra_env={"EMBEDDING_DIM": str(args.embedding_dim), "LOCAL_INDEX_MODE": args.index_mode}, quiet=True,
+    )
+    backend_url = f"http://127.0.0.1:{port}"
+    print(f"✅ Backend on {backend_url} (data in {data_dir}), stubs on {base_url}")
+
+    try:
+        connector = aiohttp.TCPConnector(limit=max(args.concurrency, args.ingest_concurrency))
+        async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+            ingested, ingest_seconds = await run_load(session, f"{backend_url}/ingest/webhook", files, args.ingest_concurrency)
+            pages = args.pages * sum(result["status"] == 200 for result in ingested)
+            print(f"✅ Ingested {pages} pages in {ingest_seconds:.2f} s")
+
+            for service in services.values():
+                service.reset()
+            payloads = [{"query": question["query"], "top_k": args.top_k, **({"mode": args.mode} if args.mode else {})} for question in questions]
+            answered, query_seconds = await run_load(session, f"{backend_url}/api/query", payloads, args.concurrency)
+    finally:
+        backend.terminate()
+        await backend.wait()
+        await runner.cleanup()
+
+    answers = [result["body"].get("answer") if result["status"] == 200 else None for result in answered]
+    return {
+        "config": vars(args),
+        "ingest": dict(summarize(ingested, ingest_seconds, INGEST_STAGES, pages), pages=pages),
+        "query": dict(summarize(answered, query_seconds, QUERY_STAGES, sum(answer is not None for answer in answers)), concurrency=args.concurrency),
+        "quality": dict(quality(questions, services["answer"].recorded, answers), k=args.top_k),
+        "stubs": {route: service.stats() for route, service in services.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10, help="PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=5, help="Pages per PDF")
+    parser.add_argument("--facts-per-page", type=int, default=6)
+    parser.add_argument("--ingest-concurrency", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="/api/query requests in flight")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--mode", help="Query pipeline mode (default: the backend's QUERY_PIPELINE_MODE)")
+    parser.add_argument("--workers", type=int, default=1, help="Backend worker processes")
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    parser.add_argument("--index-mode", default="exact", help="LOCAL_INDEX_MODE of the backend")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    print(" | ".join(f"{column:>14}" for column in ["phase", "requests", "errors", "per_sec", "p50_ms", "p95_ms", "p99_ms"]))
+    for phase, unit in (("ingest", "pages/s"), ("query", "queries/s")):
+        row = results[phase]
+        print(" | ".join(f"{str(cell):>14}" for cell in [phase, row["requests"], row["errors"], f"{row['per_sec']} {unit}", *row["latency_ms"].values()]))
+    print("\nStages (ms):")
+    for phase in ("ingest", "query"):
+        for name, values in results[phase]["stages_ms"].items():
+            print(" | ".join(f"{str(cell):>14}" for cell in [phase, name, *values.values()]))
+    print(f"\nrecall@{args.top_k}: {results['quality']['recall@k']}, answer accuracy: {results['quality']['answer_accuracy']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Saved results to {args.output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: retrieval recall@k versus Matryoshka embedding dimension
+
+Embeds the child chunks of a sample corpus once at full size (768) through the Beam
+embedding endpoint, then truncates + renormalizes them to 512/256/128 exactly like the
+endpoint does. For every query the exact top-k children found with full-size vectors are
+the reference; recall@k is the share of them still found with the reduced vectors.
+
+Queries are the questions below plus every child chunk used as its own query.
+
+Usage (from backend/, with BEAM_EMBEDDING_URL / BEAM_EMBEDDINGS_KEY set):
+    python benchmarks/bench_embedding_dimensions.py
+    python benchmarks/bench_embedding_dimensions.py --corpus _local_uploads/sample.pdf other.txt --k 1 5 10
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from dotenv import load_dotenv
+load_dotenv(BACKEND_DIR / ".env")
+
+from app.embedding.embedding_client import (
+    BeamGemmaEmbeddings, FULL_EMBEDDING_DIM, SUPPORTED_EMBEDDING_DIMS, truncate_and_normalize,
+)
+from app.service.rag.ingestion.text_extractor import extract_text
+from app.service.rag.ingestion.chunker import split_parent_child_chunks
+from app.service.rag.ingestion.chunk_polisher import polish_text
+
+DEFAULT_CORPUS = [BACKEND_DIR / "_local_uploads" / "sample.pdf"]
+QUESTIONS = [
+    "What is machine learning?",
+    "How does supervised learning use labeled data?",
+    "Which tasks are typical for unsupervised learning?",
+    "How does an agent learn in reinforcement learning?",
+    "Which industries has machine learning changed?",
+    "What has deep learning achieved in image and speech recognition?",
+]
+CONTENT_TYPES = {".pdf": "application/pdf", ".docx": "application/msword", ".txt": "text/plain", ".md": "text/plain"}
+
+
+def load_children(paths):
+    """Extract, chunk and polish every corpus file exactly like /ingest/webhook does."""
+    texts = []
+    for path in paths:
+        path = Path(path)
+        text = extract_text(CONTENT_TYPES.get(path.suffix.lower(), "text/plain"), path.read_bytes())
+        _, children = split_parent_child_chunks(text, file_name=path.name)
+        texts.extend(polish_text(child.text) for child in children)
+    return texts
+
+
+def top_k_indices(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k by dot product (vectors are unit length, so this is cosine)."""
+    scores = queries @ corpus.T
+    k = min(k, corpus.shape[0])
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray) -> float:
+    hits = sum(len(set(ref) & set(cand)) for ref, cand in zip(reference, candidate))
+    return hits / reference.size
+
+
+async def embed_full(embedder: BeamGemmaEmbeddings, texts, batch_size: int = 32):
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await embedder.aembed_documents(texts[start:start + batch_size]))
+    if any(not vector for vector in vectors):
+        raise RuntimeError("Embedding endpoint returned empty vectors; check BEAM_EMBEDDING_URL / key.")
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", nargs="+", default=DEFAULT_CORPUS, help="Files to ingest as the search corpus")
+    parser.add_argument("--k", nargs="+", type=int, default=[1, 5, 10])
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    children = load_children(args.corpus)
+    queries = QUESTIONS + children
+    print(f"Corpus: {len(children)} child chunks, {len(queries)} queries")
+
+    # Always request the full 768 dims; the truncation below is what the endpoint does for smaller sizes
+    embedder = BeamGemmaEmbeddings(output_dim=FULL_EMBEDDING_DIM)
+    corpus_full = asyncio.run(embed_full(embedder, children))
+    query_full = asyncio.run(embed_full(embedder, queries))
+
+    results = []
+    for dimension in SUPPORTED_EMBEDDING_DIMS:
+        corpus = np.asarray(truncate_and_normalize(corpus_full, dimension), dtype=np.float32)
+        query = np.asarray(truncate_and_normalize(query_full, dimension), dtype=np.float32)
+        row = {"dimension": dimension, "bytes_per_vector": dimension * 4}
+        for k in args.k:
+            reference = top_k_indices(np.asarray(corpus_full, dtype=np.float32), np.asarray(query_full, dtype=np.float32), k)
+            row[f"recall@{k}"] = round(recall_at_k(reference, top_k_indices(corpus, query, k)), 4)
+        results.append(row)
+
+    header = ["dimension", "bytes_per_vector"] + [f"recall@{k}" for k in args.k]
+    print(" | ".join(f"{column:>16}" for column in header))
+    for row in results:
+        print(" | ".join(f"{row[column]:>16}" for column in header))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"corpus": [str(p) for p in args.corpus], "results": results}, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
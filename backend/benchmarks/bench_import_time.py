@@ -0,0 +1,150 @@
+"""
+Benchmark: backend import and worker boot time
+
+Measures, each in fresh Python processes:
+    - import: `import app.main` (what every gunicorn/uvicorn worker pays before serving);
+    - boot: spawning `uvicorn app.main:app` until GET /health answers (import + lifespan);
+    - deferred: the ingestion-only imports (PyMuPDF, python-docx) now paid by the first
+      upload instead of by every worker start.
+With --importtime it also prints the slowest modules from `python -X importtime`, and it
+always lists which heavy modules `app.main` still loads eagerly.
+
+The boot measurement sets STARTUP_RESOURCES to an empty list so no AstraDB/Beam connection
+is attempted: it isolates the Python start-up cost from network handshakes.
+
+Usage (from backend/):
+    python benchmarks/bench_import_time.py --runs 5
+    python benchmarks/bench_import_time.py --importtime --top 25 --output import_time.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Dependencies only the ingestion route (or AstraDB connections) should need
+HEAVY_MODULES = ["fitz", "docx", "langchain_core", "langchain_text_splitters", "langchain_astradb", "astrapy", "httpx", "numpy"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import fitz, docx
+deferred = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "deferred_ms": (deferred - imported) * 1000,
+    "eager_heavy_modules": [name for name in %r if name in sys.modules and name not in ("fitz", "docx")],
+}))
+""" % (HEAVY_MODULES,)
+
+LOADED_SCRIPT = "import sys, json; import app.main; print(json.dumps([name for name in %r if name in sys.modules]))" % (HEAVY_MODULES,)
+
+
+def _env():
+    env = dict(os.environ, STARTUP_RESOURCES="", PYTHONDONTWRITEBYTECODE="0")
+    env["PYTHONPATH"] = str(BACKEND_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_boot(timeout: float = 60.0) -> float:
+    """Milliseconds from spawning a uvicorn worker to its first successful /health response."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError(f"Worker did not answer /health within {timeout} s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def importtime_report(top: int):
+    """Slowest modules by cumulative import time, from `python -X importtime -c 'import app.main'`."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+
+
+def summary(values):
+    return {"median": round(statistics.median(values), 1), "min": round(min(values), 1), "max": round(max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement")
+    parser.add_argument("--importtime", action="store_true", help="Also print the slowest modules from -X importtime")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    # One throwaway run so .pyc files exist and the first sample is not a cold compile
+    measure_import()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    boots = [measure_boot() for _ in range(args.runs)]
+    results = {
+        "import_ms": summary([run["import_ms"] for run in imports]),
+        "boot_to_health_ms": summary(boots),
+        "deferred_ingestion_imports_ms": summary([run["deferred_ms"] for run in imports]),
+        "eager_heavy_modules": json.loads(subprocess.run(
+            [sys.executable, "-c", LOADED_SCRIPT], cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]),
+    }
+
+    header = ["measurement", "median", "min", "max"]
+    print(" | ".join(f"{column:>30}" for column in header))
+    for name in ("import_ms", "boot_to_health_ms", "deferred_ingestion_imports_ms"):
+        print(" | ".join(f"{str(value):>30}" for value in [name, *results[name].values()]))
+    print(f"Heavy modules loaded by `import app.main`: {', '.join(results['eager_heavy_modules']) or 'none'}")
+
+    if args.importtime:
+        results["slowest_modules"] = importtime_report(args.top)
+        print(f"\nSlowest {args.top} modules (cumulative, from -X importtime):")
+        for row in results["slowest_modules"]:
+            print(f"{row['cumulative_ms']:>10.1f} ms  {row['self_ms']:>8.1f} ms self  {row['module']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Benchmark: latency and answer quality of the query pipeline modes
+
+Runs the query pipeline in "refine" (Query Refiner LLM + Answer LLM), "raw" and "rewrite"
+(single Answer LLM call with clarify_query) mode against stubbed models, and reports per-stage
+latency, retrieval recall@k and answer accuracy for each mode.
+
+The stubs speak the Beam contracts on local aiohttp servers and are driven through the real
+query_pipeline / query_refiner / answer_generator code:
+  - refiner:   drops conversational filler and stopwords (an idealized refinement)
+  - embedding: hashed bag-of-words vectors, so filler words in the embedded text add noise
+  - answer:    returns the context sentence sharing the most words with the query
+Each stub sleeps for a log-normally distributed latency around the configured median.
+
+The corpus is synthetic: parent documents made of "The <attribute> of project <name> is <value>."
+facts, queried with conversational, terse and plain phrasings of one fact each.
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline_modes.py --queries 200 --refine-ms 350 --answer-ms 900
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.service.rag.retrieval import answer_generator, query_refiner
+from app.service.rag.retrieval.query_pipeline import PIPELINE_MODES, prepare_retrieval_query
+
+ATTRIBUTES = ["budget", "deadline", "owner", "region", "vendor", "status", "priority", "codename"]
+VALUES = ["amber", "basalt", "cobalt", "dune", "ember", "fjord", "granite", "harbor", "indigo", "juniper"]
+STOPWORDS = {"the", "of", "is", "what", "a", "an", "for", "to", "me", "you", "i", "do", "does", "on", "about"}
+FILLER = ["hey", "could", "you", "please", "tell", "me", "thanks", "so", "actually", "quick", "question"]
+EMBED_DIM = 512
+
+QUERY_TEMPLATES = [
+    "Hey, could you please tell me what the {attribute} of project {name} is? Thanks!",
+    "{name} {attribute}?",
+    "What is the {attribute} of project {name}?",
+    "So, quick question about project {name}: do you know the {attribute}?",
+]
+
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def embed(text: str) -> np.ndarray:
+    vector = np.zeros(EMBED_DIM, dtype=np.float32)
+    for token in tokenize(text):
+        vector[zlib.crc32(token.encode()) % EMBED_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def build_corpus(documents: int, facts_per_document: int, seed: int):
+    """Parent documents, child sentences (with their parent index) and the fact table."""
+    rng = np.random.default_rng(seed)
+    parents, children, facts = [], [], []
+    for doc_index in range(documents):
+        sentences = []
+        for _ in range(facts_per_document):
+            name = f"p{rng.integers(10_000):04d}"
+            attribute = ATTRIBUTES[rng.integers(len(ATTRIBUTES))]
+            value = VALUES[rng.integers(len(VALUES))]
+            sentence = f"The {attribute} of project {name} is {value}."
+            sentences.append(sentence)
+            children.append((sentence, doc_index))
+            facts.append({"name": name, "attribute": attribute, "value": value, "parent": doc_index})
+        parents.append(" ".join(sentences))
+    return parents, children, facts
+
+
+def latency(rng, median_ms: float) -> float:
+    return float(rng.lognormal(np.log(max(median_ms, 1e-3)), 0.25)) / 1000
+
+
+# ============================================================
+# Stub model servers
+# ============================================================
+def refine_app(rng, median_ms: float):
+    async def handler(request):
+        body = await request.json()
+        await asyncio.sleep(latency(rng, median_ms))
+        words = [word for word in tokenize(body["user_query"]) if word not in STOPWORDS and word not in FILLER]
+        return web.json_response({"original_query": body["user_query"], "refined_query": " ".join(words)})
+
+    app = web.Application()
+    app.router.add_post("/", handler)
+    return app
+
+
+def answer_app(rng, median_ms: float, clarify_extra_ms: float):
+    async def handler(request):
+        body = await request.json()
+        await asyncio.sleep(latency(rng, median_ms + (clarify_extra_ms if body.get("clarify_query") else 0)))
+        query_words = set(tokenize(body["user_query"])) - STOPWORDS
+        sentences = [s.strip() for s in re.split(r"(?<=\.)\s+", body["rag_context"]) if s.strip()]
+        best = max(sentences, key=lambda sentence: len(query_words & set(tokenize(sentence))), default="")
+        return web.json_response({"user_query": body["user_query"], "answer": best or "No answer found in the provided context."})
+
+    app = web.Application()
+    app.router.add_post("/", handler)
+    return app
+
+
+class StubRetriever:
+    """In-process stand-in for search_and_retrieve_context: embed, search children, return parents."""
+
+    def __init__(self, parents, children, rng, embed_ms: float):
+        self.parents = parents
+        self.child_parents = np.array([parent for _, parent in children])
+        self.matrix = np.stack([embed(text) for text, _ in children])
+        self.rng = rng
+        self.embed_ms = embed_ms
+
+    async def search(self, query: str, top_k: int) -> tuple[list[str], list[int]]:
+        await asyncio.sleep(latency(self.rng, self.embed_ms))
+        best = np.argsort(-(self.matrix @ embed(query)))[:top_k]
+        parent_ids = list(dict.fromkeys(int(self.child_parents[index]) for index in best))
+        return [self.parents[parent] for parent in parent_ids], parent_ids
+
+
+# ============================================================
+# Benchmark
+# ============================================================
+async def run_mode(mode, questions, retriever, top_k):
+    rows = []
+    for question in questions:
+        started = time.perf_counter()
+        retrieval_query, clarify_query = await prepare_retrieval_query(question["query"], mode)
+        prepared = time.perf_counter()
+        rag_contents, parent_ids = await retriever.search(retrieval_query, top_k)
+        retrieved = time.perf_counter()
+        answer = await answer_generator.generate_answer(rag_contents, question["query"], clarify_query=clarify_query)
+        finished = time.perf_counter()
+        rows.append({
+            "prepare_ms": (prepared - started) * 1000,
+            "retrieve_ms": (retrieved - prepared) * 1000,
+            "answer_ms": (finished - retrieved) * 1000,
+            "total_ms": (finished - started) * 1000,
+            "hit": question["parent"] in parent_ids,
+            "correct": question["value"] in answer,
+        })
+    return rows
+
+
+def summarize(mode, rows):
+    totals = np.array([row["total_ms"] for row in rows])
+    return {
+        "mode": mode,
+        "prepare_ms": round(float(np.mean([row["prepare_ms"] for row in rows])), 1),
+        "retrieve_ms": round(float(np.mean([row["retrieve_ms"] for row in rows])), 1),
+        "answer_ms": round(float(np.mean([row["answer_ms"] for row in rows])), 1),
+        "p50_ms": round(float(np.percentile(totals, 50)), 1),
+        "p95_ms": round(float(np.percentile(totals, 95)), 1),
+        "recall@k": round(float(np.mean([row["hit"] for row in rows])), 3),
+        "accuracy": round(float(np.mean([row["correct"] for row in rows])), 3),
+    }
+
+
+async def main_async(args):
+    rng = np.random.default_rng(args.seed)
+    parents, children, facts = build_corpus(args.documents, args.facts_per_document, args.seed)
+    picked = rng.choice(len(facts), size=min(args.queries, len(facts)), replace=False)
+    questions = []
+    for position, fact_index in enumerate(picked):
+        fact = facts[fact_index]
+        template = QUERY_TEMPLATES[position % len(QUERY_TEMPLATES)]
+        questions.append({"query": template.format(**fact), "value": fact["value"], "parent": fact["parent"]})
+
+    refine_server = TestServer(refine_app(rng, args.refine_ms))
+    answer_server = TestServer(answer_app(rng, args.answer_ms, args.clarify_extra_ms))
+    await refine_server.start_server()
+    await answer_server.start_server()
+    query_refiner.LLM_URL = str(refine_server.make_url("/"))
+    answer_generator.BEAM_ANSWER_URL = str(answer_server.make_url("/"))
+    answer_generator.BEAM_ANSWER_KEY = "stub"
+
+    retriever = StubRetriever(parents, children, rng, args.embed_ms)
+    try:
+        results = [summarize(mode, await run_mode(mode, questions, retriever, args.k)) for mode in args.modes]
+    finally:
+        await refine_server.close()
+        await answer_server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=PIPELINE_MODES, default=list(PIPELINE_MODES))
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--facts-per-document", type=int, default=5)
+    parser.add_argument("--k", type=int, default=5, help="Child chunks retrieved per query")
+    parser.add_argument("--refine-ms", type=float, default=300, help="Median Query Refiner latency")
+    parser.add_argument("--answer-ms", type=float, default=800, help="Median Answer Generator latency")
+    parser.add_argument("--clarify-extra-ms", type=float, default=15, help="Extra answer latency with clarify_query")
+    parser.add_argument("--embed-ms", type=float, default=60, help="Median query embedding + search latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    header = ["mode", "prepare_ms", "retrieve_ms", "answer_ms", "p50_ms", "p95_ms", "recall@k", "accuracy"]
+    print(" | ".join(f"{column:>11}" for column in header))
+    for row in results:
+        print(" | ".join(f"{str(row[column]):>11}" for column in header))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "results": results}, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
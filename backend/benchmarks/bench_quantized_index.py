@@ -0,0 +1,107 @@
+"""
+Benchmark: memory and recall of the quantized child-vector index
+
+Compares exact float32 search with int8 and binary QuantizedVectorIndex search at several
+rescoring depths, reporting resident memory, recall@k against exact search and query latency.
+
+By default it uses synthetic clustered unit vectors (fast, no network). With --corpus the
+vectors are produced by BeamGemmaEmbeddings from the polished child chunks of those files,
+which is what a real local index would hold.
+
+Usage (from backend/):
+    python benchmarks/bench_quantized_index.py --vectors 200000 --dim 768
+    python benchmarks/bench_quantized_index.py --corpus _local_uploads/sample.pdf --k 5
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.vectordb.quantized_index import QuantizedVectorIndex, INT8, BINARY
+
+
+def synthetic_vectors(count: int, dimension: int, seed: int):
+    centres = np.random.default_rng(0).normal(size=(256, dimension))
+    rng = np.random.default_rng(seed)
+    vectors = centres[rng.integers(0, len(centres), size=count)] + 0.6 * rng.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def beam_vectors(paths, query_count: int):
+    """Embeds the polished child chunks of `paths` through the configured Beam endpoint."""
+    from dotenv import load_dotenv
+    load_dotenv(BACKEND_DIR / ".env")
+    from app.embedding.embedding_client import BeamGemmaEmbeddings
+    from bench_embedding_dimensions import load_children, embed_full
+
+    children = load_children(paths)
+    vectors = np.asarray(asyncio.run(embed_full(BeamGemmaEmbeddings(), children)), dtype=np.float32)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), size=min(query_count, len(vectors)), replace=False)]
+    return vectors, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--depths", nargs="+", type=int, default=[50, 200, 500], help="Rescoring depths to try")
+    parser.add_argument("--corpus", nargs="+", help="Build from BeamGemmaEmbeddings vectors of these files instead")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.corpus:
+        sys.path.insert(0, str(Path(__file__).resolve().parent))
+        vectors, queries = beam_vectors(args.corpus, args.queries)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, seed=1)
+        queries = synthetic_vectors(args.queries, args.dim, seed=2)
+    count, dimension = vectors.shape
+    ids = [str(i) for i in range(count)]
+    print(f"Corpus: {count} vectors x {dimension} dims, {len(queries)} queries, k={args.k}")
+
+    started = time.perf_counter()
+    exact = np.stack([np.argsort(-(vectors @ query))[:args.k] for query in queries])
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    results = [{
+        "mode": "float32", "depth": None, "memory_mb": round(vectors.nbytes / 2**20, 2),
+        f"recall@{args.k}": 1.0, "ms_per_query": round(exact_ms, 3),
+    }]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in (INT8, BINARY):
+            index = QuantizedVectorIndex(dimension, mode=mode, float_store_path=Path(workdir) / f"{mode}.f32")
+            index.add(ids, vectors)
+            memory = index.memory_usage()
+            for depth in args.depths:
+                started = time.perf_counter()
+                found = [index.search(query, k=args.k, rescore_candidates=depth) for query in queries]
+                elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+                hits = sum(len({int(i) for i, _ in hits_} & set(expected.tolist())) for hits_, expected in zip(found, exact))
+                results.append({
+                    "mode": mode, "depth": depth, "memory_mb": round(memory["code_bytes"] / 2**20, 2),
+                    f"recall@{args.k}": round(hits / exact.size, 4), "ms_per_query": round(elapsed_ms, 3),
+                })
+
+    header = ["mode", "depth", "memory_mb", f"recall@{args.k}", "ms_per_query"]
+    print(" | ".join(f"{column:>12}" for column in header))
+    for row in results:
+        print(" | ".join(f"{str(row[column]):>12}" for column in header))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"vectors": count, "dimension": dimension, "results": results}, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: chunking throughput (MB/s) of the native splitter versus LangChain's
+
+Chunks the same text into parents (1500 chars) and children (600 chars, 10% overlap) with:
+    - langchain: RecursiveCharacterTextSplitter for the parents, then again on every parent's
+      text for its children, with LangChain Documents (`split_documents`, start_index), as
+      chunker.py did before RecursiveSpanSplitter;
+    - native: split_parent_child_chunks, i.e. RecursiveSpanSplitter on spans of one buffer.
+Both must produce the same parent and child texts (checked before timing). It reports MB/s
+(best of --runs) for the one-shot split and for the text fed page by page as the ingestion
+pipeline does (StreamingParentChildSplitter).
+
+The default corpus is a synthetic document (see bench_chunk_records.py); --corpus chunks real
+files instead (PDF / Word / text, extracted like /ingest/webhook does).
+
+Usage (from backend/):
+    python benchmarks/bench_splitter.py --mb 10 --runs 5
+    python benchmarks/bench_splitter.py --corpus _local_uploads/sample.pdf
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.service.rag.ingestion.chunker import SEPARATORS, StreamingParentChildSplitter, split_parent_child_chunks
+from app.service.rag.ingestion.text_extractor import iter_text
+from bench_chunk_records import synthetic_text
+
+PARENT_MAX_CHARS, CHILD_MAX_CHARS = 1500, 600
+PAGE_CHARS = 3000
+CONTENT_TYPES = {".pdf": "application/pdf", ".docx": "application/msword", ".txt": "text/plain", ".md": "text/plain"}
+
+
+def langchain_chunks(text: str):
+    parent_splitter = RecursiveCharacterTextSplitter(chunk_size=PARENT_MAX_CHARS, chunk_overlap=0, separators=SEPARATORS, add_start_index=True)
+    child_splitter = RecursiveCharacterTextSplitter(chunk_size=CHILD_MAX_CHARS, chunk_overlap=int(CHILD_MAX_CHARS * 0.1), separators=SEPARATORS)
+    parent_docs = parent_splitter.split_documents([Document(page_content=text, metadata={"document_name": "bench"})])
+    child_texts = []
+    for parent_doc in parent_docs:
+        parent_doc.metadata.pop("start_index", None)
+        child_texts.extend(child.page_content for child in child_splitter.split_documents([parent_doc]))
+    return [parent.page_content for parent in parent_docs], child_texts
+
+
+def native_chunks(text: str):
+    parents, children = split_parent_child_chunks(text, "bench", PARENT_MAX_CHARS, CHILD_MAX_CHARS)
+    return [parent.content for parent in parents], [child.text for child in children]
+
+
+def native_streamed(pages):
+    splitter = StreamingParentChildSplitter("bench", PARENT_MAX_CHARS, CHILD_MAX_CHARS)
+    parents, children = 0, 0
+    for page in pages:
+        new_parents, new_children = splitter.feed(page)
+        parents, children = parents + len(new_parents), children + len(new_children)
+    new_parents, new_children = splitter.flush()
+    return parents + len(new_parents), children + len(new_children)
+
+
+def best_seconds(call, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def load_corpus(paths):
+    pages = []
+    for path in paths:
+        path = Path(path)
+        pages.extend(iter_text(CONTENT_TYPES.get(path.suffix.lower(), "text/plain"), path.read_bytes()))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=10.0, help="Size of the synthetic document")
+    parser.add_argument("--corpus", nargs="*", help="Chunk these files instead of a synthetic document")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.corpus:
+        pages = load_corpus(args.corpus)
+        text = "\n".join(pages)
+    else:
+        text = synthetic_text(args.mb)
+        pages = [text[start:start + PAGE_CHARS] for start in range(0, len(text), PAGE_CHARS)]
+    megabytes = len(text.encode("utf-8")) / 1e6
+
+    reference, native = langchain_chunks(text), native_chunks(text)
+    if reference != native:
+        raise SystemExit("❌ The native splitter does not produce LangChain's chunks on this corpus")
+
+    results = {
+        "megabytes": round(megabytes, 2),
+        "parents": len(native[0]),
+        "children": len(native[1]),
+        "langchain_mb_s": round(megabytes / best_seconds(lambda: langchain_chunks(text), args.runs), 1),
+        "native_mb_s": round(megabytes / best_seconds(lambda: native_chunks(text), args.runs), 1),
+        "native_streamed_mb_s": round(megabytes / best_seconds(lambda: native_streamed(pages), args.runs), 1),
+    }
+    results["speedup"] = round(results["native_mb_s"] / results["langchain_mb_s"], 2)
+
+    print(f"{megabytes:.2f} MB: {results['parents']} parents, {results['children']} children (identical chunks)")
+    for name in ("langchain_mb_s", "native_mb_s", "native_streamed_mb_s"):
+        print(f"{name:>22}: {results[name]:>7.1f} MB/s")
+    print(f"{'speedup':>22}: {results['speedup']:>7.2f}x")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Unit tests for the batched query helpers
+Runs refine_queries / generate_answers against a local aiohttp server that
+speaks the Beam batch contracts, so no Beam credentials are needed.
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.service.rag.retrieval import query_refiner, answer_generator
+
+BATCH_SIZES = web.AppKey("batch_sizes", list)
+
+
+async def _refine_handler(request):
+    body = await request.json()
+    return web.json_response({
+        "original_queries": body["user_queries"],
+        "refined_queries": [f" refined {query} " for query in body["user_queries"]],
+    })
+
+
+async def _answer_handler(request):
+    body = await request.json()
+    request.app[BATCH_SIZES].append(len(body["batch"]))
+    return web.json_response({
+        "answers": [f"{item['user_query']}|{item['rag_context']}" for item in body["batch"]],
+    })
+
+
+async def _with_server(handler, coroutine_factory):
+    app = web.Application()
+    app[BATCH_SIZES] = []
+    app.router.add_post("/", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        result = await coroutine_factory(str(server.make_url("/")))
+    finally:
+        await server.close()
+    return result, app[BATCH_SIZES]
+
+
+def test_refine_queries_keeps_order(monkeypatch):
+    """Test that a batch refinement returns one stripped query per input, in order"""
+    print("=== Test 1: Batched Query Refinement ===\n")
+
+    async def run(url):
+        monkeypatch.setattr(query_refiner, "LLM_URL", url)
+        return await query_refiner.refine_queries(["a", "b", "c"])
+
+    refined, _ = asyncio.run(_with_server(_refine_handler, run))
+
+    assert refined == ["refined a", "refined b", "refined c"], f"Unexpected refined queries: {refined}"
+    print(f"✅ Refined queries: {refined}\n")
+
+
+def test_generate_answers_splits_into_batches(monkeypatch):
+    """Test that answers are generated in groups of ANSWER_BATCH_SIZE and reassembled in order"""
+    print("=== Test 2: Batched Answer Generation ===\n")
+
+    queries = [f"q{i}" for i in range(5)]
+    contexts = [[f"c{i}a", f"c{i}b"] for i in range(5)]
+
+    async def run(url):
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_URL", url)
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_KEY", "test-key")
+        monkeypatch.setattr(answer_generator, "ANSWER_BATCH_SIZE", 2)
+        return await answer_generator.generate_answers(contexts, queries)
+
+    answers, batch_sizes = asyncio.run(_with_server(_answer_handler, run))
+
+    assert sorted(batch_sizes) == [1, 2, 2], f"Unexpected batch sizes: {batch_sizes}"
+    assert answers == [f"q{i}|c{i}a\n\nc{i}b" for i in range(5)], f"Answers out of order: {answers}"
+    print(f"✅ Batch sizes sent: {batch_sizes}")
+    print(f"✅ Answers: {answers}\n")
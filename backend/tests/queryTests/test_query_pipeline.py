@@ -0,0 +1,122 @@
+"""
+Unit tests for the query pipeline modes
+Checks the local query rewrite, the per-mode retrieval query, that the clarify_query
+flag reaches the Answer Generator, using local aiohttp servers instead of Beam, and that
+an invalid QUERY_PIPELINE_MODE fails at import.
+"""
+import os
+import sys
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.service.rag.retrieval import answer_generator, query_pipeline, query_refiner
+
+PAYLOADS = web.AppKey("payloads", list)
+
+
+async def _echo_handler(request):
+    body = await request.json()
+    request.app[PAYLOADS].append(body)
+    if "batch" in body:
+        return web.json_response({"answers": ["ok"] * len(body["batch"])})
+    return web.json_response({"refined_query": "refined", "answer": "ok"})
+
+
+async def _with_server(coroutine_factory):
+    app = web.Application()
+    app[PAYLOADS] = []
+    app.router.add_post("/", _echo_handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        result = await coroutine_factory(str(server.make_url("/")))
+    finally:
+        await server.close()
+    return result, app[PAYLOADS]
+
+
+def test_rewrite_query_locally():
+    """Test that conversational wrappers are stripped and content is kept"""
+    print("=== Test 1: Local Query Rewrite ===\n")
+
+    cases = {
+        "Hey, could you please tell me what the budget of project Apollo is? Thanks!": "what the budget of project Apollo is",
+        "I want to know   how ingestion works": "how ingestion works",
+        "Apollo budget?": "Apollo budget",
+        "thanks": "thanks",
+    }
+    for query, expected in cases.items():
+        rewritten = query_pipeline.rewrite_query_locally(query)
+        assert rewritten == expected, f"{query!r} -> {rewritten!r}, expected {expected!r}"
+        print(f"✅ {query!r} -> {rewritten!r}")
+    print()
+
+
+def test_modes_choose_retrieval_query(monkeypatch):
+    """Test that only refine mode calls the refiner and the other modes request clarification"""
+    print("=== Test 2: Retrieval Query per Mode ===\n")
+
+    with pytest.raises(ValueError):
+        query_pipeline.validate_pipeline_mode("fast")
+    assert query_pipeline.validate_pipeline_mode(None) == query_pipeline.DEFAULT_PIPELINE_MODE
+
+    async def run(url):
+        monkeypatch.setattr(query_refiner, "LLM_URL", url)
+        return {
+            mode: await query_pipeline.prepare_retrieval_query("Please explain chunking", mode)
+            for mode in query_pipeline.PIPELINE_MODES
+        }
+
+    results, payloads = asyncio.run(_with_server(run))
+
+    assert results == {
+        "refine": ("refined", False),
+        "raw": ("Please explain chunking", True),
+        "rewrite": ("chunking", True),
+    }, f"Unexpected retrieval queries: {results}"
+    assert len(payloads) == 1, "Only refine mode should call the Query Refiner"
+    print(f"✅ {results}\n")
+
+
+def test_clarify_flag_sent_to_answer_generator(monkeypatch):
+    """Test that clarify_query is sent only when requested, for single and batched answers"""
+    print("=== Test 3: clarify_query Payload ===\n")
+
+    async def run(url):
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_URL", url)
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_KEY", "test-key")
+        await answer_generator.generate_answer(["ctx"], "q")
+        await answer_generator.generate_answer(["ctx"], "q", clarify_query=True)
+        await answer_generator.generate_answers([["ctx"], ["ctx"]], ["q1", "q2"], clarify_query=True)
+
+    _, payloads = asyncio.run(_with_server(run))
+
+    assert "clarify_query" not in payloads[0], "Refined queries should keep the original payload"
+    assert payloads[1]["clarify_query"] is True
+    assert all(item["clarify_query"] for item in payloads[2]["batch"])
+    print(f"✅ Payloads: {payloads}\n")
+
+
+def test_invalid_default_mode_fails_at_import():
+    """Test that an unknown QUERY_PIPELINE_MODE stops the import instead of failing each request"""
+    print("=== Test 4: QUERY_PIPELINE_MODE ===\n")
+
+    script = "import app.service.rag.retrieval.query_pipeline as q; print(q.DEFAULT_PIPELINE_MODE)"
+    for value, ok in (("fast", False), ("RAW", True)):
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True,
+            env={**os.environ, "QUERY_PIPELINE_MODE": value},
+        )
+        if ok:
+            assert result.returncode == 0 and result.stdout.strip() == "raw", result.stderr
+        else:
+            assert result.returncode != 0 and "Unknown QUERY_PIPELINE_MODE 'fast'" in result.stderr, result.stderr
+    print("✅ 'fast' fails at import, 'RAW' is read as 'raw'\n")
@@ -0,0 +1,91 @@
+"""
+Unit tests for the local Beam stand-ins (benchmarks/beam_stubs.py)
+Starts the stub server in-process and drives the real backend clients against it, so the
+JSON contracts of the embedding, refiner and answer endpoints are checked end-to-end.
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from beam_stubs import LatencyModel, StubService, start_stub_server
+from app.embedding.embedding_client import BeamGemmaEmbeddings
+from app.service.rag.retrieval import answer_generator, query_refiner
+
+API_KEY = "test-key"
+HEADERS = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
+
+
+def _services(error_rate: float = 0.0):
+    return {route: StubService(LatencyModel("fixed:1"), error_rate=error_rate) for route in ("embed", "refine", "answer")}
+
+
+def _point_clients_at(monkeypatch, base_url):
+    monkeypatch.setattr(query_refiner, "LLM_URL", f"{base_url}/refine")
+    monkeypatch.setattr(query_refiner, "HEADERS", HEADERS)
+    monkeypatch.setattr(answer_generator, "BEAM_ANSWER_URL", f"{base_url}/answer")
+    monkeypatch.setattr(answer_generator, "BEAM_ANSWER_KEY", API_KEY)
+    monkeypatch.setattr(answer_generator, "HEADERS", HEADERS)
+
+
+def test_clients_against_stubs(monkeypatch):
+    """Test the embedding, refiner and answer clients against the stub contracts"""
+    print("=== Test 1: Clients Against Stubs ===\n")
+
+    context = ["Uploads accept pdf, docx and txt files.", "Parents are stored in the document store."]
+
+    async def run():
+        runner, base_url = await start_stub_server(_services(), api_key=API_KEY)
+        _point_clients_at(monkeypatch, base_url)
+        try:
+            embeddings = BeamGemmaEmbeddings(f"{base_url}/embed", API_KEY, output_dim=256)
+            vectors = await embeddings.aembed_documents(["pdf uploads", "pdf uploads", "document store"])
+            refined = await query_refiner.refine_query("Hey, could you tell me which files are accepted?")
+            refined_batch = await query_refiner.refine_queries(["what is the document store?", "which uploads work?"])
+            single = await answer_generator.generate_answer(context, "Which files do uploads accept?")
+            batch = await answer_generator.generate_answers([context, context], ["Which files?", "Where are parents stored?"])
+            return vectors, refined, refined_batch, single, batch
+        finally:
+            await runner.cleanup()
+
+    vectors, refined, refined_batch, single, batch = asyncio.run(run())
+
+    assert [len(vector) for vector in vectors] == [256] * 3
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert vectors[0] == vectors[1] and vectors[0] != vectors[2]
+    assert refined == "files accepted", refined
+    assert refined_batch == ["document store", "uploads work"], refined_batch
+    assert single == context[0], single
+    assert batch == context, batch
+    print(f"✅ Refined: {refined!r}, answers: {batch}\n")
+
+
+def test_latency_and_error_injection(monkeypatch):
+    """Test latency sampling, per-item cost and injected failures"""
+    print("=== Test 2: Latency and Errors ===\n")
+
+    rng = np.random.default_rng(0)
+    assert LatencyModel("fixed:10", per_item_ms=5).sample(rng, items=3) == pytest.approx(0.020)
+    samples = [LatencyModel("lognormal:100:0.2").sample(rng) for _ in range(2000)]
+    assert 0.09 < float(np.median(samples)) < 0.11
+    assert all(0.005 <= LatencyModel("uniform:5:8").sample(rng) <= 0.008 for _ in range(100))
+    with pytest.raises(ValueError):
+        LatencyModel("gamma:3")
+
+    async def run():
+        runner, base_url = await start_stub_server(_services(error_rate=1.0), api_key=API_KEY)
+        _point_clients_at(monkeypatch, base_url)
+        try:
+            with pytest.raises(ValueError, match="500"):
+                await query_refiner.refine_query("which files?")
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    print("✅ Latency specs sample as configured and errors reach the clients\n")
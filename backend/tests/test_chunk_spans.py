@@ -0,0 +1,96 @@
+"""
+Unit tests for span-based chunks (app/service/rag/ingestion/chunker.py)
+Checks that parents and children are spans over one shared text buffer whose offsets index the
+extracted document text, both for a one-shot split and for pages fed one at a time, and that
+the offsets are stored with the chunks.
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.resources import resources
+from app.service.rag.ingestion.chunker import StreamingParentChildSplitter, split_parent_child_chunks
+from app.vectordb import vectordb
+from app.vectordb.local_store import LocalDocumentStore, LocalVectorStore
+
+DIMENSION = 4
+
+PARAGRAPH = "Uploads accept pdf, docx and txt files. Parents go to the document store, children are embedded."
+PAGES = [f"Page {page}.\n\n" + "\n\n".join(f"{PARAGRAPH} ({page}.{line})" for line in range(12)) for page in range(6)]
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0] * DIMENSION for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0] * DIMENSION
+
+
+def test_one_shot_spans():
+    """Test that every chunk is a span of the text and that all chunks share one buffer"""
+    print("=== Test 1: One-shot Spans ===\n")
+    text = "\n".join(PAGES)
+    parents, children = split_parent_child_chunks(text, "doc.pdf", parent_max_chars=600, child_max_chars=200)
+
+    assert len(parents) > 1 and len(children) > len(parents)
+    assert all(parent.source is text and child.source is text for parent in parents for child in children), "Chunks should not copy the text"
+    assert all(text[parent.start:parent.end] == parent.content for parent in parents)
+    assert all(text[child.start:child.end] == child.text for child in children)
+
+    spans = {parent.id: (parent.start, parent.end) for parent in parents}
+    for child in children:
+        parent_start, parent_end = spans[child.parent_id]
+        assert parent_start <= child.start < child.end <= parent_end, "A child should lie inside its parent"
+    print(f"✅ {len(parents)} parents and {len(children)} children are spans of one {len(text)}-char buffer\n")
+
+
+def test_streamed_offsets():
+    """Test that offsets of chunks fed page by page index the joined pages (the extract_text output)"""
+    print("=== Test 2: Streamed Offsets ===\n")
+    splitter = StreamingParentChildSplitter("doc.pdf", parent_max_chars=600, child_max_chars=200)
+    parents, children = [], []
+    for page in PAGES:
+        new_parents, new_children = splitter.feed(page)
+        parents += new_parents
+        children += new_children
+    new_parents, new_children = splitter.flush()
+    parents += new_parents
+    children += new_children
+
+    text = "\n".join(PAGES)
+    assert all(text[parent.start:parent.end] == parent.content for parent in parents)
+    assert all(text[child.start:child.end] == child.text for child in children)
+    assert [parent.start for parent in parents] == sorted(parent.start for parent in parents)
+    assert len({id(parent.source) for parent in parents}) > 1, "Each feed should emit spans over its own buffer"
+    print(f"✅ {len(parents)} streamed parents and {len(children)} children point into the document text\n")
+
+
+def test_offsets_are_stored(tmp_path, monkeypatch):
+    """Test that parents and children are stored with their start_index / end_index"""
+    print("=== Test 3: Stored Offsets ===\n")
+    vector_store = LocalVectorStore(ConstantEmbeddings(), tmp_path / "vectors", DIMENSION)
+    parent_store = LocalDocumentStore(tmp_path / "parents.jsonl")
+    monkeypatch.setitem(resources.factories, "vector_store", lambda: vector_store)
+    monkeypatch.setitem(resources.factories, "parent_store", lambda: parent_store)
+    resources.reset()
+
+    text = PAGES[0]
+    parents, children = split_parent_child_chunks(text, "doc.pdf", parent_max_chars=600, child_max_chars=200)
+    try:
+        asyncio.run(vectordb.upsert_documents(parents, children))
+    finally:
+        resources.reset()
+
+    stored_parents = parent_store.mget([parent.id for parent in parents])
+    stored_children = vector_store.similarity_search_by_vector([1.0] * DIMENSION, k=len(children))
+    assert len(stored_children) == len(children)
+    for stored in stored_parents:
+        assert text[stored["metadata"]["start_index"]:stored["metadata"]["end_index"]] == stored["page_content"]
+    for stored in stored_children:
+        assert text[stored.metadata["start_index"]:stored.metadata["end_index"]] == stored.page_content
+    print(f"✅ {len(stored_parents)} parents and {len(stored_children)} children stored with offsets that highlight their source\n")
@@ -0,0 +1,93 @@
+"""
+Unit tests for embedding_client module
+Tests Matryoshka truncation, the request/response contract of BeamGemmaEmbeddings
+against a local aiohttp server, and the check of an AstraDB collection's dimension.
+"""
+import sys
+import asyncio
+import math
+from pathlib import Path
+from types import SimpleNamespace
+
+import langchain_astradb
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.embedding.embedding_client import BeamGemmaEmbeddings, truncate_and_normalize
+from app.vectordb import vectordb_init
+
+PAYLOADS = web.AppKey("payloads", list)
+
+
+def test_truncate_and_normalize():
+    """Test that vectors are cut to the requested size and rescaled to unit length"""
+    print("=== Test 1: Truncate and Normalize ===\n")
+
+    vectors = [[3.0, 4.0, 12.0, 0.0], [], [0.0, 0.0, 1.0, 1.0]]
+    result = truncate_and_normalize(vectors, 2)
+
+    assert [len(v) for v in result] == [2, 0, 2], f"Unexpected sizes: {result}"
+    assert math.isclose(result[0][0], 0.6, rel_tol=1e-6) and math.isclose(result[0][1], 0.8, rel_tol=1e-6)
+    assert result[2] == [0.0, 0.0], "All-zero prefix should stay zero instead of dividing by zero"
+    print(f"✅ Result: {result}\n")
+
+
+def test_client_requests_and_enforces_dimension():
+    """Test that the client asks for its dimension and truncates full-size replies"""
+    print("=== Test 2: Client Output Dimension ===\n")
+
+    async def handler(request):
+        body = await request.json()
+        request.app[PAYLOADS].append(body)
+        # Behave like an old deployment that ignores "dimensions"
+        return web.json_response({"embeddings": [[1.0] * 768 for _ in body["input"]]})
+
+    async def run():
+        app = web.Application()
+        app[PAYLOADS] = []
+        app.router.add_post("/", handler)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            client = BeamGemmaEmbeddings(endpoint_url=str(server.make_url("/")), api_token="test", output_dim=256)
+            vectors = await client.aembed_documents(["a", "b"])
+        finally:
+            await server.close()
+        return vectors, app[PAYLOADS]
+
+    vectors, payloads = asyncio.run(run())
+
+    assert payloads == [{"input": ["a", "b"], "dimensions": 256}], f"Unexpected payload: {payloads}"
+    assert [len(v) for v in vectors] == [256, 256], "Vectors should be truncated to 256 dims"
+    assert math.isclose(sum(x * x for x in vectors[0]), 1.0, rel_tol=1e-5), "Vectors should be unit length"
+    print(f"✅ Payload: {payloads[0]}")
+    print(f"✅ Returned {len(vectors)} vectors of {len(vectors[0])} dims\n")
+
+
+def test_astra_collection_dimension_is_checked(monkeypatch):
+    """Test that an existing AstraDB collection with another vector dimension than EMBEDDING_DIM is refused"""
+    print("=== Test 3: Collection Dimension ===\n")
+
+    class FakeAstraDBVectorStore:
+        """Like AstraDBVectorStore on an existing collection: its options keep the dimension it was created with."""
+
+        collection_dimension = 768
+
+        def __init__(self, **kwargs):
+            options = SimpleNamespace(vector=SimpleNamespace(dimension=self.collection_dimension))
+            self.astra_env = SimpleNamespace(collection=SimpleNamespace(options=lambda: options))
+
+    monkeypatch.setattr(langchain_astradb, "AstraDBVectorStore", FakeAstraDBVectorStore)
+    monkeypatch.setattr(vectordb_init, "ASTRA_DB_URL", "https://example.apps.astra.datastax.com")
+    monkeypatch.setattr(vectordb_init, "ASTRA_DB_TOKEN", "AstraCS:test")
+    monkeypatch.setattr(vectordb_init, "EMBEDDING_DIM", 256)
+    embeddings = BeamGemmaEmbeddings(endpoint_url="http://localhost", api_token="test", output_dim=256)
+
+    with pytest.raises(ValueError, match="uses 768-dim vectors but EMBEDDING_DIM is 256"):
+        vectordb_init._init_astra_vector_store(embeddings)
+    FakeAstraDBVectorStore.collection_dimension = 256
+    assert isinstance(vectordb_init._init_astra_vector_store(embeddings), FakeAstraDBVectorStore)
+    print("✅ A 768-dim collection is refused with EMBEDDING_DIM=256, a 256-dim one is accepted\n")
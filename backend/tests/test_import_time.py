@@ -0,0 +1,48 @@
+"""
+Unit tests for the backend's import footprint
+Imports app.main in a fresh interpreter and checks that ingestion-only and database
+dependencies are deferred to first use, and that the ingestion helpers still load them.
+"""
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+DEFERRED_MODULES = ["fitz", "docx", "langchain_core", "langchain_text_splitters", "langchain_astradb", "astrapy", "httpx"]
+
+
+def _loaded_after(statement: str):
+    script = f"import sys, json; {statement}; print(json.dumps([name for name in {DEFERRED_MODULES!r} if name in sys.modules]))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def test_app_import_defers_heavy_modules():
+    """Test that importing the FastAPI app loads none of the heavy ingestion/database packages"""
+    print("=== Test 1: app.main Import ===\n")
+
+    loaded = _loaded_after("import app.main")
+    assert loaded == [], f"Loaded eagerly by app.main: {loaded}"
+    print("✅ No heavy modules loaded at import\n")
+
+
+def test_ingestion_loads_on_first_use():
+    """Test that chunking needs none of the heavy packages and that PDF extraction loads PyMuPDF when it runs"""
+    print("=== Test 2: First Use ===\n")
+
+    loaded = _loaded_after(
+        "from app.service.rag.ingestion.chunker import split_parent_child_chunks; "
+        "parents, children = split_parent_child_chunks('Some text. ' * 300, 'doc.txt'); "
+        "assert parents and children"
+    )
+    assert loaded == [], f"Chunking (RecursiveSpanSplitter) should not import heavy packages: {loaded}"
+
+    loaded = _loaded_after(
+        "from app.service.rag.ingestion.text_extractor import extract_text; "
+        "assert extract_text('application/pdf', open('_local_uploads/sample.pdf', 'rb').read())"
+    )
+    assert "fitz" in loaded, f"PDF extraction should import PyMuPDF: {loaded}"
+    print(f"✅ Chunking loads nothing, PDF extraction loads: {loaded}\n")
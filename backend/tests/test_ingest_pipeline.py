@@ -0,0 +1,142 @@
+"""
+Unit tests for the pipelined ingestion (app/service/rag/ingestion/pipeline.py)
+Feeds slow fake pages through ingest_document with a slow fake embedder on the local stores and
+checks that storing starts before extraction ends, that a failure rolls back earlier batches,
+and that /ingest/webhook runs a real multi-page PDF through the pipeline.
+"""
+import sys
+import asyncio
+import base64
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.resources import resources
+from app.core.timing import parse_server_timing
+from app.main import app
+from app.service.rag.ingestion import pipeline
+from app.service.rag.ingestion.pipeline import IngestionStageError, ingest_document
+from app.vectordb.local_store import LocalDocumentStore, LocalVectorStore
+
+DIMENSION = 8
+PAGE_TEXT = "\n".join(f"Line {line} of the page describes the storage layout in some detail." for line in range(40))
+
+
+class SlowEmbeddings(Embeddings):
+    """Constant vectors after a short sleep; records when it was called and can fail on the Nth call."""
+
+    def __init__(self, delay=0.02, fail_on_call=None):
+        self.delay, self.fail_on_call, self.called_at = delay, fail_on_call, []
+
+    def embed_documents(self, texts):
+        return [[1.0] + [0.0] * (DIMENSION - 1) for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.called_at.append(time.perf_counter())
+        await asyncio.sleep(self.delay)
+        if self.fail_on_call is not None and len(self.called_at) >= self.fail_on_call:
+            raise RuntimeError("embedding endpoint unavailable")
+        return self.embed_documents(texts)
+
+
+def _stores(tmp_path, monkeypatch, embeddings):
+    vector_store = LocalVectorStore(embeddings, tmp_path / "vectors", DIMENSION)
+    parent_store = LocalDocumentStore(tmp_path / "parents.jsonl")
+    monkeypatch.setitem(resources.factories, "vector_store", lambda: vector_store)
+    monkeypatch.setitem(resources.factories, "parent_store", lambda: parent_store)
+    resources.reset()
+    return vector_store, parent_store
+
+
+def _slow_pages(count, delay, extracted_at):
+    def iter_text(content_type, data):
+        def pages():
+            for _ in range(count):
+                time.sleep(delay)  # parsing a page
+                extracted_at.append(time.perf_counter())
+                yield PAGE_TEXT
+        return pages()
+    return iter_text
+
+
+def test_stages_overlap(tmp_path, monkeypatch):
+    """Test that children are stored while later pages are still being extracted"""
+    print("=== Test 1: Overlapping Stages ===\n")
+    embeddings = SlowEmbeddings()
+    vector_store, parent_store = _stores(tmp_path, monkeypatch, embeddings)
+    extracted_at = []
+    monkeypatch.setattr(pipeline, "iter_text", _slow_pages(12, 0.02, extracted_at))
+    monkeypatch.setattr(pipeline, "INGEST_STORE_BATCH", 8)
+
+    try:
+        summary = asyncio.run(ingest_document("application/pdf", b"", "doc.pdf"))
+    finally:
+        resources.reset()
+
+    assert summary["pages"] == 12 and summary["children"] == len(vector_store) > 0
+    assert len(list(parent_store.yield_keys())) == summary["parents"]
+    assert embeddings.called_at[0] < extracted_at[-1], "Embedding should start before the last page is extracted"
+    stages = summary["stages"]
+    assert stages["extract"]["occupancy"] > 0.5 and stages["store"]["items"] >= 2
+    busy_total = sum(stage["busy_ms"] for stage in stages.values()) / 1000
+    assert summary["seconds"] < busy_total, "Stages ran one after another"
+    print(f"✅ {summary['pages']} pages, {summary['children']} children in {summary['seconds']} s; stages: {stages}\n")
+
+
+def test_failure_rolls_back_stored_batches(tmp_path, monkeypatch):
+    """Test that a failing store batch removes the batches stored before it"""
+    print("=== Test 2: Rollback ===\n")
+    embeddings = SlowEmbeddings(fail_on_call=3)
+    vector_store, parent_store = _stores(tmp_path, monkeypatch, embeddings)
+    monkeypatch.setattr(pipeline, "iter_text", _slow_pages(12, 0.005, []))
+    monkeypatch.setattr(pipeline, "INGEST_STORE_BATCH", 8)
+    monkeypatch.setattr(pipeline, "INGEST_STORE_WORKERS", 1)
+
+    try:
+        with pytest.raises(IngestionStageError) as failure:
+            asyncio.run(ingest_document("application/pdf", b"", "doc.pdf"))
+    finally:
+        resources.reset()
+
+    assert failure.value.stage == "store" and "embedding endpoint unavailable" in str(failure.value)
+    assert len(embeddings.called_at) == 3
+    assert len(vector_store) == 0 and not list(parent_store.yield_keys())
+    print("✅ Two stored batches rolled back after the third failed\n")
+
+
+def test_webhook_pdf(tmp_path, monkeypatch):
+    """Test /ingest/webhook with a multi-page PDF and with an unsupported file type"""
+    print("=== Test 3: /ingest/webhook ===\n")
+    fitz = pytest.importorskip("fitz")
+    vector_store, parent_store = _stores(tmp_path, monkeypatch, SlowEmbeddings(delay=0))
+
+    document = fitz.open()
+    for number in range(5):
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), f"Page {number}. " + PAGE_TEXT.replace("\n", " "), fontsize=9)
+    data = base64.b64encode(document.tobytes()).decode()
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            ok = await client.post("/ingest/webhook", json={"fileName": "doc.pdf", "contentType": "application/pdf", "data": data})
+            unsupported = await client.post("/ingest/webhook", json={"fileName": "a.png", "contentType": "image/png", "data": data})
+        return ok, unsupported
+
+    try:
+        ok, unsupported = asyncio.run(run())
+    finally:
+        resources.reset()
+
+    assert ok.status_code == 200, ok.text
+    assert ok.json()["pages"] == 5 and ok.json()["children"] == len(vector_store) > 0
+    assert {"extract", "chunk", "polish", "parent_upsert", "child_upsert"} <= parse_server_timing(ok.headers["Server-Timing"]).keys()
+    assert unsupported.status_code == 415
+    print(f"✅ {ok.json()}\n")
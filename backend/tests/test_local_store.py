@@ -0,0 +1,190 @@
+"""
+Unit tests for the local vector backend (app/vectordb/local_store.py)
+Uses a deterministic bag-of-words embedder, so no Beam or AstraDB is needed, and runs
+upsert_documents / search_and_retrieve_context(s) end-to-end with VECTOR_BACKEND=local.
+"""
+import sys
+import asyncio
+import subprocess
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.resources import resources
+from app.service.rag.ingestion.chunker import ChildChunk, ParentChunk
+from app.vectordb import vectordb, vectordb_init
+from app.vectordb.local_store import LocalDocumentStore, LocalVectorStore
+
+DIMENSION = 128
+
+
+class HashingEmbeddings(Embeddings):
+    """Unit-length hashed bag-of-words vectors: texts sharing words are close."""
+
+    def __init__(self, dimension: int = DIMENSION):
+        self.dimension = dimension
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % self.dimension] += 1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+TEXTS = [
+    "parent chunks are stored in the document store",
+    "child chunks are embedded and stored as vectors",
+    "the answer generator reads the parent context",
+    "uploads accept pdf docx and txt files",
+]
+
+
+def test_vector_store_search_persist_delete(tmp_path):
+    """Test exact/quantized search, reload from disk, replacement by id and deletion"""
+    print("=== Test 1: LocalVectorStore ===\n")
+
+    store = LocalVectorStore(HashingEmbeddings(), tmp_path / "children", DIMENSION)
+    ids = store.add_texts(TEXTS, [{"chunk_number": i, "document_name": "a.txt"} for i in range(len(TEXTS))])
+    assert len(store) == 4
+
+    top = store.similarity_search("which files can be uploaded pdf", k=2)
+    assert top[0].page_content == TEXTS[3], top
+    assert store.similarity_search("stored", k=10, filter={"chunk_number": 1})[0].page_content == TEXTS[1]
+
+    # Reopening the directory restores the collection
+    reopened = LocalVectorStore(HashingEmbeddings(), tmp_path / "children", DIMENSION)
+    assert len(reopened) == 4
+    assert reopened.similarity_search("which files can be uploaded pdf", k=1)[0].page_content == TEXTS[3]
+
+    # Re-adding an id replaces the row; deleting removes it (also after a reload)
+    reopened.add_texts(["uploads accept markdown"], ids=[ids[3]])
+    assert len(reopened) == 4
+    assert all(doc.page_content != TEXTS[3] for doc in reopened.similarity_search("uploads", k=4))
+    assert reopened.delete([ids[0]])
+    assert len(LocalVectorStore(HashingEmbeddings(), tmp_path / "children", DIMENSION)) == 3
+
+    # The quantized index ranks like the exact scan on this small corpus
+    quantized = LocalVectorStore(HashingEmbeddings(), tmp_path / "children", DIMENSION, index_mode="int8")
+    for query in ("parent context answer", "vectors embedded child"):
+        assert quantized.similarity_search(query, k=1) == reopened.similarity_search(query, k=1)
+    print("✅ Search, persistence, replacement and deletion behave like a collection\n")
+
+
+def test_document_store(tmp_path):
+    """Test mset/mget/mdelete and reload of the append-only log"""
+    print("=== Test 2: LocalDocumentStore ===\n")
+
+    store = LocalDocumentStore(tmp_path / "parents.jsonl")
+    asyncio.run(store.amset([("p1", {"page_content": "one"}), ("p2", {"page_content": "two"})]))
+    store.mset([("p1", {"page_content": "uno"})])
+    store.mdelete(["p2"])
+
+    reopened = LocalDocumentStore(tmp_path / "parents.jsonl")
+    assert asyncio.run(reopened.amget(["p1", "p2", "missing"])) == [{"page_content": "uno"}, None, None]
+    assert list(reopened.yield_keys(prefix="p")) == ["p1"]
+    print("✅ Last write wins and deletes survive a reload\n")
+
+
+def test_local_backend_pipeline(tmp_path, monkeypatch):
+    """Test upsert_documents and both retrieval functions on VECTOR_BACKEND=local"""
+    print("=== Test 3: Local Backend Pipeline ===\n")
+
+    monkeypatch.setattr(vectordb_init, "VECTOR_BACKEND", "local")
+    monkeypatch.setattr(vectordb_init, "LOCAL_VECTOR_DB_DIR", tmp_path)
+    monkeypatch.setattr(vectordb_init, "EMBEDDING_DIM", DIMENSION)
+    monkeypatch.setitem(resources.factories, "embeddings", HashingEmbeddings)
+    resources.reset()
+
+    parents = [
+        ParentChunk("parent-storage", "Storage: parents in the document store, children as vectors.", "a.txt"),
+        ParentChunk("parent-uploads", "Uploads: pdf, docx and txt files are accepted.", "a.txt"),
+    ]
+    children = [
+        ChildChunk(0, TEXTS[0], "parent-storage", "a.txt"),
+        ChildChunk(1, TEXTS[1], "parent-storage", "a.txt"),
+        ChildChunk(2, TEXTS[3], "parent-uploads", "a.txt"),
+    ]
+    try:
+        asyncio.run(vectordb.upsert_documents(parents, children))
+        single = asyncio.run(vectordb.search_and_retrieve_context("which files are accepted for uploads", top_k=1))
+        batch = asyncio.run(vectordb.search_and_retrieve_contexts(
+            ["which files are accepted for uploads", "where are child chunks stored"], top_k=1,
+        ))
+    finally:
+        resources.reset()
+
+    assert single == [parents[1].content], single
+    assert batch == [[parents[1].content], [parents[0].content]], batch
+    print(f"✅ Retrieved parents: {batch}\n")
+
+
+def test_quantized_store_updates_in_place(tmp_path):
+    """Test that int8 mode holds no float copy, and adds, re-adds and deletes update the index like exact search"""
+    print("=== Test 4: Quantized Updates ===\n")
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(600, DIMENSION)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    documents = [Document(page_content=f"row {row}") for row in range(600)]
+    exact = LocalVectorStore(HashingEmbeddings(), tmp_path / "exact", DIMENSION)
+    quantized = LocalVectorStore(HashingEmbeddings(), tmp_path / "int8", DIMENSION, index_mode="int8")
+    index = quantized._index
+
+    # Small first batch, then larger ones with wider ranges (the int8 scale widens as they arrive)
+    for start, end, gain in ((0, 1, 0.5), (1, 300, 1.0), (300, 600, 2.0)):
+        for store in (exact, quantized):
+            store.add_vectors(vectors[start:end] * gain, documents[start:end], [str(row) for row in range(start, end)])
+    for store in (exact, quantized):
+        store.add_vectors(-vectors[:5], [Document(page_content=f"replaced {row}") for row in range(5)], [str(row) for row in range(5)])
+        store.delete([str(row) for row in range(100, 150)])
+
+    assert quantized._index is index, "Writes update the index instead of rebuilding it"
+    assert isinstance(quantized._vectors, np.memmap) and not index._float_blocks, "Floats are rescored from vectors.f32"
+    assert index.memory_usage()["float_bytes_in_memory"] == 0
+    assert len(index) == len(quantized) == len(exact) == 550
+
+    reopened = LocalVectorStore(HashingEmbeddings(), tmp_path / "int8", DIMENSION, index_mode="int8")
+    for query in list(vectors[:20]) + list(-vectors[:5]):
+        expected = exact.similarity_search_with_score_by_vector(query, k=5)
+        for store in (quantized, reopened):
+            found = store.similarity_search_with_score_by_vector(query, k=5)
+            assert [doc.page_content for doc, _ in found] == [doc.page_content for doc, _ in expected]
+            assert np.allclose([score for _, score in found], [score for _, score in expected], atol=1e-5)
+    print(f"✅ {len(quantized)} rows searched through {index.memory_usage()['code_bytes']} bytes of codes\n")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="The lock uses fcntl")
+def test_collection_locked_to_one_process(tmp_path):
+    """Test that a second process (e.g. another gunicorn worker) cannot open a collection already open here"""
+    print("=== Test 5: Single Process ===\n")
+
+    LocalVectorStore(HashingEmbeddings(), tmp_path / "children", DIMENSION)
+    LocalVectorStore(HashingEmbeddings(), tmp_path / "children", DIMENSION)  # same process: allowed
+    LocalDocumentStore(tmp_path / "parents.jsonl")
+
+    backend_dir = Path(__file__).resolve().parent.parent
+    for opener in (
+        f"LocalVectorStore(None, {str(tmp_path / 'children')!r}, {DIMENSION})",
+        f"LocalDocumentStore({str(tmp_path / 'parents.jsonl')!r})",
+    ):
+        script = f"from app.vectordb.local_store import LocalDocumentStore, LocalVectorStore; {opener}"
+        result = subprocess.run([sys.executable, "-c", script], cwd=backend_dir, capture_output=True, text=True)
+        assert result.returncode != 0 and "already open in another process" in result.stderr, result.stderr
+    print("✅ A second process is refused\n")
@@ -0,0 +1,116 @@
+"""
+Unit tests for the opt-in profiling hooks (app/core/profiling.py, app/api/router_admin.py)
+Checks that a request sent with X-Profile runs under cProfile only with the admin token, that
+a sampling window keeps just the focused call tree, and that reports can be downloaded.
+"""
+import sys
+import asyncio
+import pstats
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core import profiling
+from app.main import app
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _enable(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+
+
+def test_request_profile(tmp_path, monkeypatch):
+    """Test profiling one request and downloading its report"""
+    print("=== Test 1: Request Profile ===\n")
+    _enable(monkeypatch, tmp_path)
+
+    async def run():
+        async with _client() as client:
+            plain = await client.get("/hello")
+            denied = await client.get("/hello?profile=1", headers={"X-Admin-Token": "wrong"})
+            profiled = await client.post("/query", json={"query": "hi"}, headers={"X-Profile": "1", **ADMIN})
+            profile_id = profiled.headers["X-Profile-Id"]
+            report = await client.get(f"/admin/profiles/{profile_id}.txt", headers=ADMIN)
+            stats = await client.get(f"/admin/profiles/{profile_id}.prof", headers=ADMIN)
+            listing = await client.get("/admin/profiles", headers=ADMIN)
+            stolen = await client.get(f"/admin/profiles/{profile_id}.txt")
+            traversal = await client.get("/admin/profiles/..%2F.env", headers=ADMIN)
+        return plain, denied, profiled, report, stats, listing, stolen, traversal
+
+    plain, denied, profiled, report, stats, listing, stolen, traversal = asyncio.run(run())
+    assert plain.status_code == 200 and "X-Profile-Id" not in plain.headers
+    assert denied.status_code == 403
+    assert profiled.status_code == 200 and "placeholder" in profiled.json()["response"]
+    assert report.text.startswith("POST /query") and "cumulative" in report.text
+    stats_file = tmp_path / "download.prof"
+    stats_file.write_bytes(stats.content)
+    assert any(function == "ask_user" for _, _, function in pstats.Stats(str(stats_file)).stats), "Handler missing from the profile"
+    assert listing.json()["profiles"][0]["files"] == [f"{profiled.headers['X-Profile-Id']}.prof", f"{profiled.headers['X-Profile-Id']}.txt"]
+    assert stolen.status_code == 403 and traversal.status_code == 404
+    print(f"✅ Profile {profiled.headers['X-Profile-Id']} stored and downloadable with the admin token only\n")
+
+
+def busy_ingest(stop):
+    while not stop.is_set():
+        parse_page()
+
+
+def parse_page():
+    sum(index * index for index in range(2000))
+
+
+def test_sampling_window(tmp_path, monkeypatch):
+    """Test that a sampling window keeps only the call tree of the focus function"""
+    print("=== Test 2: Sampling Window ===\n")
+    _enable(monkeypatch, tmp_path)
+
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_ingest, args=(stop,))
+    worker.start()
+
+    async def run():
+        async with _client() as client:
+            sampled = await client.post("/admin/profile/sample?seconds=0.3&interval_ms=2&focus=busy_ingest", headers=ADMIN)
+            invalid = await client.post("/admin/profile/sample?seconds=0", headers=ADMIN)
+            collapsed = await client.get(f"/admin/profiles/{sampled.json()['profile_id']}.collapsed", headers=ADMIN)
+        return sampled, invalid, collapsed
+
+    try:
+        sampled, invalid, collapsed = asyncio.run(run())
+    finally:
+        stop.set()
+        worker.join()
+
+    assert sampled.status_code == 200, sampled.text
+    report = sampled.json()["report"]
+    tree = report.splitlines()[1:]
+    assert tree[0].strip().startswith("100.0%  busy_ingest"), report
+    assert any("parse_page" in line for line in tree)
+    assert all(line.startswith("busy_ingest") for line in collapsed.text.splitlines())
+    assert invalid.status_code == 400
+    print(report + "\n")
+
+
+def test_disabled_without_token(monkeypatch):
+    """Test that the admin routes are hidden while PROFILING_TOKEN is unset"""
+    print("=== Test 3: Disabled ===\n")
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "")
+
+    async def run():
+        async with _client() as client:
+            return await client.get("/admin/profiles", headers=ADMIN), await client.get("/hello?profile=1", headers=ADMIN)
+
+    listing, profiled = asyncio.run(run())
+    assert listing.status_code == 404 and profiled.status_code == 403
+    print("✅ No profiling without PROFILING_TOKEN\n")
@@ -0,0 +1,116 @@
+"""
+Unit tests for quantized_index module
+Tests int8 / binary quantized search with float rescoring against exact search
+"""
+import sys
+import asyncio
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.vectordb.quantized_index import QuantizedVectorIndex, INT8, BINARY
+
+
+def _clustered_unit_vectors(count, dimension, seed=0):
+    """Unit vectors grouped around a few centres, roughly like real chunk embeddings."""
+    centres = np.random.default_rng(0).normal(size=(20, dimension))
+    rng = np.random.default_rng(seed + 1)
+    vectors = centres[rng.integers(0, 20, size=count)] + 0.6 * rng.normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _recall(index, vectors, queries, k):
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    hits = 0
+    for query, expected in zip(queries, exact):
+        found = {int(doc_id) for doc_id, _ in index.search(query, k=k)}
+        hits += len(found & set(expected.tolist()))
+    return hits / exact.size
+
+
+@pytest.mark.parametrize("mode, min_recall, min_ratio", [(INT8, 0.95, 3.9), (BINARY, 0.9, 31.0)])
+def test_recall_and_memory(mode, min_recall, min_ratio, tmp_path):
+    """Test that two-phase search stays close to exact search while using far less memory"""
+    print(f"=== Test: {mode} quantized search ===\n")
+
+    vectors = _clustered_unit_vectors(3000, 256)
+    queries = _clustered_unit_vectors(30, 256, seed=1)
+
+    index = QuantizedVectorIndex(256, mode=mode, rescore_candidates=200, float_store_path=tmp_path / "vectors.f32")
+    index.add([str(i) for i in range(1500)], vectors[:1500])
+    index.add([str(i) for i in range(1500, 3000)], vectors[1500:])
+
+    recall = _recall(index, vectors, queries, k=10)
+    usage = index.memory_usage()
+
+    assert recall >= min_recall, f"recall@10 too low for {mode}: {recall}"
+    assert usage["compression_ratio"] >= min_ratio, f"Unexpected compression: {usage}"
+    assert usage["float_bytes_in_memory"] == 0, "Float vectors should stay on disk"
+    print(f"✅ recall@10 = {recall:.3f}")
+    print(f"✅ Memory: {usage}\n")
+
+
+def test_int8_scale_covers_later_batches(tmp_path, monkeypatch):
+    """Test that an int8 index built batch by batch from a tiny first batch searches like one built at once,
+    requantizing its stored rows only O(log N) times"""
+    print("=== Test: int8 Recalibration ===\n")
+
+    vectors = _clustered_unit_vectors(3000, 256)
+    queries = _clustered_unit_vectors(30, 256, seed=1)
+    ids = [str(i) for i in range(3000)]
+
+    full = QuantizedVectorIndex(256, mode=INT8, rescore_candidates=20)
+    full.add(ids, vectors)
+
+    calibrations = []
+    calibrate = QuantizedVectorIndex._calibrate
+    monkeypatch.setattr(QuantizedVectorIndex, "_calibrate", lambda index, rows: calibrations.append(rows) or calibrate(index, rows))
+    incremental = QuantizedVectorIndex(256, mode=INT8, rescore_candidates=20, float_store_path=tmp_path / "vectors.f32")
+    incremental.add(ids[:1], vectors[:1])  # calibrating on this vector alone would clip almost everything after it
+    for start in range(1, 3000, 64):
+        incremental.add(ids[start:start + 64], vectors[start:start + 64])
+
+    assert len(calibrations) <= np.log2(3000) + 1, f"Requantized too often: at {calibrations} rows"
+    assert all(later >= 2 * earlier for earlier, later in zip(calibrations, calibrations[1:])), calibrations
+    clipped = np.mean(np.abs(vectors) > incremental.scale * 127.0 * (1 + 1e-6))
+    assert clipped < 1e-3, f"Too many values clipped between calibrations: {clipped:.4%}"
+    recall = _recall(incremental, vectors, queries, k=10)
+    assert recall >= _recall(full, vectors, queries, k=10) - 0.01, f"recall@10 below a one-shot build: {recall}"
+    print(f"✅ {len(calibrations)} calibrations (at {calibrations} rows), recall@10 {recall:.3f} like a one-shot build\n")
+
+
+def test_scores_are_exact_and_save_load(tmp_path):
+    """Test that returned scores are exact dot products and the index survives save/load"""
+    print("=== Test: Exact Rescoring and Persistence ===\n")
+
+    vectors = _clustered_unit_vectors(500, 64)
+    index = QuantizedVectorIndex(64, mode=BINARY)
+    index.add([f"child-{i}" for i in range(500)], vectors)
+
+    results = index.search(vectors[7], k=3)
+    assert results[0][0] == "child-7", f"A vector should find itself first, got {results}"
+    assert abs(results[0][1] - 1.0) < 1e-5, "Self similarity should be 1"
+
+    index.save(tmp_path / "index")
+    reloaded = QuantizedVectorIndex.load(tmp_path / "index")
+    assert reloaded.search(vectors[7], k=3) == results, "Reloaded index should give identical results"
+    print(f"✅ Results: {results}\n")
+
+
+def test_from_documents_uses_embeddings():
+    """Test building the index through an Embeddings implementation"""
+    print("=== Test: Build From Embeddings ===\n")
+
+    class FixedEmbeddings:
+        async def aembed_documents(self, texts):
+            return [[1.0, 0.0] if "cat" in text else [0.0, 1.0] for text in texts]
+
+    index = asyncio.run(QuantizedVectorIndex.from_documents(
+        ["a", "b", "c"], ["cat facts", "dog facts", "more cat"], FixedEmbeddings(), dimension=2, batch_size=2
+    ))
+    found = [doc_id for doc_id, _ in index.search([1.0, 0.0], k=2)]
+    assert sorted(found) == ["a", "c"], f"Unexpected results: {found}"
+    print(f"✅ Found: {found}\n")
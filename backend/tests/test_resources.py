@@ -0,0 +1,106 @@
+"""
+Unit tests for app/core/resources.py
+Uses slow fake factories (no AstraDB/Beam) to check lazy once-per-process creation,
+parallel warm-up, failure reporting and the /health endpoint of the FastAPI app.
+"""
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.resources import Resources
+
+DELAY = 0.2
+
+
+def _slow_factory(calls, name):
+    def factory():
+        calls.append(name)
+        time.sleep(DELAY)
+        return f"{name}-client"
+    return factory
+
+
+def test_lazy_and_created_once():
+    """Test that nothing is created up front and concurrent first uses share one creation"""
+    print("=== Test 1: Lazy, Once Per Process ===\n")
+
+    calls = []
+    container = Resources({"store": _slow_factory(calls, "store")})
+    assert calls == [], "Creating the container must not connect"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(container.get("store"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["store"], f"Factory should run once, ran {len(calls)} times"
+    assert results == ["store-client"] * 5
+    assert container.health()["resources"]["store"]["status"] == "ready"
+    print(f"✅ Created once in {container.timings_ms['store']} ms\n")
+
+
+def test_parallel_warm_up_and_failures():
+    """Test that warm-up overlaps the slow connections and reports failures without raising"""
+    print("=== Test 2: Parallel Warm-up ===\n")
+
+    calls = []
+
+    def broken():
+        raise ValueError("Missing credentials")
+
+    container = Resources({
+        "vector_store": _slow_factory(calls, "vector_store"),
+        "parent_store": _slow_factory(calls, "parent_store"),
+        "embeddings": _slow_factory(calls, "embeddings"),
+        "auth_database": broken,
+    })
+    health = asyncio.run(container.warm_up(["vector_store", "parent_store", "embeddings", "auth_database"]))
+
+    assert sorted(calls) == ["embeddings", "parent_store", "vector_store"]
+    assert health["startup_ms"] < 3 * DELAY * 1000 * 0.8, f"Warm-up should overlap: {health['startup_ms']} ms"
+    assert health["status"] == "degraded"
+    assert health["resources"]["auth_database"] == {
+        "status": "error", "init_ms": health["resources"]["auth_database"]["init_ms"], "error": "Missing credentials",
+    }
+
+    # A later call retries the failed resource
+    container.factories["auth_database"] = lambda: "database"
+    assert container.get("auth_database") == "database"
+    assert container.health()["status"] == "ok"
+    print(f"✅ Startup took {health['startup_ms']} ms for 3 x {DELAY * 1000:.0f} ms connections\n")
+
+
+def test_health_endpoint(monkeypatch):
+    """Test that the app warms up in its lifespan and reports timings on /health"""
+    print("=== Test 3: /health ===\n")
+
+    import app.main as main
+
+    calls = []
+    monkeypatch.setattr(main.resources, "factories", {
+        "embeddings": _slow_factory(calls, "embeddings"),
+        "vector_store": _slow_factory(calls, "vector_store"),
+        "parent_store": _slow_factory(calls, "parent_store"),
+        "auth_database": _slow_factory(calls, "auth_database"),
+    })
+    monkeypatch.setattr(main.resources, "_locks", {name: threading.Lock() for name in main.resources.factories})
+    main.resources.reset()
+
+    assert calls == [], "Importing the app must not connect"
+    with TestClient(main.app) as client:
+        body = client.get("/health").json()
+    main.resources.reset()
+
+    assert body["status"] == "ok", body
+    assert body["startup_ms"] is not None
+    assert body["resources"]["vector_store"]["status"] == "ready"
+    assert body["resources"]["auth_database"]["status"] == "not_initialised", "Auth database is connected on demand"
+    print(f"✅ /health: {body}\n")
@@ -0,0 +1,98 @@
+"""
+Unit tests for RecursiveSpanSplitter (app/service/rag/ingestion/chunker.py)
+Checks on a test corpus (the sample PDF, edge cases and random texts) that the native splitter
+returns exactly the chunks of LangChain's RecursiveCharacterTextSplitter, which the chunker
+used before, and that the parent/child chunks built from it are unchanged.
+"""
+import sys
+import random
+from pathlib import Path
+
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.service.rag.ingestion.chunker import SEPARATORS, RecursiveSpanSplitter, split_parent_child_chunks
+from app.service.rag.ingestion.text_extractor import extract_text
+
+EDGE_CASES = [
+    "",
+    "   \n\n  \t ",
+    "word",
+    "x" * 5000,
+    "\n\nstarts with a paragraph break",
+    "ends with whitespace   \n\n\n",
+    "one\ntwo\nthree\n\n\n\nfour  five\t\tsix",
+    "windows\r\nline\r\nbreaks\r\n\r\nand paragraphs",
+    "unicode spaces and　ideographic separators",
+    ("short " * 40 + "\n") * 30 + "y" * 700 + " tail",
+]
+
+
+def _random_text(rng: random.Random) -> str:
+    words = ["alpha", "beta", "gamma", "a", "bb", "ccc", "d" * rng.randint(10, 900)]
+    pieces = [" ", "  ", "\n", "\n\n", "\n\n\n", " \n ", "\t"]
+    return "".join(rng.choice(words) + rng.choice(pieces) for _ in range(rng.randint(0, 400)))
+
+
+def _corpus():
+    rng = random.Random(49)
+    texts = list(EDGE_CASES) + [_random_text(rng) for _ in range(40)]
+    sample = BACKEND_DIR / "_local_uploads" / "sample.pdf"
+    if sample.exists():
+        texts.append(extract_text("application/pdf", sample.read_bytes()))
+    return texts
+
+
+def _langchain_chunks(text, parent_max_chars, child_max_chars):
+    """The previous chunker: LangChain splits each parent's text again for its children."""
+    parent_splitter = RecursiveCharacterTextSplitter(chunk_size=parent_max_chars, chunk_overlap=0, separators=SEPARATORS)
+    child_splitter = RecursiveCharacterTextSplitter(chunk_size=child_max_chars, chunk_overlap=int(child_max_chars * 0.1), separators=SEPARATORS)
+    parents = parent_splitter.split_text(text)
+    return parents, [child for parent in parents for child in child_splitter.split_text(parent)]
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(1, 0), (5, 2), (60, 6), (200, 0), (600, 60), (1500, 0), (1500, 1500)])
+def test_same_chunks_as_langchain(chunk_size, chunk_overlap):
+    """Test that the native splitter returns LangChain's chunks, as spans"""
+    print(f"=== Test 1: Equivalence (chunk_size={chunk_size}, chunk_overlap={chunk_overlap}) ===\n")
+    reference = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=SEPARATORS)
+    splitter = RecursiveSpanSplitter(chunk_size, chunk_overlap)
+
+    chunks = 0
+    for text in _corpus():
+        spans = splitter.split(text)
+        assert [text[start:end] for start, end in spans] == reference.split_text(text), repr(text[:80])
+        chunks += len(spans)
+    print(f"✅ {chunks} chunks identical to RecursiveCharacterTextSplitter\n")
+
+
+def test_same_parent_child_chunks():
+    """Test that split_parent_child_chunks produces the parents and children of the LangChain chunker"""
+    print("=== Test 2: Parent/Child Equivalence ===\n")
+    for text in _corpus():
+        for parent_max_chars, child_max_chars in [(1500, 600), (300, 100)]:
+            parents, children = split_parent_child_chunks(text, "doc.pdf", parent_max_chars, child_max_chars)
+            expected_parents, expected_children = _langchain_chunks(text, parent_max_chars, child_max_chars)
+            assert [parent.content for parent in parents] == expected_parents
+            assert [child.text for child in children] == expected_children
+    print("✅ Same parents and children on the whole corpus\n")
+
+
+def test_sub_range_and_validation():
+    """Test that a sub-range is split in place and that invalid sizes are rejected like LangChain does"""
+    print("=== Test 3: Sub-range ===\n")
+    text = "HEADER\n\n" + "Uploads accept pdf, docx and txt files. " * 20 + "\n\nFOOTER"
+    start, end = text.index("Uploads"), text.index("\n\nFOOTER")
+    spans = RecursiveSpanSplitter(100, 10).split(text, start, end)
+    expected = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=10, separators=SEPARATORS).split_text(text[start:end])
+    assert [text[span_start:span_end] for span_start, span_end in spans] == expected
+    assert all(start <= span_start < span_end <= end for span_start, span_end in spans)
+
+    with pytest.raises(ValueError):
+        RecursiveSpanSplitter(0)
+    with pytest.raises(ValueError):
+        RecursiveSpanSplitter(10, 11)
+    print(f"✅ {len(spans)} spans inside [{start}, {end}), invalid sizes rejected\n")
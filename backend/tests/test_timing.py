@@ -0,0 +1,85 @@
+"""
+Unit tests for the per-request stage timings (app/core/timing.py)
+Checks stage accumulation and the Server-Timing round trip, then runs /api/query through
+app.main against the Beam stubs and the local vector backend and reads the stages back.
+"""
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from beam_stubs import LatencyModel, StubService, start_stub_server
+from app.core.resources import resources
+from app.core.timing import begin_request, parse_server_timing, server_timing_header, stage
+from app.embedding.embedding_client import BeamGemmaEmbeddings
+from app.main import app
+from app.service.rag.ingestion.chunker import ChildChunk, ParentChunk
+from app.service.rag.retrieval import answer_generator, query_refiner
+from app.vectordb import vectordb, vectordb_init
+
+HEADERS = {"Authorization": "Bearer stub", "Content-Type": "application/json"}
+
+
+def test_stage_accumulation_and_header():
+    """Test that repeated stages add up and that the header parses back"""
+    print("=== Test 1: Stage Timings ===\n")
+
+    with stage("ignored"):
+        pass  # outside a request: nothing is recorded and nothing fails
+
+    timings = begin_request()
+    for _ in range(2):
+        with stage("embed"):
+            time.sleep(0.005)
+    with stage("search"):
+        pass
+    assert list(timings) == ["embed", "search"] and timings["embed"] >= 10
+
+    header = server_timing_header(timings)
+    parsed = parse_server_timing(header)
+    assert parsed.keys() == timings.keys()
+    assert all(abs(parsed[name] - timings[name]) < 0.1 for name in timings)
+    print(f"✅ {header}\n")
+
+
+def test_query_route_reports_stages(tmp_path, monkeypatch):
+    """Test that /api/query returns refine, embed, search, parent_fetch and generate timings"""
+    print("=== Test 2: Server-Timing on /api/query ===\n")
+
+    async def run():
+        services = {route: StubService(LatencyModel("fixed:2")) for route in ("embed", "refine", "answer")}
+        runner, base_url = await start_stub_server(services)
+        monkeypatch.setattr(query_refiner, "LLM_URL", f"{base_url}/refine")
+        monkeypatch.setattr(query_refiner, "HEADERS", HEADERS)
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_URL", f"{base_url}/answer")
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_KEY", "stub")
+        monkeypatch.setattr(answer_generator, "HEADERS", HEADERS)
+        monkeypatch.setattr(vectordb_init, "VECTOR_BACKEND", "local")
+        monkeypatch.setattr(vectordb_init, "LOCAL_VECTOR_DB_DIR", tmp_path)
+        monkeypatch.setattr(vectordb_init, "EMBEDDING_DIM", 256)
+        monkeypatch.setitem(resources.factories, "embeddings", lambda: BeamGemmaEmbeddings(f"{base_url}/embed", "stub", output_dim=256))
+        resources.reset()
+        try:
+            await vectordb.upsert_documents(
+                [ParentChunk("parent-uploads", "Uploads accept pdf, docx and txt files.", "a.txt")],
+                [ChildChunk(0, "Uploads accept pdf, docx and txt files.", "parent-uploads", "a.txt")],
+            )
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post("/api/query", json={"query": "Which files do uploads accept?", "mode": "refine"})
+        finally:
+            resources.reset()
+            await runner.cleanup()
+        return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200, response.text
+    timings = parse_server_timing(response.headers["Server-Timing"])
+    assert list(timings) == ["refine", "embed", "search", "parent_fetch", "generate"], timings
+    assert timings["refine"] >= 2 and timings["generate"] >= 2
+    print(f"✅ Server-Timing: {response.headers['Server-Timing']}\n")
@@ -0,0 +1,124 @@
+"""
+Unit tests for token-based chunk sizing (app/embedding/tokenizer.py, CHUNK_UNIT=tokens)
+Builds a small BPE tokenizer locally (the EmbeddingGemma one is gated on the Hub) and checks that
+it loads from a path and from the cache, that chunks of Chinese and English text sized in tokens
+fit the token limits where character sizes do not, and that ingest_document reports the token
+length distribution of the document's chunks.
+"""
+import sys
+import asyncio
+import shutil
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.resources import resources
+from app.embedding.tokenizer import (
+    EMBEDDING_MAX_TOKENS,
+    cached_tokenizer_path,
+    load_tokenizer,
+    token_lengths,
+    tokenizer_available,
+)
+from app.service.rag.ingestion import pipeline
+from app.service.rag.ingestion.chunker import StreamingParentChildSplitter, split_parent_child_chunks
+from app.service.rag.ingestion.pipeline import ingest_document
+from app.vectordb.local_store import LocalDocumentStore, LocalVectorStore
+
+DIMENSION = 4
+PARENT_TOKENS, CHILD_TOKENS = 120, 40
+
+CHINESE = "向量数据库把文档切分成父块和子块。子块被嵌入并存入向量库，父块存入文档库，查询时根据子块找回父块。"
+ENGLISH = "Uploads accept pdf, docx and txt files. Parents go to the document store, children are embedded."
+TEXT = "\n\n".join((CHINESE * 3 if line % 2 else ENGLISH) + f" ({line})" for line in range(60))
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0] * DIMENSION for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0] * DIMENSION
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    tokenizer = Tokenizer(models.BPE(unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.train_from_iterator([TEXT], trainers.BpeTrainer(vocab_size=400, special_tokens=["[UNK]"]))
+    return tokenizer
+
+
+def test_load_from_path_and_cache(tokenizer, tmp_path):
+    """Test that a tokenizer.json path loads directly and a model id loads from the cache, offline"""
+    print("=== Test 1: Loading ===\n")
+    path = tmp_path / "tokenizer.json"
+    tokenizer.save(str(path))
+    cache_dir = tmp_path / "cache"
+
+    assert load_tokenizer(str(path), cache_dir).encode(ENGLISH).ids == tokenizer.encode(ENGLISH).ids
+    assert tokenizer_available(str(path), cache_dir)
+    assert not tokenizer_available("example/model", cache_dir), "Not cached yet: loading would download"
+
+    cached = cached_tokenizer_path("example/model", cache_dir)
+    cached.parent.mkdir()
+    shutil.copy(path, cached)
+    assert tokenizer_available("example/model", cache_dir)
+    assert load_tokenizer("example/model", cache_dir).encode(CHINESE).ids == tokenizer.encode(CHINESE).ids
+    print(f"✅ Loaded from {path.name} and from the cache ({cached.name})\n")
+
+
+def test_chunks_fit_token_limits(tokenizer):
+    """Test that chunks sized in tokens fit the limits, one-shot and streamed, where character sizes overflow"""
+    print("=== Test 2: Token Limits ===\n")
+    _, char_children = split_parent_child_chunks(TEXT, "doc.txt", parent_max_chars=1500, child_max_chars=600)
+    assert max(token_lengths(tokenizer, [child.text for child in char_children])) > CHILD_TOKENS, "600 chars of Chinese should overflow the limit"
+
+    parents, children = split_parent_child_chunks(
+        TEXT, "doc.txt", tokenizer=tokenizer, parent_max_tokens=PARENT_TOKENS, child_max_tokens=CHILD_TOKENS
+    )
+    assert max(token_lengths(tokenizer, [parent.content for parent in parents])) <= PARENT_TOKENS
+    assert max(token_lengths(tokenizer, [child.text for child in children])) <= CHILD_TOKENS
+    assert all(TEXT[child.start:child.end] == child.text for child in children)
+
+    splitter = StreamingParentChildSplitter("doc.txt", tokenizer=tokenizer, parent_max_tokens=PARENT_TOKENS, child_max_tokens=CHILD_TOKENS)
+    streamed = []
+    for start in range(0, len(TEXT), 700):
+        streamed += splitter.feed(TEXT[start:start + 700])[1]
+    streamed += splitter.flush()[1]
+    assert max(token_lengths(tokenizer, [child.text for child in streamed])) <= CHILD_TOKENS
+
+    with pytest.raises(ValueError):
+        StreamingParentChildSplitter("doc.txt", tokenizer=tokenizer, child_max_tokens=EMBEDDING_MAX_TOKENS + 1)
+    print(f"✅ {len(children)} children within {CHILD_TOKENS} tokens ({len(char_children)} by characters overflow it)\n")
+
+
+def test_ingest_reports_token_lengths(tokenizer, tmp_path, monkeypatch):
+    """Test that ingest_document chunks in tokens with CHUNK_UNIT=tokens and reports the length distribution"""
+    print("=== Test 3: Length Report ===\n")
+    vector_store = LocalVectorStore(ConstantEmbeddings(), tmp_path / "vectors", DIMENSION)
+    parent_store = LocalDocumentStore(tmp_path / "parents.jsonl")
+    monkeypatch.setitem(resources.factories, "vector_store", lambda: vector_store)
+    monkeypatch.setitem(resources.factories, "parent_store", lambda: parent_store)
+    monkeypatch.setitem(resources.factories, "tokenizer", lambda: tokenizer)
+    monkeypatch.setattr(pipeline, "CHUNK_UNIT", "tokens")
+    resources.reset()
+
+    try:
+        summary = asyncio.run(ingest_document(
+            "text/plain", TEXT.encode("utf-8"), "doc.txt", parent_max_tokens=PARENT_TOKENS, child_max_tokens=CHILD_TOKENS
+        ))
+    finally:
+        resources.reset()
+
+    report = summary["chunk_lengths"]
+    assert report["unit"] == "tokens"
+    assert report["children"]["count"] == summary["children"] and report["parents"]["count"] == summary["parents"]
+    assert 0 < report["children"]["p50"] <= report["children"]["p95"] <= report["children"]["max"] <= CHILD_TOKENS
+    assert report["parents"]["max"] <= PARENT_TOKENS
+    assert report["children_over_window"] == 0
+    print(f"✅ Report: {report}\n")
@@ -0,0 +1,112 @@
+"""
+Unit tests for request tracing (app/core/tracing.py)
+Checks traceparent parsing and span nesting, then runs /api/query through app.main against
+the Beam stubs with the file exporter and checks the exported span tree: one trace, the
+stages under the request span, Beam calls carrying the trace context and the model timings.
+"""
+import sys
+import asyncio
+import json
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from beam_stubs import LatencyModel, StubService, start_stub_server
+from app.core import tracing
+from app.core.resources import resources
+from app.embedding.embedding_client import BeamGemmaEmbeddings
+from app.main import app
+from app.service.rag.ingestion.chunker import ChildChunk, ParentChunk
+from app.service.rag.retrieval import answer_generator, query_refiner
+from app.vectordb import vectordb, vectordb_init
+
+HEADERS = {"Authorization": "Bearer stub", "Content-Type": "application/json"}
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_traceparent_and_nesting():
+    """Test header parsing and that spans nest under the current span"""
+    print("=== Test 1: Trace Context ===\n")
+
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    for invalid in (None, "", "00-abc-def-01", f"00-{'0' * 32}-{PARENT_ID}-01", f"00-{'x' * 32}-{PARENT_ID}-01"):
+        assert tracing.parse_traceparent(invalid) == (None, None), invalid
+
+    assert tracing.trace_headers() == {}
+    with tracing.span("root", traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+        with tracing.span("child") as child:
+            assert tracing.trace_headers() == {"traceparent": f"00-{TRACE_ID}-{child.span_id}-01"}
+    assert root.trace_id == child.trace_id == TRACE_ID
+    assert root.parent_id == PARENT_ID and child.parent_id == root.span_id
+    assert tracing.current_span() is None
+    print("✅ Incoming trace continued, child parented to the root span\n")
+
+
+def test_query_trace(tmp_path, monkeypatch):
+    """Test the exported spans of one /api/query request"""
+    print("=== Test 2: /api/query Trace ===\n")
+
+    trace_file = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_FILE", trace_file)
+    monkeypatch.setattr(tracing, "exporter", tracing.SpanExporter("file"))
+
+    async def run():
+        services = {route: StubService(LatencyModel("fixed:2"), record=True) for route in ("embed", "refine", "answer")}
+        runner, base_url = await start_stub_server(services)
+        monkeypatch.setattr(query_refiner, "LLM_URL", f"{base_url}/refine")
+        monkeypatch.setattr(query_refiner, "HEADERS", HEADERS)
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_URL", f"{base_url}/answer")
+        monkeypatch.setattr(answer_generator, "BEAM_ANSWER_KEY", "stub")
+        monkeypatch.setattr(answer_generator, "HEADERS", HEADERS)
+        monkeypatch.setattr(vectordb_init, "VECTOR_BACKEND", "local")
+        monkeypatch.setattr(vectordb_init, "LOCAL_VECTOR_DB_DIR", tmp_path / "vectors")
+        monkeypatch.setattr(vectordb_init, "EMBEDDING_DIM", 256)
+        monkeypatch.setitem(resources.factories, "embeddings", lambda: BeamGemmaEmbeddings(f"{base_url}/embed", "stub", output_dim=256))
+        resources.reset()
+        try:
+            await vectordb.upsert_documents(
+                [ParentChunk("parent-uploads", "Uploads accept pdf, docx and txt files.", "a.txt")],
+                [ChildChunk(0, "Uploads accept pdf, docx and txt files.", "parent-uploads", "a.txt")],
+            )
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                response = await client.post(
+                    "/api/query",
+                    json={"query": "Which files do uploads accept?", "mode": "refine"},
+                    headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+                )
+        finally:
+            resources.reset()
+            await runner.cleanup()
+        return response, services
+
+    response, services = asyncio.run(run())
+    assert response.status_code == 200, response.text
+    assert response.headers["X-Trace-Id"] == TRACE_ID
+    tracing.exporter.flush()
+
+    spans = [json.loads(line) for line in trace_file.read_text(encoding="utf-8").splitlines()]
+    spans = [item for item in spans if item["trace_id"] == TRACE_ID]
+    by_name = {item["name"]: item for item in spans}
+    root = by_name["POST /api/query"]
+    assert root["parent_id"] == PARENT_ID
+    for stage_name in ("refine", "embed", "search", "parent_fetch", "generate"):
+        assert by_name[stage_name]["parent_id"] == root["span_id"], stage_name
+
+    for service, stage_name in (("refine", "refine"), ("embed", "embed"), ("answer", "generate")):
+        beam_span = by_name[f"beam.{service}"]
+        assert beam_span["parent_id"] == by_name[stage_name]["span_id"]
+        assert beam_span["attributes"]["http.status_code"] == 200
+        assert beam_span["attributes"]["model.compute_ms"] >= 2
+        assert {"model.queue_ms", "model.overhead_ms"} <= beam_span["attributes"].keys()
+        sent = services[service].recorded[-1]["traceparent"]
+        assert sent == f"00-{TRACE_ID}-{beam_span['span_id']}-01", f"{service} got {sent}"
+    print(f"✅ {len(spans)} spans in one trace, Beam calls carry their span's traceparent\n")
+
+    waterfall = tracing.render_waterfall(spans)
+    assert waterfall.splitlines()[0].startswith("POST /api/query")
+    print(waterfall + "\n")
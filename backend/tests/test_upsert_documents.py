@@ -0,0 +1,189 @@
+"""
+Unit tests for the concurrent parent/child upsert (app/vectordb/vectordb.py)
+Runs upsert_documents against the local stores with slow, recording fakes and checks that
+parents and children are written at the same time in bounded insert batches, and that a
+failure on either side rolls back everything the ingestion wrote.
+"""
+import sys
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.resources import resources
+from app.service.rag.ingestion.chunker import ChildChunk, ParentChunk
+from app.vectordb import vectordb
+from app.vectordb.local_store import LocalDocumentStore, LocalVectorStore
+
+DIMENSION = 8
+DELAY = 0.02
+
+
+class SlowEmbeddings(Embeddings):
+    """Constant vectors after a short sleep; records call sizes and can fail on the Nth call."""
+
+    def __init__(self, events, fail_on_call=None):
+        self.events, self.fail_on_call, self.calls = events, fail_on_call, []
+
+    def embed_documents(self, texts):
+        return [[1.0] + [0.0] * (DIMENSION - 1) for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.calls.append(len(texts))
+        self.events.append(("embed", time.perf_counter()))
+        await asyncio.sleep(DELAY)
+        if self.fail_on_call is not None and len(self.calls) >= self.fail_on_call:
+            raise RuntimeError("embedding endpoint unavailable")
+        return self.embed_documents(texts)
+
+
+class FastFailureEmbeddings(SlowEmbeddings):
+    """The second call fails at once while the others take a while, so it fails with a batch mid-write."""
+
+    async def aembed_documents(self, texts):
+        self.calls.append(len(texts))
+        if len(self.calls) == 2:
+            raise RuntimeError("embedding endpoint unavailable")
+        await asyncio.sleep(3 * DELAY)
+        return self.embed_documents(texts)
+
+
+class RemoteVectorStore(LocalVectorStore):
+    """Like an HTTP insert, a write that has been sent is applied even if the caller is cancelled."""
+
+    async def aadd_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        return await asyncio.shield(asyncio.ensure_future(super().aadd_texts(texts, metadatas, ids=ids, **kwargs)))
+
+
+class SlowDocumentStore(LocalDocumentStore):
+    """LocalDocumentStore whose amset sleeps, records batch sizes and can fail."""
+
+    def __init__(self, path, events, fail=False):
+        super().__init__(path)
+        self.events, self.fail, self.batches = events, fail, []
+
+    async def amset(self, key_value_pairs):
+        self.batches.append(len(key_value_pairs))
+        self.events.append(("parent", time.perf_counter()))
+        await asyncio.sleep(DELAY)
+        if self.fail:
+            raise RuntimeError("document store unavailable")
+        self.mset(key_value_pairs)
+
+
+def _documents(parent_count, children_per_parent):
+    parents = [ParentChunk(f"parent-{p}", f"parent {p}", "doc.pdf") for p in range(parent_count)]
+    children = [
+        ChildChunk(p * children_per_parent + c, f"child {p}-{c}", f"parent-{p}", "doc.pdf")
+        for p in range(parent_count) for c in range(children_per_parent)
+    ]
+    return parents, children
+
+
+def _stores(tmp_path, monkeypatch, fail_parents=False, fail_on_embed_call=None, embeddings_class=SlowEmbeddings, vector_store_class=LocalVectorStore):
+    events = []
+    embeddings = embeddings_class(events, fail_on_embed_call)
+    vector_store = vector_store_class(embeddings, tmp_path / "vectors", DIMENSION)
+    parent_store = SlowDocumentStore(tmp_path / "parents.jsonl", events, fail=fail_parents)
+    monkeypatch.setitem(resources.factories, "vector_store", lambda: vector_store)
+    monkeypatch.setitem(resources.factories, "parent_store", lambda: parent_store)
+    resources.reset()
+    return events, embeddings, vector_store, parent_store
+
+
+def test_concurrent_bounded_batches(tmp_path, monkeypatch):
+    """Test that parent and child writes overlap and stay within the insert batch size"""
+    print("=== Test 1: Concurrent Batched Upsert ===\n")
+    monkeypatch.setattr(vectordb, "UPSERT_BATCH_SIZE", 100)
+    monkeypatch.setattr(vectordb, "UPSERT_CONCURRENCY", 2)
+    events, embeddings, vector_store, parent_store = _stores(tmp_path, monkeypatch)
+    parents, children = _documents(250, 2)
+
+    try:
+        started = time.perf_counter()
+        asyncio.run(vectordb.upsert_documents(parents, children))
+        elapsed = time.perf_counter() - started
+    finally:
+        resources.reset()
+
+    assert parent_store.batches == [100, 100, 50], parent_store.batches
+    assert sorted(embeddings.calls) == [100, 100, 100, 100, 100], embeddings.calls
+    assert len(vector_store) == 500 and all(parent_store.mget([parent.id for parent in parents]))
+    # Same stored format as before the chunk records: parents as LangChain Document JSON (plus their offsets)
+    metadata = {"document_name": "doc.pdf", "start_index": 0, "end_index": 8}
+    assert parent_store.mget(["parent-0"]) == [{"id": None, "metadata": metadata, "page_content": "parent 0", "type": "Document"}]
+    first_embed = min(at for kind, at in events if kind == "embed")
+    last_parent = max(at for kind, at in events if kind == "parent")
+    assert first_embed < last_parent, "Children should be embedded while parents are still being written"
+    print(f"✅ 250 parents in {parent_store.batches}, 500 children in {embeddings.calls}, {elapsed * 1000:.0f} ms\n")
+
+
+def test_parent_failure_leaves_no_children(tmp_path, monkeypatch):
+    """Test that children written before a parent failure are deleted again"""
+    print("=== Test 2: Parent Failure ===\n")
+    events, embeddings, vector_store, parent_store = _stores(tmp_path, monkeypatch, fail_parents=True)
+    parents, children = _documents(3, 4)
+
+    try:
+        with pytest.raises(RuntimeError, match="document store unavailable"):
+            asyncio.run(vectordb.upsert_documents(parents, children))
+    finally:
+        resources.reset()
+
+    assert len(vector_store) == 0, "Orphan children left in the vector store"
+    assert not any(parent_store.mget([parent.id for parent in parents]))
+    print("✅ No orphan children after the parent write failed\n")
+
+
+def test_child_failure_rolls_back(tmp_path, monkeypatch):
+    """Test that a failing child batch removes the earlier child batches and the parents"""
+    print("=== Test 3: Child Failure ===\n")
+    monkeypatch.setattr(vectordb, "UPSERT_BATCH_SIZE", 4)
+    monkeypatch.setattr(vectordb, "UPSERT_CONCURRENCY", 1)
+    events, embeddings, vector_store, parent_store = _stores(tmp_path, monkeypatch, fail_on_embed_call=3)
+    parents, children = _documents(3, 4)
+
+    try:
+        with pytest.raises(RuntimeError, match="embedding endpoint unavailable"):
+            asyncio.run(vectordb.upsert_documents(parents, children))
+        reloaded = LocalVectorStore(embeddings, tmp_path / "vectors", DIMENSION)
+    finally:
+        resources.reset()
+
+    assert embeddings.calls == [4, 4, 4]
+    assert len(vector_store) == 0 and len(reloaded) == 0, "Child batches written before the failure were kept"
+    assert not any(parent_store.mget([parent.id for parent in parents]))
+    print("✅ Earlier child batches and all parents rolled back\n")
+
+
+def test_failure_waits_for_writes_in_flight(tmp_path, monkeypatch):
+    """Test that a failing child batch lets the batch mid-write finish, starts no new one, then rolls back"""
+    print("=== Test 4: Writes In Flight ===\n")
+    monkeypatch.setattr(vectordb, "UPSERT_BATCH_SIZE", 4)
+    monkeypatch.setattr(vectordb, "UPSERT_CONCURRENCY", 2)
+    events, embeddings, vector_store, parent_store = _stores(
+        tmp_path, monkeypatch, embeddings_class=FastFailureEmbeddings, vector_store_class=RemoteVectorStore,
+    )
+    parents, children = _documents(3, 4)
+
+    async def ingest_and_settle():
+        with pytest.raises(RuntimeError, match="embedding endpoint unavailable"):
+            await vectordb.upsert_documents(parents, children)
+        await asyncio.sleep(5 * DELAY)  # a cancelled insert would still land here, after the rollback
+
+    try:
+        asyncio.run(ingest_and_settle())
+    finally:
+        resources.reset()
+
+    assert embeddings.calls == [4, 4], f"No batch should start after the failure: {embeddings.calls}"
+    assert len(vector_store) == 0, "A child batch in flight was written after the rollback"
+    assert not any(parent_store.mget([parent.id for parent in parents]))
+    print("✅ The batch in flight finished before the rollback, nothing remains\n")